@@ -0,0 +1,132 @@
+#!/usr/bin/env python
+# coding: utf-8
+"""締切・補助金額・補助率の抽出処理のマイクロベンチマーク
+
+保存済みのHTMLページに対して、以下の3方式の処理時間と抽出結果を比較する。
+  legacy   : 以前の scrape_grant_details と同じく、HTML全体に未コンパイルのパターンを順に適用
+  engine   : extraction.extract_grant_fields を本文テキストに適用（本番で使用）
+  combined : 全ルールを1本の選択肢にまとめて1回で走査（参考）
+
+使い方:
+  python benchmarks/bench_extraction.py [ページのディレクトリ ...] [--repeat 20]
+ディレクトリを省略すると benchmarks/pages を使う。.cache/http を指定するとHTTPキャッシュの本文（*.body）も対象にできる。
+"""
+
+import argparse
+import os
+import re
+import sys
+import time
+
+from bs4 import BeautifulSoup
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from extraction import EXTRACTION_RULES, extract_grant_fields, page_text  # noqa: E402
+
+# 以前の scrape_grant_details で使っていたパターン（比較用）
+LEGACY_RULES = {
+    "deadline": [
+        r'締切.*?[：:]\s*(.*?[0-9]{4}年[0-9]{1,2}月[0-9]{1,2}日)',
+        r'申込期限.*?[：:]\s*(.*?[0-9]{4}年[0-9]{1,2}月[0-9]{1,2}日)',
+        r'募集期間.*?[：:]\s*(.*?まで)',
+        r'受付期間.*?[：:]\s*(.*?まで)',
+        r'([0-9]{4}年[0-9]{1,2}月[0-9]{1,2}日).*(締切|締め切り|〆切)',
+        r'([0-9]{4}年[0-9]{1,2}月[0-9]{1,2}日.*?まで)'
+    ],
+    "amount": [
+        r'補助額.*?[：:]\s*(.*?円)',
+        r'助成額.*?[：:]\s*(.*?円)',
+        r'補助金額.*?[：:]\s*(.*?円)',
+        r'上限.*?([0-9,]+万円)',
+        r'上限額.*?([0-9,]+万円)',
+        r'([0-9,]+万円).*?上限'
+    ],
+    "ratio": [
+        r'補助率.*?[：:]\s*(.*?分の.*?)',
+        r'助成率.*?[：:]\s*(.*?分の.*?)',
+        r'([0-9]/[0-9]以内)',
+        r'([0-9]分の[0-9]以内)',
+        r'補助率.*(最大[0-9]{1,2}%)'
+    ]
+}
+
+COMBINED_RULE_INDEX = [(field, priority) for field, patterns in EXTRACTION_RULES.items() for priority in range(len(patterns))]
+COMBINED_PATTERN = re.compile("|".join(f"(?={pattern})" for patterns in EXTRACTION_RULES.values() for pattern in patterns))
+
+
+def extract_legacy(html):
+    """以前の実装と同じ方法で抽出する"""
+    results = {}
+    for field, patterns in LEGACY_RULES.items():
+        for pattern in patterns:
+            match = re.search(pattern, html)
+            if match:
+                results[field] = match.group(1).strip()
+                break
+    return results
+
+
+def extract_combined(text):
+    """全ルールを先読みの選択肢にまとめた正規表現で1回だけ走査して抽出する"""
+    best = {}
+    for match in COMBINED_PATTERN.finditer(text):
+        field, priority = COMBINED_RULE_INDEX[match.lastindex - 1]
+        if field not in best or priority < best[field][0]:
+            best[field] = (priority, match.group(match.lastindex).strip())
+    return {field: value for field, (_, value) in best.items()}
+
+
+def load_pages(directories):
+    """ディレクトリ内のHTMLページ（*.html, *.body）を読み込む"""
+    pages = []
+    for directory in directories:
+        for name in sorted(os.listdir(directory)):
+            if not name.endswith((".html", ".body")):
+                continue
+            with open(os.path.join(directory, name), "rb") as f:
+                pages.append((name, f.read().decode("utf-8", errors="replace")))
+    return pages
+
+
+def measure(func, arg, repeat):
+    """関数をrepeat回実行し、1回あたりの平均時間（ミリ秒）と最後の結果を返す"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = func(arg)
+    return (time.perf_counter() - start) / repeat * 1000, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="抽出ルールのマイクロベンチマーク")
+    parser.add_argument("directories", nargs="*", default=[os.path.join(os.path.dirname(os.path.abspath(__file__)), "pages")])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    pages = load_pages(args.directories)
+    if not pages:
+        print("❌ ベンチマーク対象のページがありません")
+        return
+
+    totals = {"legacy": 0.0, "text": 0.0, "engine": 0.0, "combined": 0.0}
+    for name, html in pages:
+        legacy_ms, legacy_result = measure(extract_legacy, html, args.repeat)
+        text_ms, text = measure(lambda source: page_text(BeautifulSoup(source, "html.parser")), html, args.repeat)
+        engine_ms, engine_result = measure(extract_grant_fields, text, args.repeat)
+        combined_ms, combined_result = measure(extract_combined, text, args.repeat)
+
+        totals["legacy"] += legacy_ms
+        totals["text"] += text_ms
+        totals["engine"] += engine_ms
+        totals["combined"] += combined_ms
+
+        print(f"📄 {name} ({len(html):,} 文字 → 本文 {len(text):,} 文字)")
+        print(f"  legacy   {legacy_ms:8.3f} ms  {legacy_result}")
+        print(f"  engine   {engine_ms:8.3f} ms  {engine_result}")
+        print(f"  combined {combined_ms:8.3f} ms  {'（engineと同じ結果）' if combined_result == engine_result else combined_result}")
+        print(f"  （本文テキスト抽出 {text_ms:8.3f} ms はHTML解析と共通の処理）")
+
+    print(f"📊 合計: legacy {totals['legacy']:.3f} ms / engine {totals['engine']:.3f} ms / combined {totals['combined']:.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
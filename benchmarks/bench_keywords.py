@@ -0,0 +1,157 @@
+#!/usr/bin/env python
+# coding: utf-8
+"""地域・業種キーワード判定のマイクロベンチマーク
+
+疑似的な助成金タイトルと概要に対して、以下の3方式の1件あたりの処理時間を比較し、判定結果が一致するかを確認する。
+  legacy       : 以前の filter_grants_for_target_business と同じく、キーワードごとに `in` で判定
+  matcher      : keywords.KeywordMatcher（本番で使用。グループごとにコンパイルした正規表現）
+  aho-corasick : 純PythonのAho–Corasickオートマトンで全グループを1回の走査で判定（参考）
+
+使い方:
+  python benchmarks/bench_keywords.py [--count 2000] [--repeat 5]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from collections import deque
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from keywords import KEYWORD_GROUPS, KeywordMatcher  # noqa: E402
+
+FILLER_WORDS = ['補助金', '令和6年度', '事業', '支援', '募集', '中小企業', 'について', 'の', 'お知らせ', '公募']
+
+
+def is_target_legacy(grant, groups=KEYWORD_GROUPS):
+    """以前の実装と同じ方法で判定する"""
+    include = True
+    title = grant["title"].lower()
+    desc = grant["description"].lower()
+    it_keywords = groups["it"]
+
+    if any(prefecture in title for prefecture in groups["prefecture"]) and not any(keyword in title for keyword in groups["nationwide"]):
+        include = False
+    if (any(keyword in title for keyword in groups["agriculture"]) and
+            not any(kw.lower() in title.lower() or kw.lower() in desc.lower() for kw in it_keywords)):
+        include = False
+    if any(exclude_kw in title or exclude_kw in desc for exclude_kw in groups["exclude"]):
+        include = False
+    if any(kw.lower() in title.lower() or kw.lower() in desc.lower() for kw in it_keywords):
+        include = True
+    return include
+
+
+class AhoCorasick:
+    """全グループのキーワードを1つのオートマトンにまとめ、1文字ずつ走査して一致したグループ名を返す"""
+
+    def __init__(self, groups):
+        self.goto = [{}]
+        self.fail = [0]
+        self.output = [frozenset()]
+        for name, keywords in groups.items():
+            for keyword in keywords:
+                node = 0
+                for char in keyword.lower():
+                    child = self.goto[node].get(char)
+                    if child is None:
+                        child = len(self.goto)
+                        self.goto[node][char] = child
+                        self.goto.append({})
+                        self.fail.append(0)
+                        self.output.append(frozenset())
+                    node = child
+                self.output[node] = self.output[node] | {name}
+
+        queue = deque(self.goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self.goto[node].items():
+                queue.append(child)
+                fail = self.fail[node]
+                while fail and char not in self.goto[fail]:
+                    fail = self.fail[fail]
+                target = self.goto[fail].get(char, 0)
+                self.fail[child] = target if target != child else 0
+                self.output[child] = self.output[child] | self.output[self.fail[child]]
+
+    def groups(self, text):
+        goto, fail, output = self.goto, self.fail, self.output
+        found = set()
+        node = 0
+        for char in text.lower():
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            if output[node]:
+                found |= output[node]
+        return found
+
+
+def is_target_with(classify):
+    """グループ名の集合を返す関数から判定関数を作る"""
+    def is_target(grant):
+        title_hits = classify(grant["title"])
+        desc_hits = classify(grant["description"])
+        has_it_keyword = "it" in title_hits or "it" in desc_hits
+        include = True
+        if "prefecture" in title_hits and "nationwide" not in title_hits:
+            include = False
+        if "agriculture" in title_hits and not has_it_keyword:
+            include = False
+        if "exclude" in title_hits or "exclude" in desc_hits:
+            include = False
+        if has_it_keyword:
+            include = True
+        return include
+    return is_target
+
+
+def make_grants(count):
+    """キーワードを散りばめた疑似的な助成金情報を作る"""
+    random.seed(1)
+    words = [keyword for keywords in KEYWORD_GROUPS.values() for keyword in keywords] + FILLER_WORDS * 10
+    return [
+        {
+            "title": "".join(random.choice(words) for _ in range(6)),
+            "description": "".join(random.choice(words) for _ in range(40))
+        }
+        for _ in range(count)
+    ]
+
+
+def measure(func, grants, repeat):
+    """1件あたりの平均時間（マイクロ秒）と判定結果を返す"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        results = [func(grant) for grant in grants]
+    return (time.perf_counter() - start) / repeat / len(grants) * 1e6, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="キーワード判定のマイクロベンチマーク")
+    parser.add_argument("--count", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    grants = make_grants(args.count)
+    matcher = KeywordMatcher(KEYWORD_GROUPS)
+    automaton = AhoCorasick(KEYWORD_GROUPS)
+
+    candidates = [
+        ("legacy", is_target_legacy),
+        ("matcher", is_target_with(matcher.matched_groups)),
+        ("aho-corasick", is_target_with(automaton.groups))
+    ]
+
+    baseline = None
+    print(f"📄 疑似助成金情報 {len(grants)} 件")
+    for label, func in candidates:
+        micros, results = measure(func, grants, args.repeat)
+        baseline = baseline or results
+        print(f"  {label:14s} {micros:8.2f} µs/件  対象 {sum(results)} 件  {'（legacyと同じ結果）' if results == baseline else '❌ 結果がlegacyと異なる'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+# coding: utf-8
+"""HTML解析バックエンドと部分解析（SoupStrainer）のベンチマーク
+
+J-Net21の記事一覧ページ（perPage 50件）を、パーサー（html.parser / lxml）と
+部分解析の有無の組み合わせで解析し、1ページあたりのCPU時間とピークメモリを比較する。
+
+使い方:
+  python benchmarks/bench_parsing.py [一覧ページのHTML] [--repeat 20]
+"""
+
+import argparse
+import os
+import time
+import tracemalloc
+
+from bs4 import BeautifulSoup, FeatureNotFound, SoupStrainer
+
+PAGES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "pages")
+
+
+def parse_listing(html, parser, strained):
+    """main.scrape_jnet21_grants と同じ方法で記事タイトルとリンクを取り出す"""
+    parse_only = SoupStrainer(class_="m-panel-article") if strained else None
+    soup = BeautifulSoup(html, parser, parse_only=parse_only)
+    articles = []
+    for item in soup.select(".m-panel-article"):
+        title_elem = item.select_one(".m-panel-article__title")
+        link_elem = title_elem.find("a") if title_elem else None
+        if link_elem:
+            articles.append((title_elem.text.strip(), link_elem.get("href")))
+    return articles
+
+
+def measure(html, parser, strained, repeat):
+    """CPU時間（ミリ秒/ページ）とピークメモリ（KB）を計測する"""
+    start = time.process_time()
+    for _ in range(repeat):
+        articles = parse_listing(html, parser, strained)
+    cpu_ms = (time.process_time() - start) / repeat * 1000
+
+    tracemalloc.start()
+    parse_listing(html, parser, strained)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return cpu_ms, peak / 1024, len(articles)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="HTML解析バックエンドのベンチマーク")
+    parser.add_argument("page", nargs="?", default=os.path.join(PAGES_DIR, "jnet21_listing.html"))
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    with open(args.page, "r", encoding="utf-8") as f:
+        html = f.read()
+
+    print(f"📄 {os.path.basename(args.page)} ({len(html):,} 文字)")
+    for backend in ("html.parser", "lxml"):
+        for strained in (False, True):
+            label = f"{backend}{' + SoupStrainer' if strained else ''}"
+            try:
+                cpu_ms, peak_kb, count = measure(html, backend, strained, args.repeat)
+            except FeatureNotFound:
+                print(f"  {label:28s} 未インストールのためスキップ")
+                continue
+            print(f"  {label:28s} CPU {cpu_ms:8.2f} ms/ページ  ピークメモリ {peak_kb:8.0f} KB  記事 {count} 件")
+
+
+if __name__ == "__main__":
+    main()
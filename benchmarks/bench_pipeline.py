@@ -0,0 +1,269 @@
+#!/usr/bin/env python
+# coding: utf-8
+"""記録済みフィクスチャを使った処理全体（main.main）のベンチマーク
+
+replay.py で記録したフィクスチャを再生モードで使い、ネットワークに出ずに main() を実行する。
+ステージ（取得・解析・フィルタリング・重複排除・GPT評価・スプレッドシート書き込み・通知）ごとに
+呼び出し回数、処理時間の合計、CPU時間、リクエスト数、GPTのトークン数を集計し、JSONで保存する（ピークメモリ（RSS）は
+プロセス全体の値のため全体でのみ集計する）。ホストごとの待ち時間とrobots.txtのCrawl-delayは無効にして計測する。
+基準の結果を指定すると、しきい値を超えて遅くなったステージがあれば終了コード1で終了する。
+GPTのフィクスチャが見つからない呼び出しがあった場合も、計測結果が実際の実行と異なるため終了コード1で終了する。
+
+ステージは並行して動くため、「処理時間」は各呼び出しの所要時間の合計、「区間」は最初の呼び出し開始から最後の呼び出し終了までの時間。
+
+使い方:
+  python replay.py record fixtures/2025-06-01        # フィクスチャを記録（ネットワークと認証情報が必要）
+  python benchmarks/bench_pipeline.py fixtures/2025-06-01 --repeat 3 --output results.json
+  python benchmarks/bench_pipeline.py fixtures/2025-06-01 --baseline results.json --threshold 0.2
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# ステージ名と、計測する main.py の関数・メソッド
+STAGES = {
+    "scrape": ["fetch"],
+    "parse": ["parse_html", "page_text", "extract_grant_fields"],
+    "filter": ["is_target_grant"],
+    "dedup": ["GrantDeduplicator.add", "NearDuplicateIndex.find", "NearDuplicateIndex.add"],
+    "gpt": ["create_chat_completion"],
+    "sheet": ["call_sheets_api"],
+    "webhook": ["send_to_google_chat"]
+}
+
+# 比較に使う指標
+COMPARED_METRICS = ("wall_seconds", "cpu_seconds")
+
+
+def peak_rss_mb():
+    """これまでのプロセスのピークRSS（MB）"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 / 1024 if sys.platform == "darwin" else peak / 1024
+
+
+class StageRecorder:
+    """ステージごとの計測値を集計する"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.stages = {}
+
+    def record(self, stage, started, finished, cpu_seconds, tokens=None, estimated_tokens=None):
+        with self.lock:
+            stats = self.stages.setdefault(stage, {
+                "calls": 0, "wall_seconds": 0.0, "cpu_seconds": 0.0, "first_start": started, "last_end": finished,
+                "tokens": 0, "estimated_tokens": 0
+            })
+            stats["calls"] += 1
+            stats["wall_seconds"] += finished - started
+            stats["cpu_seconds"] += cpu_seconds
+            stats["first_start"] = min(stats["first_start"], started)
+            stats["last_end"] = max(stats["last_end"], finished)
+            stats["tokens"] += tokens or 0
+            stats["estimated_tokens"] += estimated_tokens or 0
+
+    def results(self, run_start):
+        results = {}
+        for stage, stats in self.stages.items():
+            results[stage] = {
+                "calls": stats["calls"],
+                "requests": stats["calls"] if stage in ("scrape", "gpt", "webhook") else 0,
+                "wall_seconds": round(stats["wall_seconds"], 4),
+                "span_seconds": round(stats["last_end"] - stats["first_start"], 4),
+                "started_at": round(stats["first_start"] - run_start, 4),
+                "cpu_seconds": round(stats["cpu_seconds"], 4),
+                "tokens": stats["tokens"],
+                "estimated_tokens": stats["estimated_tokens"]
+            }
+        return results
+
+
+def _response_tokens(response):
+    usage = getattr(response, "usage", None)
+    return getattr(usage, "total_tokens", 0) or 0
+
+
+def instrument(module, recorder):
+    """main.py の関数をステージ計測付きの関数に置き換える"""
+    for stage, names in STAGES.items():
+        for name in names:
+            owner = module
+            attribute = name
+            if "." in name:
+                class_name, attribute = name.split(".")
+                owner = getattr(module, class_name)
+            original = getattr(owner, attribute)
+
+            def wrapper(*args, __original=original, __stage=stage, **kwargs):
+                started = time.perf_counter()
+                cpu_started = time.thread_time()
+                result = None
+                try:
+                    result = __original(*args, **kwargs)
+                    return result
+                finally:
+                    estimated = kwargs.get("estimated_tokens", args[1] if __stage == "gpt" and len(args) > 1 else None)
+                    recorder.record(__stage, started, time.perf_counter(), time.thread_time() - cpu_started,
+                                    tokens=_response_tokens(result) if __stage == "gpt" else None,
+                                    estimated_tokens=estimated if __stage == "gpt" else None)
+
+            setattr(owner, attribute, wrapper)
+
+
+def run_child(fixtures, output, verbose):
+    """再生モードで main() を1回実行し、計測結果をJSONに書き出す"""
+    os.environ["HTTP_REPLAY_MODE"] = "replay"
+    os.environ["HTTP_REPLAY_DIR"] = fixtures
+    # ホストごとの待ち時間はネットワーク相手の配慮なので、再生時は計測に含めない
+    os.environ["HOST_MIN_INTERVAL"] = "0"
+    os.environ["ROBOTS_TXT_ENABLED"] = "0"
+    os.environ.setdefault("WEBHOOK_URL", "https://webhook.replay.invalid/")
+
+    sys.path.insert(0, ROOT_DIR)
+    import_start = time.perf_counter()
+    import main as grant_watcher
+    import replay
+    import_seconds = time.perf_counter() - import_start
+
+    recorder = StageRecorder()
+    instrument(grant_watcher, recorder)
+
+    run_start = time.perf_counter()
+    cpu_start = time.process_time()
+    log = io.StringIO()
+    with contextlib.redirect_stdout(sys.stdout if verbose else log):
+        grant_watcher.main()
+    total = {
+        "wall_seconds": round(time.perf_counter() - run_start, 4),
+        "cpu_seconds": round(time.process_time() - cpu_start, 4),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+        "import_seconds": round(import_seconds, 4)
+    }
+
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump({"total": total, "stages": recorder.results(run_start), "replay": replay.get_replay_stats()}, f, ensure_ascii=False)
+
+
+def run_once(fixtures, verbose):
+    """子プロセスで1回計測する（モジュールの状態やキャッシュを実行ごとに分けるため）"""
+    with tempfile.NamedTemporaryFile(suffix=".json", delete=False) as f:
+        output = f.name
+    try:
+        command = [sys.executable, os.path.abspath(__file__), fixtures, "--child", output]
+        if verbose:
+            command.append("--verbose")
+        subprocess.run(command, check=True)
+        with open(output, "r", encoding="utf-8") as f:
+            return json.load(f)
+    finally:
+        os.remove(output)
+
+
+def median_results(runs):
+    """複数回の計測結果を、数値ごとの中央値にまとめる"""
+    def merge(values):
+        first = values[0]
+        if isinstance(first, dict):
+            keys = {key for value in values for key in value}
+            return {key: merge([value[key] for value in values if key in value]) for key in sorted(keys)}
+        if isinstance(first, (int, float)):
+            return round(statistics.median(values), 4)
+        return first
+    return merge(runs)
+
+
+def compare(results, baseline, threshold, min_delta):
+    """基準と比べてしきい値を超えて遅くなった指標の一覧を返す"""
+    regressions = []
+    rows = [("total", results["total"], baseline.get("total", {}))]
+    rows += [(stage, stats, baseline.get("stages", {}).get(stage, {})) for stage, stats in results["stages"].items()]
+    for stage, current, base in rows:
+        for metric in COMPARED_METRICS:
+            if metric not in current or not base.get(metric):
+                continue
+            delta = current[metric] - base[metric]
+            if delta > min_delta and current[metric] > base[metric] * (1 + threshold):
+                regressions.append(f"{stage}.{metric}: {base[metric]:.3f}s → {current[metric]:.3f}s (+{delta / base[metric] * 100:.0f}%)")
+    return regressions
+
+
+def print_results(results):
+    total = results["total"]
+    print(f"📊 全体: {total['wall_seconds']:.3f}s  CPU {total['cpu_seconds']:.3f}s  ピークRSS {total['peak_rss_mb']:.1f} MB  (import {total['import_seconds']:.3f}s)")
+    print(f"  {'ステージ':10s} {'呼び出し':>8s} {'処理時間':>10s} {'区間':>10s} {'開始':>8s} {'CPU':>9s} {'トークン':>9s}")
+    for stage in STAGES:
+        stats = results["stages"].get(stage)
+        if not stats:
+            continue
+        tokens = stats["tokens"] or stats["estimated_tokens"]
+        print(f"  {stage:10s} {stats['calls']:8.0f} {stats['wall_seconds']:9.3f}s {stats['span_seconds']:9.3f}s "
+              f"{stats['started_at']:7.2f}s {stats['cpu_seconds']:8.3f}s {tokens:9.0f}")
+    replay_stats = results.get("replay", {})
+    if replay_stats.get("missed"):
+        print(f"⚠️ フィクスチャに無いリクエストが {replay_stats['missed']:.0f} 件ありました"
+              f"（うちGPT {replay_stats.get('gpt_missed', 0):.0f} 件。結果は実際の実行と異なります）")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="記録済みフィクスチャを使った処理全体のベンチマーク")
+    parser.add_argument("fixtures", help="replay.py record で記録したフィクスチャのディレクトリ")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", help="結果を保存するJSONファイル")
+    parser.add_argument("--baseline", help="比較する基準の結果（JSON）")
+    parser.add_argument("--threshold", type=float, default=0.2, help="遅くなったとみなす割合（0.2 = 20%%）")
+    parser.add_argument("--min-delta", type=float, default=0.05, help="これより小さい差（秒）は無視する")
+    parser.add_argument("--verbose", action="store_true", help="main() のログを表示する")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.fixtures, args.child, args.verbose)
+        return
+
+    if not os.path.exists(os.path.join(args.fixtures, "http.jsonl")):
+        sys.exit(f"❌ フィクスチャが見つかりません: {args.fixtures}（replay.py record で記録してください）")
+
+    runs = []
+    for attempt in range(args.repeat):
+        print(f"⏳ {attempt + 1}/{args.repeat} 回目を計測中...")
+        runs.append(run_once(args.fixtures, args.verbose))
+    results = median_results(runs)
+    results["repeat"] = args.repeat
+    print_results(results)
+
+    gpt_missed = max(run.get("replay", {}).get("gpt_missed", 0) for run in runs)
+    if gpt_missed:
+        sys.exit(f"❌ GPTのフィクスチャが見つからない呼び出しが {gpt_missed} 件ありました。"
+                 f"GPT評価が行われていないため計測結果は使えません（GPT_BATCH_SIZE などの設定を記録時と揃えるか、フィクスチャを記録し直してください）")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"✅ 結果を保存しました: {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold, args.min_delta)
+        if regressions:
+            print(f"❌ 基準より {args.threshold * 100:.0f}% 以上遅くなった指標があります:")
+            for regression in regressions:
+                print(f"  - {regression}")
+            sys.exit(1)
+        print(f"✅ 基準（{args.baseline}）からの後退はありません")
+
+
+if __name__ == "__main__":
+    main()
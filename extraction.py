@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+# coding: utf-8
+"""助成金ページのHTML解析と、締切・補助金額・補助率を抽出するルールエンジン"""
+
+import os
+import re
+
+from bs4 import BeautifulSoup, FeatureNotFound
+
+# --- 抽出ルール ---
+# フィールドごとのパターン（上にあるものほど優先）。各パターンの取得対象はキャプチャグループ1つのみ。
+# 大きなページでバックトラックが膨らまないよう、`.*` の代わりに上限付きの `.{0,N}?` を使う。
+EXTRACTION_RULES = {
+    "deadline": [
+        r'締切.{0,30}?[：:]\s*(.{0,40}?[0-9]{4}年[0-9]{1,2}月[0-9]{1,2}日)',
+        r'申込期限.{0,30}?[：:]\s*(.{0,40}?[0-9]{4}年[0-9]{1,2}月[0-9]{1,2}日)',
+        r'募集期間.{0,30}?[：:]\s*(.{0,60}?まで)',
+        r'受付期間.{0,30}?[：:]\s*(.{0,60}?まで)',
+        r'([0-9]{4}年[0-9]{1,2}月[0-9]{1,2}日).{0,40}?(?:締切|締め切り|〆切)',
+        r'([0-9]{4}年[0-9]{1,2}月[0-9]{1,2}日.{0,40}?まで)'
+    ],
+    "amount": [
+        r'補助額.{0,30}?[：:]\s*(.{0,40}?円)',
+        r'助成額.{0,30}?[：:]\s*(.{0,40}?円)',
+        r'補助金額.{0,30}?[：:]\s*(.{0,40}?円)',
+        r'上限.{0,30}?([0-9,]+万円)',
+        r'上限額.{0,30}?([0-9,]+万円)',
+        r'([0-9,]+万円).{0,30}?上限'
+    ],
+    "ratio": [
+        r'補助率.{0,30}?[：:]\s*(.{0,20}?分の[0-9０-９一二三四五六七八九十]+)',
+        r'助成率.{0,30}?[：:]\s*(.{0,20}?分の[0-9０-９一二三四五六七八九十]+)',
+        r'([0-9]/[0-9]以内)',
+        r'([0-9]分の[0-9]以内)',
+        r'補助率.{0,30}?(最大[0-9]{1,2}%)'
+    ]
+}
+
+# 一覧ページの本文から締切日を拾うパターン
+LISTING_DEADLINE_PATTERN = re.compile(r'([0-9]{4}年[0-9]{1,2}月[0-9]{1,2}日).{0,60}?(?:締切|締め切り|〆切|まで)')
+
+
+# 起動時に一度だけコンパイルしておく
+COMPILED_RULES = {field: [re.compile(pattern) for pattern in patterns] for field, patterns in EXTRACTION_RULES.items()}
+
+
+def extract_grant_fields(text, rules=COMPILED_RULES):
+    """テキストから締切（deadline）・補助金額（amount）・補助率（ratio）を抽出する（見つからない項目は含まない）
+
+    ルールは優先度順に照合する。先頭が固定文字列のパターンは re が高速な前方一致探索を使えるため、
+    全ルールを1本の選択肢にまとめて走査するよりも速い（benchmarks/bench_extraction.py で確認）。
+    """
+    results = {}
+    if not text:
+        return results
+
+    for field, patterns in rules.items():
+        for pattern in patterns:
+            match = pattern.search(text)
+            if match:
+                results[field] = match.group(1).strip()
+                break
+
+    return results
+
+
+def page_text(soup):
+    """スクリプトやスタイルを除いたページの本文テキストを取得する（空白は1つにまとめる）"""
+    for tag in soup(["script", "style", "noscript"]):
+        tag.decompose()
+    return re.sub(r'\s+', ' ', soup.get_text(" "))
+
+
+# --- HTML解析 ---
+# auto: lxmlがインストールされていればlxml、無ければ標準のhtml.parserを使う
+HTML_PARSER = os.getenv("HTML_PARSER", "auto")
+
+
+def _detect_html_parser():
+    """使用するBeautifulSoupのパーサーを決める"""
+    if HTML_PARSER != "auto":
+        return HTML_PARSER
+    try:
+        import lxml  # noqa: F401
+        return "lxml"
+    except ImportError:
+        return "html.parser"
+
+
+HTML_PARSER_BACKEND = _detect_html_parser()
+
+
+def parse_html(markup, parse_only=None):
+    """HTMLを解析する（parse_onlyにSoupStrainerを渡すと一致した部分木だけを構築し、指定パーサーが使えなければhtml.parserで解析）"""
+    try:
+        return BeautifulSoup(markup, HTML_PARSER_BACKEND, parse_only=parse_only)
+    except FeatureNotFound:
+        return BeautifulSoup(markup, "html.parser", parse_only=parse_only)
@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+# coding: utf-8
+"""地域・業種・除外キーワードの判定（スクレイパーとフィルタリングで共有する照合器）"""
+
+import json
+import os
+import re
+
+# --- キーワード定義 ---
+# グループ名ごとのキーワード。照合は大文字・小文字を区別しない。
+KEYWORD_GROUPS = {
+    # 長野県以外の都道府県（地域限定の助成金の判定用）
+    "prefecture": ['北海道', '青森', '岩手', '宮城', '秋田',
+                   '山形', '福島', '茨城', '栃木', '群馬',
+                   '埼玉', '千葉', '東京', '神奈川', '新潟',
+                   '富山', '石川', '福井', '山梨', '岐阜',
+                   '静岡', '愛知', '三重', '滋賀', '京都',
+                   '大阪', '兵庫', '奈良', '和歌山', '鳥取',
+                   '島根', '岡山', '広島', '山口', '徳島',
+                   '香川', '愛媛', '高知', '福岡', '佐賀',
+                   '長崎', '熊本', '大分', '宮崎', '鹿児島',
+                   '沖縄'],
+    # 長野県と県内の市
+    "nagano": ['長野県', '長野市', '松本市', '上田市', '岡谷市', '飯田市', '諏訪市', '須坂市', '小諸市',
+               '伊那市', '駒ヶ根市', '中野市', '大町市', '飯山市', '茅野市', '塩尻市', '佐久市', '千曲市',
+               '東御市', '安曇野市', '長野'],
+    # 地域名があっても対象に含める表現
+    "nationwide": ['長野', '全国', '全て', 'すべて'],
+    # 情報通信業向け助成金に関連するキーワード
+    "it": ['IT', 'システム', 'デジタル', '情報通信', 'DX', 'セキュリティ', 'アプリ', 'ソフトウェア',
+           'ICT', 'クラウド', 'AI', 'IoT', '技術', 'テクノロジー', 'オンライン', 'データ'],
+    # 情報通信業が対象外になりやすい業種
+    "agriculture": ['農業', '農林', '漁業', '林業'],
+    # 募集が終わっていることを示す表現
+    "exclude": ['終了しました', '募集終了', '受付終了', '募集は締め切りました']
+}
+
+# JSONファイルでグループ単位にキーワードを差し替える（例: {"it": ["IT", "DX"]}）
+KEYWORD_GROUPS_PATH = os.getenv("KEYWORD_GROUPS_PATH")
+
+
+def load_keyword_groups(path=KEYWORD_GROUPS_PATH):
+    """既定のキーワード定義に、設定ファイルのグループを上書きしたものを返す"""
+    groups = dict(KEYWORD_GROUPS)
+    if path:
+        with open(path, "r", encoding="utf-8") as f:
+            groups.update(json.load(f))
+    return groups
+
+
+class KeywordMatcher:
+    """キーワードのグループをまとめて照合する
+
+    グループごとにキーワードを長い順の選択肢として1本の正規表現にコンパイルしておき、
+    小文字化は1テキストにつき1回だけ行う。純Pythonで書いたAho–Corasickオートマトンは
+    文字ごとのループが遅く、この規模（100語未満・短いテキスト）では正規表現の方が速い
+    （benchmarks/bench_keywords.py で確認）。
+    """
+
+    def __init__(self, groups):
+        self.patterns = {}
+        for name, keywords in groups.items():
+            keywords = sorted({keyword.lower() for keyword in keywords if keyword}, key=len, reverse=True)
+            self.patterns[name] = re.compile("|".join(re.escape(keyword) for keyword in keywords)) if keywords else None
+
+    def matched_groups(self, text, names=None):
+        """テキストにキーワードが1つでも含まれるグループ名の集合を返す（各グループは最初の一致で打ち切る）"""
+        text = (text or "").lower()
+        return {
+            name for name in (names or self.patterns)
+            if self.patterns[name] and self.patterns[name].search(text)
+        }
+
+
+KEYWORD_MATCHER = KeywordMatcher(load_keyword_groups())
+
+
+def matched_groups(text, names=None):
+    """共有の照合器で、キーワードが含まれるグループ名の集合を返す"""
+    return KEYWORD_MATCHER.matched_groups(text, names)
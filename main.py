@@ -3,14 +3,28 @@
 
 import os
 import json
+import time
+import hashlib
 import requests
-import openai
-import gspread
 import datetime
 import re
-from bs4 import BeautifulSoup
-from google.oauth2 import service_account
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from dataclasses import dataclass, asdict
+from bs4 import SoupStrainer
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from urllib3.util.retry import Retry
 from urllib.parse import urlparse, urljoin
+from urllib.robotparser import RobotFileParser
+from extraction import extract_grant_fields, page_text, parse_html, LISTING_DEADLINE_PATTERN
+from keywords import matched_groups
+from near_duplicates import NearDuplicateIndex, NEAR_DUP_ENABLED, merge_missing_fields
+from url_canonical import canonicalize_url
+from tracing import TRACER
+import replay
+import stage_profiler
 
 # --- 環境変数読み込み ---
 SPREADSHEET_ID = os.getenv("SPREADSHEET_ID")
@@ -18,31 +32,130 @@ GOOGLE_SERVICE_ACCOUNT = os.getenv("GOOGLE_SERVICE_ACCOUNT")
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 WEBHOOK_URL = os.getenv("WEBHOOK_URL")
 
-# 環境変数チェック
-if not WEBHOOK_URL:
-    print("❌ WEBHOOK_URL が設定されていません")
-    exit(1)
-else:
-    # 最初の数文字だけをログに出す（セキュリティのため）
-    webhook_preview = WEBHOOK_URL[:15] + "..." if len(WEBHOOK_URL) > 15 else WEBHOOK_URL
-    print(f"✅ WEBHOOK_URL: {webhook_preview}")
-
-# --- OpenAI初期化 ---
-openai.api_key = OPENAI_API_KEY
-
-# --- Google認証 ---
-try:
-    credentials_info = json.loads(GOOGLE_SERVICE_ACCOUNT)
-    credentials = service_account.Credentials.from_service_account_info(
-        credentials_info,
-        scopes=["https://www.googleapis.com/auth/spreadsheets", "https://www.googleapis.com/auth/drive"]
-    )
-    gc = gspread.authorize(credentials)
-    sheet = gc.open_by_key(SPREADSHEET_ID).sheet1
-    print("✅ スプレッドシート接続成功")
-except Exception as e:
-    print(f"❌ スプレッドシート接続失敗: {e}")
-    exit(1)
+# 詳細ページ並列取得の設定（全体の同時実行数）
+DETAIL_FETCH_WORKERS = int(os.getenv("DETAIL_FETCH_WORKERS", "8"))
+
+# ホストごとの巡回制御（同時接続数、リクエスト間隔の最小値と429/503時に広げる上限（秒）、robots.txtのCrawl-delay）
+HOST_MAX_CONCURRENCY = int(os.getenv("HOST_MAX_CONCURRENCY", os.getenv("DETAIL_FETCH_PER_HOST", "4")))
+HOST_MIN_INTERVAL = float(os.getenv("HOST_MIN_INTERVAL", "0.5"))
+HOST_MAX_INTERVAL = float(os.getenv("HOST_MAX_INTERVAL", "30"))
+ROBOTS_TXT_ENABLED = os.getenv("ROBOTS_TXT_ENABLED", "1") == "1"
+ROBOTS_CACHE_TTL_DAYS = float(os.getenv("ROBOTS_CACHE_TTL_DAYS", "7"))
+
+# HTTP通信の設定（リトライ回数と指数バックオフの係数）
+HTTP_TIMEOUT = int(os.getenv("HTTP_TIMEOUT", "30"))
+HTTP_RETRY_TOTAL = int(os.getenv("HTTP_RETRY_TOTAL", "3"))
+HTTP_RETRY_BACKOFF = float(os.getenv("HTTP_RETRY_BACKOFF", "1.0"))
+
+# 永続キャッシュの設定（実行間で保持するデータの保存先）
+# 記録・再生モードでは毎回空の一時ディレクトリになるため、実行レポートとプロファイルは元の場所（OUTPUT_DIR）に保存する
+OUTPUT_DIR = os.getenv("CACHE_DIR", ".cache")
+CACHE_DIR = replay.cache_dir(OUTPUT_DIR)
+HTTP_CACHE_ENABLED = os.getenv("HTTP_CACHE_ENABLED", "1") == "1"
+HTTP_CACHE_TTL_DAYS = float(os.getenv("HTTP_CACHE_TTL_DAYS", "30"))
+HTTP_CACHE_MAX_MB = float(os.getenv("HTTP_CACHE_MAX_MB", "200"))
+
+# 実行レポートの設定（処理ごとの所要時間をJSONとOpenMetrics形式で保存。空文字で出力しない）
+RUN_REPORT_PATH = os.getenv("RUN_REPORT_PATH", os.path.join(OUTPUT_DIR, "run_report.json"))
+RUN_METRICS_PATH = os.getenv("RUN_METRICS_PATH", os.path.join(OUTPUT_DIR, "run_metrics.prom"))
+# 実行の最後に表示・保存する、時間のかかった処理の件数
+RUN_REPORT_SLOWEST = int(os.getenv("RUN_REPORT_SLOWEST", "10"))
+
+# --profile で実行したときのプロファイルの保存先
+PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join(OUTPUT_DIR, "profile"))
+
+# 増分評価の設定（内容が変わっていない助成金は前回のGPT評価を再利用）
+INCREMENTAL_MODE = os.getenv("INCREMENTAL_MODE", "1") == "1"
+GRANT_STATE_RETENTION_DAYS = float(os.getenv("GRANT_STATE_RETENTION_DAYS", "60"))
+
+# J-Net21のページ送りの設定（既読の記事が現れるまで遡る。初回や長期間空いた場合の上限ページ数）
+JNET21_MAX_PAGES = int(os.getenv("JNET21_MAX_PAGES", "20"))
+JNET21_SEEN_RETENTION_DAYS = float(os.getenv("JNET21_SEEN_RETENTION_DAYS", "365"))
+# ソースの締め切りまでの残り時間がこれ（秒）を下回ったらページを遡るのをやめ、詳細ページの取得に残す
+JNET21_DETAIL_RESERVE = float(os.getenv("JNET21_DETAIL_RESERVE", "120"))
+
+# ソース横断クロールの設定（同時に取得するソース数、全体の制限時間と各ソースの締め切り（秒））
+CRAWL_CONCURRENCY = int(os.getenv("CRAWL_CONCURRENCY", "8"))
+CRAWL_TIME_BUDGET = float(os.getenv("CRAWL_TIME_BUDGET", "900"))
+CRAWL_SOURCE_DEADLINE = float(os.getenv("CRAWL_SOURCE_DEADLINE", "600"))
+# 締め切りに間に合うように、取得済みの分で結果を返し始める余裕（秒）
+CRAWL_RETURN_MARGIN = float(os.getenv("CRAWL_RETURN_MARGIN", "10"))
+
+# スプレッドシート書き込みの設定（まとめて書き込む行数とクォータ超過時のリトライ）
+SHEET_FLUSH_SIZE = int(os.getenv("SHEET_FLUSH_SIZE", "50"))
+SHEET_RETRY_TOTAL = int(os.getenv("SHEET_RETRY_TOTAL", "5"))
+SHEET_RETRY_BACKOFF = float(os.getenv("SHEET_RETRY_BACKOFF", "2.0"))
+# diff: 既存の行とURLで突き合わせて差分だけ書き込む / rewrite: 毎回シートをクリアして全行を書き直す
+SHEET_SYNC_MODE = os.getenv("SHEET_SYNC_MODE", "diff")
+
+# GPT評価の設定（同時実行数と1分あたりのリクエスト数・トークン数の上限）
+GPT_CONCURRENCY = int(os.getenv("GPT_CONCURRENCY", "4"))
+GPT_REQUESTS_PER_MINUTE = float(os.getenv("GPT_REQUESTS_PER_MINUTE", "60"))
+GPT_TOKENS_PER_MINUTE = float(os.getenv("GPT_TOKENS_PER_MINUTE", "60000"))
+GPT_RETRY_TOTAL = int(os.getenv("GPT_RETRY_TOTAL", "5"))
+GPT_MAX_OUTPUT_TOKENS = 200
+# 1リクエストでまとめて評価する助成金の件数（1で1件ずつ評価）
+GPT_BATCH_SIZE = int(os.getenv("GPT_BATCH_SIZE", "5"))
+GPT_MODEL = os.getenv("GPT_MODEL", "gpt-3.5-turbo")
+# プロンプトの文面を変えたら上げる（評価キャッシュのキーに含まれる）
+GPT_PROMPT_VERSION = "2"
+
+# GPT評価キャッシュの設定（同じ入力の評価結果を実行をまたいで再利用）
+GPT_CACHE_ENABLED = os.getenv("GPT_CACHE_ENABLED", "1") == "1"
+GPT_CACHE_TTL_DAYS = float(os.getenv("GPT_CACHE_TTL_DAYS", "90"))
+GPT_CACHE_MAX_ENTRIES = int(os.getenv("GPT_CACHE_MAX_ENTRIES", "2000"))
+
+# 評価対象の企業プロフィール
+COMPANY_PROFILE = {"location": "長野県塩尻市", "industry": "情報通信業", "employees": 56}
+
+# --- 外部サービスのクライアント（初回利用時に作成して使い回す） ---
+# openai・gspread・Google認証のライブラリは読み込みに時間がかかるため、クライアントを作るときに読み込む
+_openai_client = None
+_openai_client_lock = threading.Lock()
+_sheet = None
+_sheet_lock = threading.Lock()
+
+def check_webhook_url():
+    """WEBHOOK_URLが設定されているか確認する（未設定なら終了）"""
+    if not WEBHOOK_URL:
+        print("❌ WEBHOOK_URL が設定されていません")
+        exit(1)
+    else:
+        # 最初の数文字だけをログに出す（セキュリティのため）
+        webhook_preview = WEBHOOK_URL[:15] + "..." if len(WEBHOOK_URL) > 15 else WEBHOOK_URL
+        print(f"✅ WEBHOOK_URL: {webhook_preview}")
+
+def get_openai_client():
+    """OpenAIクライアントを取得する（初回呼び出し時に作成）"""
+    global _openai_client
+    with _openai_client_lock:
+        if _openai_client is None:
+            def create_client():
+                import openai
+                # 429のリトライはcreate_chat_completionでレート制御と合わせて行うため、SDK側ではリトライしない
+                return openai.OpenAI(api_key=OPENAI_API_KEY, max_retries=0)
+            _openai_client = replay.openai_client(create_client)
+        return _openai_client
+
+def get_sheet():
+    """書き込み先のワークシートを取得する（初回呼び出し時にGoogle認証してスプレッドシートを開く）"""
+    global _sheet
+    with _sheet_lock:
+        if _sheet is None:
+            def open_sheet():
+                import gspread
+                from google.oauth2 import service_account
+                
+                credentials_info = json.loads(GOOGLE_SERVICE_ACCOUNT)
+                credentials = service_account.Credentials.from_service_account_info(
+                    credentials_info,
+                    scopes=["https://www.googleapis.com/auth/spreadsheets", "https://www.googleapis.com/auth/drive"]
+                )
+                gc = gspread.authorize(credentials)
+                return gc.open_by_key(SPREADSHEET_ID).sheet1
+            _sheet = replay.worksheet(open_sheet)  # 再生モードではメモリ上のシートを使う
+            print("✅ スプレッドシート接続成功")
+        return _sheet
 
 # --- ヘルパー関数 ---
 def normalize_text(text):
@@ -85,108 +198,607 @@ def generate_simple_title(original_title, index):
         # 問題なければそのまま返す
         return original_title
 
+def grant_url_key(url):
+    """重複判定や状態管理に使うURLキーを返す（http/https・末尾のスラッシュ・フラグメント・アクセス解析用パラメータなどの違いをまとめる）"""
+    return canonicalize_url(url)
+
+class GrantDeduplicator:
+    """これまでに受け取った助成金情報とURL・タイトルが重複しないかを逐次判定する"""
+    
+    def __init__(self):
+        self.urls = set()
+        self.titles = set()
+    
+    def add(self, grant):
+        """重複していなければ登録してTrueを返す"""
+        # URLとタイトルの両方が重複していない場合のみ追加
+        url_key = grant_url_key(grant["url"])
+        title_key = normalize_text(grant["title"])
+        
+        if url_key in self.urls or title_key in self.titles:
+            return False
+        self.urls.add(url_key)
+        self.titles.add(title_key)
+        return True
+
+# --- HTTP通信（共有セッション） ---
+DEFAULT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+}
+
+_http_session = None
+_http_session_lock = threading.Lock()
+
+def get_http_session():
+    """全スクレイパーで共有するHTTPセッションを取得する（ホストごとの接続プール・キープアライブ・リトライ付き）"""
+    global _http_session
+    with _http_session_lock:
+        if _http_session is None:
+            retry = Retry(
+                total=HTTP_RETRY_TOTAL,
+                connect=HTTP_RETRY_TOTAL,
+                read=HTTP_RETRY_TOTAL,
+                status=HTTP_RETRY_TOTAL,
+                backoff_factor=HTTP_RETRY_BACKOFF,
+                status_forcelist=(500, 502, 503, 504),
+                allowed_methods=frozenset(["GET", "HEAD"]),
+                raise_on_status=False  # リトライ後も失敗した場合は最後の応答をそのまま返す
+            )
+            adapter = HTTPAdapter(
+                pool_connections=20,
+                pool_maxsize=max(DETAIL_FETCH_WORKERS, HOST_MAX_CONCURRENCY, 10),
+                max_retries=retry
+            )
+            session = requests.Session()
+            session.headers.update(DEFAULT_HEADERS)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _http_session = replay.install_http(session)  # 記録・再生モードではアダプターを差し替える
+        return _http_session
+
+# --- ホストごとの巡回制御 ---
+ROBOTS_CACHE_PATH = os.path.join(CACHE_DIR, "robots.json")
+THROTTLE_STATUSES = (429, 503)
+
+_robots_cache = None
+_robots_cache_lock = threading.Lock()
+
+def get_robots_crawl_delay(host, scheme="https"):
+    """robots.txtのCrawl-delay（秒）を返す（取得結果はローカルにキャッシュし、無ければNone）
+    ソースの取得中は締め切りまでの残り時間で取得し、間に合わなければキャッシュせずにCrawlDeadlineExceededを送出する"""
+    global _robots_cache
+    with _robots_cache_lock:
+        if _robots_cache is None:
+            try:
+                with open(ROBOTS_CACHE_PATH, "r", encoding="utf-8") as f:
+                    _robots_cache = json.load(f)
+            except (OSError, ValueError):
+                _robots_cache = {}
+        entry = _robots_cache.get(host)
+        if entry and time.time() - entry.get("fetched_at", 0) <= ROBOTS_CACHE_TTL_DAYS * 86400:
+            return entry.get("crawl_delay")
+    
+    crawl_delay = None
+    robots_url = f"{scheme}://{host}/robots.txt"
+    remaining = check_crawl_deadline(robots_url)
+    try:
+        response = get_http_session().get(robots_url, timeout=10 if remaining is None else max(0.1, min(10, remaining)))
+        if response.status_code == 200:
+            parser = RobotFileParser()
+            parser.parse(response.text.splitlines())
+            delay = parser.crawl_delay(DEFAULT_HEADERS["User-Agent"])
+            crawl_delay = float(delay) if delay is not None else None
+    except Exception as e:
+        if crawl_time_left() == 0:  # 締め切りで打ち切られた結果は次回取得し直す
+            raise CrawlDeadlineExceeded(f"締め切りを過ぎたため取得を中断しました: {robots_url}") from e
+        print(f"⚠️ robots.txtの取得エラー ({host}): {e}")
+    
+    with _robots_cache_lock:
+        _robots_cache[host] = {"crawl_delay": crawl_delay, "fetched_at": time.time()}
+        try:
+            os.makedirs(os.path.dirname(ROBOTS_CACHE_PATH) or ".", exist_ok=True)
+            with open(ROBOTS_CACHE_PATH + ".tmp", "w", encoding="utf-8") as f:
+                json.dump(_robots_cache, f, ensure_ascii=False)
+            os.replace(ROBOTS_CACHE_PATH + ".tmp", ROBOTS_CACHE_PATH)
+        except OSError as e:
+            print(f"❌ robots.txtキャッシュの保存エラー: {e}")
+    return crawl_delay
+
+class HostThrottle:
+    """1ホスト分の同時接続数とリクエスト間隔を制御する（429/503が返ると間隔を広げ、成功が続くと元に戻す）"""
+    
+    def __init__(self, host, scheme="https"):
+        self.host = host
+        self.scheme = scheme
+        self.semaphore = threading.BoundedSemaphore(max(1, HOST_MAX_CONCURRENCY))
+        self.lock = threading.Lock()
+        self.base_interval = None  # 初回のリクエスト時にrobots.txtを見て決める
+        self.robots_fetched = None  # robots.txtの取得中に設定するEvent（取得が終わるとset）
+        self.interval = HOST_MIN_INTERVAL
+        self.next_allowed = 0.0
+        self.stats = {"requests": 0, "throttled": 0, "waited": 0.0}
+    
+    def _ensure_base_interval(self):
+        """最小間隔を決める（robots.txtのCrawl-delayがあればそちらを優先）
+        robots.txtはロックの外で1つのスレッドだけが取得し、他のスレッドは取得が終わるか締め切りまで待つ"""
+        while True:
+            with self.lock:
+                if self.base_interval is not None:
+                    return
+                fetched = self.robots_fetched
+                if fetched is None:
+                    self.robots_fetched = threading.Event()
+            if fetched is not None:
+                fetched.wait(check_crawl_deadline(self.host))
+                continue
+            
+            try:
+                crawl_delay = get_robots_crawl_delay(self.host, self.scheme) if ROBOTS_TXT_ENABLED else None
+                with self.lock:
+                    self.base_interval = min(max(HOST_MIN_INTERVAL, crawl_delay or 0), HOST_MAX_INTERVAL)
+                    self.interval = max(self.interval, self.base_interval)
+            finally:
+                # 締め切りなどで取得できなかった場合は、待っている他のスレッドが取得し直す
+                with self.lock:
+                    fetched, self.robots_fetched = self.robots_fetched, None
+                fetched.set()
+    
+    def acquire(self):
+        """同時接続の枠を確保し、前回のリクエストから間隔が空くまで待つ（待機した秒数を返す）
+        ソースの締め切りまでに順番が来ない場合はCrawlDeadlineExceededを送出する"""
+        self._ensure_base_interval()
+        self.semaphore.acquire()
+        with self.lock:
+            now = time.monotonic()
+            start = max(now, self.next_allowed)
+            remaining = crawl_time_left()
+            if remaining is not None and start - now >= remaining:
+                # 順番が来る前にソースの締め切りを過ぎるリクエストは、待たずに中断する（枠も予約しない）
+                self.semaphore.release()
+                raise CrawlDeadlineExceeded(f"締め切りまでにリクエストの順番が来ないため中断しました: {self.host}")
+            self.next_allowed = start + self.interval
+            self.stats["requests"] += 1
+            self.stats["waited"] += start - now
+        if start > now:
+            time.sleep(start - now)
+        return start - now
+    
+    def release(self, statuses=(), retry_after=None):
+        """リクエストの結果を反映して枠を返す（statusesにはリトライ中の応答も含める）"""
+        with self.lock:
+            if any(status in THROTTLE_STATUSES for status in statuses):
+                self.interval = min(max(self.interval * 2, self.base_interval or HOST_MIN_INTERVAL, 1.0), HOST_MAX_INTERVAL)
+                self.stats["throttled"] += 1
+                wait_seconds = min(retry_after or self.interval, HOST_MAX_INTERVAL)
+                self.next_allowed = max(self.next_allowed, time.monotonic() + wait_seconds)
+                print(f"⚠️ {self.host}: {'/'.join(str(s) for s in statuses if s in THROTTLE_STATUSES)} を受信したためリクエスト間隔を {self.interval:.1f} 秒に広げます")
+            elif statuses:
+                self.interval = max(self.base_interval or HOST_MIN_INTERVAL, self.interval * 0.9)
+        self.semaphore.release()
+
+_host_throttles = {}
+_host_throttles_lock = threading.Lock()
+
+def get_host_throttle(url):
+    """URLのホストに対応する巡回制御を取得する（全てのfetchで共有）"""
+    parsed = urlparse(url)
+    with _host_throttles_lock:
+        if parsed.netloc not in _host_throttles:
+            _host_throttles[parsed.netloc] = HostThrottle(parsed.netloc, parsed.scheme or "https")
+        return _host_throttles[parsed.netloc]
+
+def _response_statuses(response):
+    """urllib3のリトライ中に受け取った応答も含めたステータスコードの一覧を返す"""
+    retries = getattr(response.raw, "retries", None)
+    history = [entry.status for entry in getattr(retries, "history", ()) if entry.status]
+    return history + [response.status_code]
+
+def _retry_after_seconds(response):
+    """Retry-Afterヘッダーの秒数を返す（無い・解釈できない場合はNone）"""
+    try:
+        return float(response.headers.get("Retry-After"))
+    except (TypeError, ValueError):
+        return None
+
+def throttled_get(url, **kwargs):
+    """ホストごとの巡回制御を守りながら共有セッションでGETする
+    ソースの取得中は締め切りを過ぎたらリクエストを送らずにCrawlDeadlineExceededを送出し、タイムアウトも残り時間に収める"""
+    check_crawl_deadline(url)
+    throttle = get_host_throttle(url)
+    with TRACER.span("http", url, host=throttle.host) as span:
+        span.set(throttle_wait=round(throttle.acquire(), 3))
+        response = None
+        try:
+            remaining = check_crawl_deadline(url)
+            if remaining is not None:
+                kwargs["timeout"] = max(0.1, min(kwargs.get("timeout") or HTTP_TIMEOUT, remaining))
+            response = get_http_session().get(url, **kwargs)
+            statuses = _response_statuses(response)
+            span.set(status=response.status_code, retries=len(statuses) - 1,
+                     bytes=None if kwargs.get("stream") else len(response.content or b""))
+            return response
+        finally:
+            if response is not None:
+                throttle.release(statuses, _retry_after_seconds(response))
+            else:
+                throttle.release()
+
+def print_host_throttle_stats():
+    """ホストごとの巡回制御の統計を表示する"""
+    with _host_throttles_lock:
+        throttles = sorted(_host_throttles.values(), key=lambda throttle: throttle.host)
+    if not throttles:
+        return
+    
+    print("📊 ホストごとの巡回制御:")
+    for throttle in throttles:
+        print(f"  - {throttle.host}: リクエスト {throttle.stats['requests']} 件, 待機 {throttle.stats['waited']:.1f} 秒, "
+              f"429/503 {throttle.stats['throttled']} 回, 最小間隔 {throttle.base_interval or HOST_MIN_INTERVAL:.1f} 秒")
+
+def fetch(url, params=None, timeout=None, **kwargs):
+    """共有セッション経由でGETリクエストを送信する（ETag/Last-Modifiedによる条件付きGETでキャッシュを再利用）"""
+    timeout = timeout or HTTP_TIMEOUT
+    
+    if not HTTP_CACHE_ENABLED:
+        return throttled_get(url, params=params, timeout=timeout, **kwargs)
+    
+    cache_url = canonicalize_url(requests.Request("GET", url, params=params).prepare().url)
+    entry = _http_cache_load(cache_url)
+    
+    headers = dict(kwargs.pop("headers", None) or {})
+    if entry:
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+    
+    response = throttled_get(url, params=params, timeout=timeout, headers=headers, **kwargs)
+    
+    if response.status_code == 304 and entry:
+        _http_cache_count("hits")
+        return _http_cache_response(entry, response)
+    
+    _http_cache_count("misses")
+    if response.status_code == 200:
+        _http_cache_store(cache_url, response)
+    return response
+
+# --- HTTPレスポンスキャッシュ ---
+HTTP_CACHE_DIR = os.path.join(CACHE_DIR, "http")
+
+_http_cache_stats = {"hits": 0, "misses": 0, "stored": 0, "evicted": 0}
+_http_cache_lock = threading.Lock()
+
+def _http_cache_count(name, amount=1):
+    """キャッシュ統計を加算する"""
+    with _http_cache_lock:
+        _http_cache_stats[name] += amount
+
+def _http_cache_paths(cache_url):
+    """キャッシュエントリのメタデータと本文のパスを返す"""
+    key = hashlib.sha256(cache_url.encode("utf-8")).hexdigest()
+    return os.path.join(HTTP_CACHE_DIR, key + ".json"), os.path.join(HTTP_CACHE_DIR, key + ".body")
+
+def _http_cache_load(cache_url):
+    """キャッシュエントリを読み込む（期限切れや破損時はNone）"""
+    meta_path, body_path = _http_cache_paths(cache_url)
+    try:
+        with _http_cache_lock:  # 他のスレッドが置き換えている途中の組み合わせを読まないようにする
+            with open(meta_path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+            if time.time() - entry.get("stored_at", 0) > HTTP_CACHE_TTL_DAYS * 86400:
+                return None
+            with open(body_path, "rb") as f:
+                entry["body"] = f.read()
+        os.utime(meta_path)  # LRU判定用に最終利用時刻を更新
+        return entry
+    except (OSError, ValueError):
+        return None
+
+def _http_cache_write_temp(data):
+    """キャッシュディレクトリ内の一意な一時ファイルに書き込み、そのパスを返す"""
+    fd, path = tempfile.mkstemp(dir=HTTP_CACHE_DIR, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+    except OSError:
+        os.remove(path)
+        raise
+    return path
+
+def _http_cache_store(cache_url, response):
+    """検証子（ETag/Last-Modified）を持つ応答をキャッシュに保存する"""
+    etag = response.headers.get("ETag")
+    last_modified = response.headers.get("Last-Modified")
+    if not etag and not last_modified:
+        return
+    
+    meta_path, body_path = _http_cache_paths(cache_url)
+    entry = {
+        "url": cache_url,
+        "etag": etag,
+        "last_modified": last_modified,
+        "content_type": response.headers.get("Content-Type", ""),
+        "stored_at": time.time()
+    }
+    temp_paths = []
+    try:
+        os.makedirs(HTTP_CACHE_DIR, exist_ok=True)
+        # 書き込み途中のファイルを読まないように一時ファイル経由で置き換える
+        # （同じURLを複数のスレッドが保存しても、本文とETagの組み合わせがずれないように一時ファイルは別々にし、置き換えはロック内で行う）
+        temp_paths.append(_http_cache_write_temp(response.content))
+        temp_paths.append(_http_cache_write_temp(json.dumps(entry, ensure_ascii=False).encode("utf-8")))
+        with _http_cache_lock:
+            os.replace(temp_paths[0], body_path)
+            os.replace(temp_paths[1], meta_path)
+            _http_cache_stats["stored"] += 1
+    except OSError as e:
+        print(f"⚠️ HTTPキャッシュ保存エラー ({cache_url}): {e}")
+        for path in temp_paths:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+def _http_cache_response(entry, not_modified_response):
+    """304応答とキャッシュ本文から通常の200応答を組み立てる"""
+    response = requests.Response()
+    response.status_code = 200
+    response.reason = "OK"
+    response._content = entry["body"]
+    response.headers = CaseInsensitiveDict(not_modified_response.headers)
+    if entry.get("content_type"):
+        response.headers["Content-Type"] = entry["content_type"]
+    response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+    response.url = not_modified_response.url
+    response.request = not_modified_response.request
+    response.elapsed = not_modified_response.elapsed
+    response.from_cache = True
+    return response
+
+def prune_http_cache():
+    """期限切れのエントリを削除し、容量上限を超えた分を古い順に削除する"""
+    if not os.path.isdir(HTTP_CACHE_DIR):
+        return
+    
+    now = time.time()
+    entries = []
+    for name in os.listdir(HTTP_CACHE_DIR):
+        if not name.endswith(".json"):
+            continue
+        meta_path = os.path.join(HTTP_CACHE_DIR, name)
+        body_path = meta_path[:-len(".json")] + ".body"
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                stored_at = json.load(f).get("stored_at", 0)
+            size = os.path.getsize(body_path) if os.path.exists(body_path) else 0
+            entries.append((os.path.getmtime(meta_path), stored_at, size, meta_path, body_path))
+        except (OSError, ValueError):
+            entries.append((0, 0, 0, meta_path, body_path))
+    
+    max_bytes = HTTP_CACHE_MAX_MB * 1024 * 1024
+    total_bytes = sum(entry[2] for entry in entries)
+    
+    # 最終利用時刻が古い順に処理する
+    for last_used, stored_at, size, meta_path, body_path in sorted(entries):
+        expired = now - stored_at > HTTP_CACHE_TTL_DAYS * 86400
+        if not expired and total_bytes <= max_bytes:
+            continue
+        for path in (meta_path, body_path):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        total_bytes -= size
+        _http_cache_count("evicted")
+
+def print_http_cache_stats():
+    """HTTPキャッシュのヒット/ミス統計を表示する"""
+    if not HTTP_CACHE_ENABLED:
+        return
+    
+    stats = dict(_http_cache_stats)
+    total = stats["hits"] + stats["misses"]
+    hit_rate = stats["hits"] / total * 100 if total else 0
+    print(f"📊 HTTPキャッシュ: ヒット {stats['hits']} 件 / ミス {stats['misses']} 件 (ヒット率 {hit_rate:.1f}%), 保存 {stats['stored']} 件, 削除 {stats['evicted']} 件")
+
+def get_http_stats():
+    """ホストごとのリクエスト数・新規接続数・接続再利用数を集計する"""
+    stats = {}
+    if _http_session is None:
+        return stats
+    
+    for adapter in set(_http_session.adapters.values()):
+        if getattr(adapter, "poolmanager", None) is None:  # 再生用のアダプターには接続プールが無い
+            continue
+        pools = adapter.poolmanager.pools
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            host_stats = stats.setdefault(pool.host, {"requests": 0, "connections": 0, "reused": 0})
+            host_stats["requests"] += pool.num_requests
+            host_stats["connections"] += pool.num_connections
+            host_stats["reused"] += max(0, pool.num_requests - pool.num_connections)
+    
+    return stats
+
+def print_http_stats():
+    """接続再利用の統計を表示する"""
+    stats = get_http_stats()
+    if not stats:
+        return
+    
+    total_requests = sum(host_stats["requests"] for host_stats in stats.values())
+    total_reused = sum(host_stats["reused"] for host_stats in stats.values())
+    print(f"📊 HTTP接続統計: リクエスト {total_requests} 件 / 接続再利用 {total_reused} 件")
+    for host, host_stats in sorted(stats.items()):
+        print(f"  - {host}: リクエスト {host_stats['requests']} 件, 新規接続 {host_stats['connections']} 件, 再利用 {host_stats['reused']} 件")
+
 # --- スクレイピング関数 ---
-def scrape_jnet21_grants():
-    """J-Net21から長野県の補助金・助成金情報を取得する"""
+# --- J-Net21の既読記事（ページ送りの打ち切り判定用） ---
+JNET21_SEEN_PATH = os.path.join(CACHE_DIR, "jnet21_seen.json")
+
+def load_jnet21_seen():
+    """これまでに一覧で見かけたJ-Net21の記事URLを読み込む"""
+    try:
+        with open(JNET21_SEEN_PATH, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def save_jnet21_seen(keys):
+    """一覧で見かけた記事を既読として保存する（保持期間を過ぎたものは削除）
+    評価とスプレッドシートへの書き込みが終わってから呼ぶ（途中で失敗した記事を次回も取得できるように）"""
+    now = time.time()
+    seen = load_jnet21_seen()
+    seen.update((key, now) for key in keys)
+    seen = {url: seen_at for url, seen_at in seen.items() if now - seen_at <= JNET21_SEEN_RETENTION_DAYS * 86400}
+    try:
+        os.makedirs(os.path.dirname(JNET21_SEEN_PATH) or ".", exist_ok=True)
+        with open(JNET21_SEEN_PATH + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(seen, f, ensure_ascii=False)
+        os.replace(JNET21_SEEN_PATH + ".tmp", JNET21_SEEN_PATH)
+    except OSError as e:
+        print(f"❌ J-Net21既読記事の保存エラー: {e}")
+
+def fetch_jnet21_listing_page(page):
+    """J-Net21の記事一覧を1ページ取得し、(ステータスコード, 記事のリスト) を返す"""
     base_url = "https://j-net21.smrj.go.jp/snavi/articles"
     params = {
         "category[]": 2,  # 補助金・助成金・融資カテゴリ
         "order": "DESC",
         "perPage": 50,  # より多くの結果を取得
-        "page": 1
+        "page": page
     }
     
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-    }
+    response = fetch(base_url, params=params)
+    if response.status_code != 200:
+        return response.status_code, []
+    
+    response.encoding = response.apparent_encoding
+    soup = parse_html(response.text, parse_only=SoupStrainer(class_="m-panel-article"))  # 記事パネル部分だけを解析
+    
+    articles = []
+    for item in soup.select(".m-panel-article"):
+        # 記事タイトルを取得
+        title_elem = item.select_one(".m-panel-article__title")
+        if not title_elem or not title_elem.text:
+            continue
+        
+        # リンクを取得
+        link_elem = title_elem.find("a")
+        if not link_elem or not link_elem.get("href"):
+            continue
+        
+        # 日付要素を取得
+        date_elem = item.select_one(".m-panel-article__date")
+        
+        articles.append({
+            "title": title_elem.text.strip(),
+            "url": urljoin("https://j-net21.smrj.go.jp", link_elem.get("href")),  # 相対URLを絶対URLに変換
+            "date": date_elem.text.strip() if date_elem else "日付不明"
+        })
     
-    # 長野県関連キーワード
-    nagano_keywords = ['長野県', '長野市', '松本市', '上田市', '岡谷市', '飯田市', '諏訪市', '須坂市', '小諸市', 
-                     '伊那市', '駒ヶ根市', '中野市', '大町市', '飯山市', '茅野市', '塩尻市', '佐久市', '千曲市', 
-                     '東御市', '安曇野市', '長野']
+    return response.status_code, articles
+
+def scrape_jnet21_grants(include_national=True):
+    """J-Net21から長野県の補助金・助成金情報を取得し、(助成金リスト, 今回見かけた記事のURLキー) を返す
+    前回までに見た記事に到達するまでページを遡る。既読の記録は呼び出し側で処理が終わってから save_jnet21_seen で行う。
+    初回などで遡るページが多くても、ソースの締め切りが近づいたら取得できた分だけを返す（次回は続きから遡らずに済むように）。
+    include_national=Falseの場合は全国向け助成金情報（get_national_grants）を含めない"""
+    seen = load_jnet21_seen()
     
     print(f"🔍 J-Net21の補助金情報を検索中...")
     try:
-        response = requests.get(base_url, params=params, headers=headers, timeout=30)
-        if response.status_code == 200:
+        status_code, articles = fetch_jnet21_listing_page(1)
+        if status_code == 200:
             print(f"✅ J-Net21サイトアクセス成功")
-            response.encoding = response.apparent_encoding
-            soup = BeautifulSoup(response.text, "html.parser")
             
-            grants = []
+            # 新着順に並んでいるので、既読の記事が現れたページで打ち切る（初回は上限ページまで遡る）
+            page = 1
+            page_articles = articles
+            while (page_articles and page < JNET21_MAX_PAGES
+                   and not any(grant_url_key(article["url"]) in seen for article in page_articles)):
+                remaining = crawl_time_left()
+                if remaining is not None and remaining < JNET21_DETAIL_RESERVE:
+                    print(f"⏱️ J-Net21: 締め切りが近いため {page} ページ目で遡るのを打ち切ります（残り {remaining:.0f}秒）")
+                    break
+                page += 1
+                try:
+                    status_code, page_articles = fetch_jnet21_listing_page(page)
+                except Exception as e:
+                    print(f"❌ J-Net21 {page}ページ目の取得エラー: {e}")
+                    break
+                if status_code != 200:
+                    print(f"⚠️ J-Net21 {page}ページ目の取得失敗 (ステータスコード: {status_code})")
+                    break
+                articles.extend(page_articles)
             
-            # 記事アイテムを探す
-            article_items = soup.select(".m-panel-article")
+            grants = []
+            seen_keys = {grant_url_key(article["url"]) for article in articles}
             
-            if article_items:
-                print(f"✅ 補助金・助成金記事: {len(article_items)} 件見つかりました")
+            if articles:
+                print(f"✅ 補助金・助成金記事: {len(articles)} 件見つかりました（{page} ページを確認）")
+                candidates = []
                 
-                for item in article_items:
-                    # 記事タイトルを取得
-                    title_elem = item.select_one(".m-panel-article__title")
+                for article in articles:
+                    title = article["title"]
                     
-                    if title_elem and title_elem.text:
-                        title = title_elem.text.strip()
-                        
-                        # 長野県関連かどうか判定
-                        is_nagano_related = any(keyword in title for keyword in nagano_keywords)
-                        is_national = not any(prefecture in title for prefecture in ['北海道', '青森', '岩手', '宮城', '秋田', 
-                                                                                 '山形', '福島', '茨城', '栃木', '群馬', 
-                                                                                 '埼玉', '千葉', '東京', '神奈川', '新潟', 
-                                                                                 '富山', '石川', '福井', '山梨', '岐阜', 
-                                                                                 '静岡', '愛知', '三重', '滋賀', '京都', 
-                                                                                 '大阪', '兵庫', '奈良', '和歌山', '鳥取', 
-                                                                                 '島根', '岡山', '広島', '山口', '徳島', 
-                                                                                 '香川', '愛媛', '高知', '福岡', '佐賀', 
-                                                                                 '長崎', '熊本', '大分', '宮崎', '鹿児島', 
-                                                                                 '沖縄']) and '長野' not in title
-                        
-                        # 全国対象または長野県関連の補助金のみ抽出
-                        if is_nagano_related or is_national:
-                            # 日付要素を取得
-                            date_elem = item.select_one(".m-panel-article__date")
-                            date_text = date_elem.text.strip() if date_elem else "日付不明"
-                            
-                            # リンクを取得
-                            link_elem = title_elem.find("a")
-                            if link_elem and link_elem.get("href"):
-                                link = link_elem.get("href")
-                                
-                                # 相対URLを絶対URLに変換
-                                full_url = urljoin("https://j-net21.smrj.go.jp", link)
-                                
-                                # 詳細ページから情報を取得
-                                grant_details = scrape_grant_details(full_url)
-                                
-                                grant_info = {
-                                    "title": title,
-                                    "url": full_url,
-                                    "date": date_text,
-                                    "description": grant_details.get("description", "詳細は要確認"),
-                                    "deadline": grant_details.get("deadline", "要確認"),
-                                    "amount": grant_details.get("amount", "要確認"),
-                                    "ratio": grant_details.get("ratio", "要確認")
-                                }
-                                
-                                grants.append(grant_info)
-                                print(f"抽出: {title}")
+                    # 長野県関連かどうか判定（他の都道府県名が無ければ全国対象とみなす）
+                    hits = matched_groups(title, ("nagano", "prefecture"))
+                    is_nagano_related = "nagano" in hits
+                    is_national = "prefecture" not in hits and "nagano" not in hits
+                    
+                    # 全国対象または長野県関連の補助金のみ抽出
+                    if is_nagano_related or is_national:
+                        candidates.append((title, article["url"], article["date"]))
+                
+                # 詳細ページから情報を並列に取得（結果は記事の並び順を維持。締め切りに間に合うように少し早めに切り上げる）
+                details_list = run_with_crawl_margin(CRAWL_RETURN_MARGIN, scrape_grant_details_many,
+                                                     [full_url for _, full_url, _ in candidates])
+                
+                skipped = 0
+                for (title, full_url, date_text), grant_details in zip(candidates, details_list):
+                    # 締め切りで詳細を取得できなかった記事は今回は省く（既読にしないため、次回も一覧に出ていれば取得する）
+                    if grant_details is None:
+                        seen_keys.discard(grant_url_key(full_url))
+                        skipped += 1
+                        continue
+                    grant_info = {
+                        "title": title,
+                        "url": full_url,
+                        "date": date_text,
+                        "description": grant_details.get("description", "詳細は要確認"),
+                        "deadline": grant_details.get("deadline", "要確認"),
+                        "amount": grant_details.get("amount", "要確認"),
+                        "ratio": grant_details.get("ratio", "要確認")
+                    }
+                    
+                    grants.append(grant_info)
+                    print(f"抽出: {title}")
+                if skipped:
+                    print(f"⚠️ J-Net21: 締め切りまでに詳細を取得できなかった {skipped} 件を省きました")
             
             # 全国向け一般的な助成金情報も追加
-            national_grants = get_national_grants()
-            grants.extend(national_grants)
+            if include_national:
+                national_grants = get_national_grants()
+                grants.extend(national_grants)
             
-            return grants
+            return grants, seen_keys
         else:
-            print(f"❌ J-Net21サイトアクセス失敗 (ステータスコード: {response.status_code})")
+            print(f"❌ J-Net21サイトアクセス失敗 (ステータスコード: {status_code})")
     except Exception as e:
         print(f"❌ J-Net21サイト処理エラー: {e}")
     
     # エラー時にはバックアップとして国の一般的な助成金情報を返す
+    if not include_national:
+        return [], set()
     print("⚠️ J-Net21からの取得に失敗。一般的な助成金情報を使用します。")
-    return get_national_grants()
+    return get_national_grants(), set()
 
 def scrape_grant_details(url):
-    """補助金の詳細ページから情報を取得する"""
+    """補助金の詳細ページから情報を取得する（ソースの締め切りを過ぎて取得できなかった場合はNone）"""
     details = {
         "description": "",
         "deadline": "要確認",
@@ -194,73 +806,63 @@ def scrape_grant_details(url):
         "ratio": "要確認"
     }
     
-    try:
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        }
-        response = requests.get(url, headers=headers, timeout=30)
-        if response.status_code == 200:
-            response.encoding = response.apparent_encoding
-            soup = BeautifulSoup(response.text, "html.parser")
-            
-            # 詳細説明を取得
-            content_elem = soup.select_one(".m-article__content")
-            if content_elem:
-                details["description"] = content_elem.text.strip()[:200] + "..."  # 長すぎる場合は切り詰める
-            
-            # 締切日を探す
-            deadline_patterns = [
-                r'締切.*?[：:]\s*(.*?[0-9]{4}年[0-9]{1,2}月[0-9]{1,2}日)',
-                r'申込期限.*?[：:]\s*(.*?[0-9]{4}年[0-9]{1,2}月[0-9]{1,2}日)', 
-                r'募集期間.*?[：:]\s*(.*?まで)',
-                r'受付期間.*?[：:]\s*(.*?まで)',
-                r'([0-9]{4}年[0-9]{1,2}月[0-9]{1,2}日).*(締切|締め切り|〆切)',
-                r'([0-9]{4}年[0-9]{1,2}月[0-9]{1,2}日.*?まで)'
-            ]
-            
-            text_content = response.text
-            for pattern in deadline_patterns:
-                match = re.search(pattern, text_content)
-                if match:
-                    details["deadline"] = match.group(1).strip()
-                    break
-            
-            # 補助金額を探す
-            amount_patterns = [
-                r'補助額.*?[：:]\s*(.*?円)',
-                r'助成額.*?[：:]\s*(.*?円)',
-                r'補助金額.*?[：:]\s*(.*?円)',
-                r'上限.*?([0-9,]+万円)',
-                r'上限額.*?([0-9,]+万円)',
-                r'([0-9,]+万円).*?上限'
-            ]
-            
-            for pattern in amount_patterns:
-                match = re.search(pattern, text_content)
-                if match:
-                    details["amount"] = match.group(1).strip()
-                    break
-            
-            # 補助率を探す
-            ratio_patterns = [
-                r'補助率.*?[：:]\s*(.*?分の.*?)',
-                r'助成率.*?[：:]\s*(.*?分の.*?)',
-                r'([0-9]/[0-9]以内)',
-                r'([0-9]分の[0-9]以内)',
-                r'補助率.*(最大[0-9]{1,2}%)'
-            ]
-            
-            for pattern in ratio_patterns:
-                match = re.search(pattern, text_content)
-                if match:
-                    details["ratio"] = match.group(1).strip()
-                    break
-            
-    except Exception as e:
-        print(f"❌ 詳細ページの取得エラー: {e}")
+    with TRACER.span("detail", url) as span, stage_profiler.stage("detail", urlparse(url).netloc):
+        try:
+            response = fetch(url)
+            span.set(status=response.status_code, bytes=len(response.content or b""))
+            if response.status_code == 200:
+                response.encoding = response.apparent_encoding
+                soup = parse_html(response.text, parse_only=SoupStrainer("body"))  # head内のスクリプト等は解析しない
+                
+                # 詳細説明を取得
+                content_elem = soup.select_one(".m-article__content")
+                if content_elem:
+                    details["description"] = content_elem.text.strip()[:200] + "..."  # 長すぎる場合は切り詰める
+                
+                # HTML全体ではなく本文テキストから締切日・補助金額・補助率を抽出
+                details.update(extract_grant_fields(page_text(soup)))
+                
+        except CrawlDeadlineExceeded as e:
+            span.error = str(e)  # 呼び出し側で取得できなかったものとして扱うため表示しない
+            return None
+        except Exception as e:
+            span.error = str(e)
+            print(f"❌ 詳細ページの取得エラー: {e}")
     
     return details
 
+# --- 詳細ページ並列取得 ---
+def scrape_grant_details_many(urls, max_workers=None):
+    """複数の詳細ページを並列に取得し、入力と同じ順序で結果を返す（失敗時はNone）
+    ホストごとの同時接続数とリクエスト間隔はfetch側の巡回制御で守られる"""
+    if not urls:
+        return []
+    
+    # 正規化すると同じになるURLは1回だけ取得する
+    unique_urls = {}
+    for url in urls:
+        unique_urls.setdefault(grant_url_key(url), url)
+    
+    workers = max(1, min(max_workers or DETAIL_FETCH_WORKERS, len(unique_urls)))
+    limit = get_crawl_limit()  # 呼び出し元のソースの締め切りをワーカーに引き継ぐ
+    
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {key: executor.submit(run_with_crawl_limit, limit, scrape_grant_details, url) for key, url in unique_urls.items()}
+        
+        details_by_key = {}
+        for key, future in futures.items():
+            try:
+                details_by_key[key] = future.result()
+            except Exception as e:
+                print(f"❌ 詳細ページの取得エラー ({unique_urls[key]}): {e}")
+                details_by_key[key] = None
+    
+    results = []
+    for url in urls:
+        details = details_by_key[grant_url_key(url)]
+        results.append(dict(details) if details is not None else None)
+    return results
+
 # --- 全国向け助成金情報取得関数 ---
 def get_national_grants():
     """全国向けの主要助成金情報をWebサイトから動的に取得する"""
@@ -269,16 +871,12 @@ def get_national_grants():
     # IT導入補助金の情報を取得
     try:
         print("🔍 IT導入補助金の情報を取得中...")
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        }
-        
         # IT導入補助金2025の情報を取得
         it_hojo_url = "https://it-shien.smrj.go.jp/schedule/"
-        response = requests.get(it_hojo_url, headers=headers, timeout=30)
+        response = fetch(it_hojo_url)
         
         if response.status_code == 200:
-            soup = BeautifulSoup(response.text, "html.parser")
+            soup = parse_html(response.text, parse_only=SoupStrainer(class_="schedule-table"))
             
             # スケジュール情報を取得
             schedule_tables = soup.select(".schedule-table")
@@ -294,10 +892,10 @@ def get_national_grants():
             
             # ニュース情報からも詳細を取得
             news_url = "https://it-shien.smrj.go.jp/news/20287"  # IT導入補助金2025概要ニュース
-            news_response = requests.get(news_url, headers=headers, timeout=30)
+            news_response = fetch(news_url)
             
             if news_response.status_code == 200:
-                news_soup = BeautifulSoup(news_response.text, "html.parser")
+                news_soup = parse_html(news_response.text, parse_only=SoupStrainer(class_="m-article__content"))
                 news_content = news_soup.select_one(".m-article__content")
                 
                 if news_content:
@@ -337,10 +935,10 @@ def get_national_grants():
         
         # 事業再構築補助金の情報を取得
         jigyou_saikouchiku_url = "https://jigyou-saikouchiku.go.jp/"
-        response = requests.get(jigyou_saikouchiku_url, headers=headers, timeout=30)
+        response = fetch(jigyou_saikouchiku_url)
         
         if response.status_code == 200:
-            soup = BeautifulSoup(response.text, "html.parser")
+            soup = parse_html(response.text, parse_only=SoupStrainer(class_="news-list"))
             
             # ニュース情報からデッドラインを取得
             news_items = soup.select(".news-list li")
@@ -395,12 +993,9 @@ def get_national_grants():
         
         for url in nagano_urls:
             try:
-                headers = {
-                    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-                }
-                response = requests.get(url, headers=headers, timeout=30)
+                response = fetch(url)
                 if response.status_code == 200:
-                    soup = BeautifulSoup(response.text, "html.parser")
+                    soup = parse_html(response.text)
                     
                     # タイトルを取得
                     title_elem = soup.select_one("h1") or soup.select_one("h2")
@@ -410,51 +1005,11 @@ def get_national_grants():
                     content_elem = soup.select_one("#main-contents") or soup.select_one("#tmp_contents")
                     content_text = content_elem.text if content_elem else ""
                     
-                    # 締め切りを検索
-                    deadline_patterns = [
-                        r'締切.*?[：:]\s*(.*?[0-9]{4}年[0-9]{1,2}月[0-9]{1,2}日)',
-                        r'申込期限.*?[：:]\s*(.*?[0-9]{4}年[0-9]{1,2}月[0-9]{1,2}日)', 
-                        r'募集期間.*?[：:]\s*(.*?まで)',
-                        r'受付期間.*?[：:]\s*(.*?まで)',
-                        r'([0-9]{4}年[0-9]{1,2}月[0-9]{1,2}日).*(締切|締め切り|〆切)'
-                    ]
-                    
-                    deadline = "要確認"
-                    for pattern in deadline_patterns:
-                        match = re.search(pattern, content_text)
-                        if match:
-                            deadline = match.group(1).strip()
-                            break
-                    
-                    # 補助金額を検索
-                    amount_patterns = [
-                        r'補助額.*?[：:]\s*(.*?円)',
-                        r'助成額.*?[：:]\s*(.*?円)',
-                        r'補助金額.*?[：:]\s*(.*?円)',
-                        r'上限.*?([0-9,]+万円)'
-                    ]
-                    
-                    amount = "要確認"
-                    for pattern in amount_patterns:
-                        match = re.search(pattern, content_text)
-                        if match:
-                            amount = match.group(1).strip()
-                            break
-                    
-                    # 補助率を検索
-                    ratio_patterns = [
-                        r'補助率.*?[：:]\s*(.*?分の.*?)',
-                        r'助成率.*?[：:]\s*(.*?分の.*?)',
-                        r'([0-9]/[0-9]以内)',
-                        r'([0-9]分の[0-9]以内)'
-                    ]
-                    
-                    ratio = "要確認"
-                    for pattern in ratio_patterns:
-                        match = re.search(pattern, content_text)
-                        if match:
-                            ratio = match.group(1).strip()
-                            break
+                    # 締め切り・補助金額・補助率を抽出
+                    fields = extract_grant_fields(re.sub(r'\s+', ' ', content_text))
+                    deadline = fields.get("deadline", "要確認")
+                    amount = fields.get("amount", "要確認")
+                    ratio = fields.get("ratio", "要確認")
                     
                     # 説明文を生成
                     description = content_text[:200].replace("\n", " ").strip() + "..." if content_text else "長野県の補助金制度"
@@ -491,625 +1046,1006 @@ def get_national_grants():
     
     return national_grants
 
-# --- 追加情報ソース関数 ---
-def scrape_additional_sources():
-    """追加の情報ソースから助成金情報を取得する（改善版）"""
-    additional_grants = []
-    previous_grants = 0
-    
-    # ミラサポplus（中小企業庁の総合支援サイト）から情報取得
-    try:
-        print("🔍 ミラサポplusの情報を取得中...")
-        mirasapo_url = "https://mirasapo-plus.go.jp/subsidy/"
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        }
-        
-        response = requests.get(mirasapo_url, headers=headers, timeout=30)
-        if response.status_code == 200:
-            soup = BeautifulSoup(response.text, "html.parser")
-            
-            # 補助金・助成金の一覧を取得
-            subsidy_items = soup.select(".subsidy-item") or soup.select(".list_subsidy li") or soup.select(".contents-list li")
-            
-            for item in subsidy_items:
-                title_elem = item.select_one(".subsidy-item-title") or item.select_one("h3") or item.select_one("a") or item.select_one(".title")
-                if not title_elem:
-                    continue
-                
-                title = title_elem.text.strip()
-                
-                # URLを取得
-                link_elem = title_elem if title_elem.name == "a" else title_elem.find("a") or item.find("a")
-                if not link_elem or not link_elem.get("href"):
-                    continue
-                    
-                url = link_elem.get("href")
-                if not url.startswith("http"):
-                    url = urljoin("https://mirasapo-plus.go.jp", url)
-                
-                # 詳細ページの情報を取得してみる
-                try:
-                    details = scrape_grant_details(url)
-                    description = details.get("description", "")
-                    deadline = details.get("deadline", "")
-                    amount = details.get("amount", "")
-                    ratio = details.get("ratio", "")
-                except:
-                    # 詳細ページの取得に失敗した場合は、リスト内の情報だけで進める
-                    description = ""
-                    deadline = ""
-                    amount = ""
-                    ratio = ""
-                
-                # リスト内の情報を取得（詳細ページの取得に失敗した場合の代替情報）
-                if not description:
-                    desc_elem = item.select_one(".subsidy-item-description") or item.select_one("p") or item.select_one(".text")
-                    if desc_elem:
-                        description = desc_elem.text.strip()
-                
-                # 締め切りを取得
-                if not deadline:
-                    deadline_elem = item.select_one(".subsidy-item-deadline") or item.select_one(".date") or item.select_one(".period")
-                    if deadline_elem:
-                        deadline = deadline_elem.text.strip()
-                
-                # 金額情報を取得
-                if not amount:
-                    amount_elem = item.select_one(".subsidy-item-amount") or item.select_one(".money") or item.select_one(".price")
-                    if amount_elem:
-                        amount = amount_elem.text.strip()
-                
-                # 詳細情報が取得できなかった場合のフォールバック
-                if not description:
-                    description = f"{title}に関する補助金・助成金制度"
-                if not deadline:
-                    deadline = "詳細はWebサイトで確認"
-                if not amount:
-                    amount = "詳細はWebサイトで確認"
-                if not ratio:
-                    ratio = "詳細はWebサイトで確認"
-                
-                # 助成金情報を追加
-                additional_grants.append({
-                    "title": title,
-                    "url": url,
-                    "date": datetime.datetime.now().strftime('%Y年%m月%d日'),
-                    "description": description,
-                    "deadline": deadline,
-                    "amount": amount,
-                    "ratio": ratio
-                })
-            
-            print(f"✅ ミラサポplusから{len(additional_grants)}件の助成金情報を取得しました")
-    except Exception as e:
-        print(f"❌ ミラサポplus情報取得エラー: {e}")
-    
-    # 経済産業省の補助金総合サイトから情報取得 - 改善版
-    try:
-        print("🔍 経済産業省の補助金情報を取得中...")
-        meti_urls = [
+# --- 追加情報ソースの定義 ---
+# 各サイトの一覧ページの構造と、項目が取れなかった場合の既定値
+#   urls: 一覧ページ / base_url: 相対URLの基準 / encoding: 文字コードを固定する場合に指定
+#   item_selectors: 項目の候補セレクタ（最初に見つかったものを使用）
+#   title_selectors: 項目内のタイトル候補（Noneなら項目自体をタイトル・リンクとして扱う）
+#   prefer_item_link: タイトル内より先に項目内の最初のリンクを使う / default_url: リンクが無い場合のURL（無ければ項目を除外）
+#   title_min_length, title_keywords, item_keywords: タイトル・項目テキストによる絞り込み
+#   fetch_details: 詳細ページから説明・締切・金額・補助率を取得する
+#   list_fields: 詳細ページから取れなかった項目を一覧内から拾うセレクタ
+#   description_from_item: 一覧の項目テキスト（タイトルを除く）を説明に使う
+#   deadline_from_text: 説明文中の日付から締切を拾う
+#   date_selectors: 掲載日のセレクタ（無ければ実行日）
+#   title_template, description_limit: タイトルの整形と説明文の最大文字数
+#   defaults: 最終的に値が無い項目の既定値（{title}はタイトルに置換） / fallback_grants: 項目が1件も無い場合に使う情報
+ADDITIONAL_SOURCES = [
+    {
+        "name": "ミラサポplus",  # 中小企業庁の総合支援サイト
+        "urls": ["https://mirasapo-plus.go.jp/subsidy/"],
+        "base_url": "https://mirasapo-plus.go.jp",
+        "item_selectors": [".subsidy-item", ".list_subsidy li", ".contents-list li"],
+        "title_selectors": [".subsidy-item-title", "h3", "a", ".title"],
+        "fetch_details": True,
+        "list_fields": {
+            "description": [".subsidy-item-description", "p", ".text"],
+            "deadline": [".subsidy-item-deadline", ".date", ".period"],
+            "amount": [".subsidy-item-amount", ".money", ".price"]
+        },
+        "defaults": {"description": "{title}に関する補助金・助成金制度"}
+    },
+    {
+        "name": "経済産業省",
+        "urls": [
             "https://www.meti.go.jp/policy/hojyokin/index.html",
             "https://www.meti.go.jp/information/publicoffer/kobo.html"  # 公募情報のページも追加
-        ]
-        
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        }
-        
-        previous_grants = len(additional_grants)
-        
-        for meti_url in meti_urls:
-            try:
-                response = requests.get(meti_url, headers=headers, timeout=30)
-                if response.status_code == 200:
-                    response.encoding = 'utf-8'  # 経産省サイトは文字コード指定が必要な場合がある
-                    soup = BeautifulSoup(response.text, "html.parser")
-                    
-                    # 補助金・助成金の一覧を取得（経産省サイトの構造に合わせて調整）
-                    subsidy_links = soup.select("a[href*='hojyo']") or soup.select("a[href*='subsidy']") or soup.select("a[href*='kobo']") or soup.select(".subsidy") or soup.select(".news-list a")
-                    
-                    for link in subsidy_links:
-                        title = link.text.strip()
-                        if not title or len(title) < 5:  # 短すぎるタイトルは除外
-                            continue
-                        
-                        # 助成金・補助金に関連するキーワードが含まれるものだけを対象にする
-                        if not any(keyword in title.lower() for keyword in ['補助', '助成', '支援', '給付', '交付', '公募', '募集']):
-                            continue
-                        
-                        url = link.get("href")
-                        if not url:
-                            continue
-                            
-                        if not url.startswith("http"):
-                            url = urljoin("https://www.meti.go.jp", url)
-                        
-                        # 詳細ページの情報を取得してみる
-                        try:
-                            details = scrape_grant_details(url)
-                            description = details.get("description", "")
-                            deadline = details.get("deadline", "")
-                            amount = details.get("amount", "")
-                            ratio = details.get("ratio", "")
-                        except:
-                            # 詳細ページの取得に失敗した場合
-                            description = "経済産業省の助成金・補助金制度"
-                            deadline = "詳細はWebサイトで確認"
-                            amount = "詳細はWebサイトで確認"
-                            ratio = "詳細はWebサイトで確認"
-                        
-                        # 詳細情報が取得できなかった場合のフォールバック
-                        if not description:
-                            description = "経済産業省の助成金・補助金制度"
-                        if not deadline:
-                            deadline = "詳細はWebサイトで確認"
-                        if not amount:
-                            amount = "詳細はWebサイトで確認"
-                        if not ratio:
-                            ratio = "詳細はWebサイトで確認"
-                        
-                        # 助成金情報を追加
-                        additional_grants.append({
-                            "title": title,
-                            "url": url,
-                            "date": datetime.datetime.now().strftime('%Y年%m月%d日'),
-                            "description": description,
-                            "deadline": deadline,
-                            "amount": amount,
-                            "ratio": ratio
-                        })
-            except Exception as e:
-                print(f"❌ 経済産業省情報取得エラー ({meti_url}): {e}")
-        
-        print(f"✅ 経済産業省から{len(additional_grants) - previous_grants}件の助成金情報を取得しました")
-    except Exception as e:
-        print(f"❌ 経済産業省情報取得エラー: {e}")
-        
-    # GビズIDポータルから助成金情報を取得
-    try:
-        print("🔍 GビズIDポータルの情報を取得中...")
-        gbiz_url = "https://gbiz-id.go.jp/subsidies/"
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        }
-        
-        response = requests.get(gbiz_url, headers=headers, timeout=30)
-        if response.status_code == 200:
-            soup = BeautifulSoup(response.text, "html.parser")
-            previous_grants = len(additional_grants)
-            
-            # 補助金・助成金の一覧を取得
-            subsidy_items = soup.select(".subsidy-item") or soup.select(".subsidy-list li") or soup.select("li.subsidy") or soup.select("div.subsidy")
-            
-            for item in subsidy_items:
-                title_elem = item.select_one(".subsidy-title") or item.select_one("h3") or item.select_one("strong") or item.select_one("a")
-                if not title_elem:
-                    continue
-                
-                title = title_elem.text.strip()
-                
-                # URLを取得
-                link_elem = item.select_one("a") or (title_elem if title_elem.name == "a" else None)
-                if not link_elem or not link_elem.get("href"):
-                    continue
-                    
-                url = link_elem.get("href")
-                if not url.startswith("http"):
-                    url = urljoin("https://gbiz-id.go.jp", url)
-                
-                # 詳細ページの情報を取得してみる
-                try:
-                    details = scrape_grant_details(url)
-                    description = details.get("description", "")
-                    deadline = details.get("deadline", "")
-                    amount = details.get("amount", "")
-                    ratio = details.get("ratio", "")
-                except:
-                    # 詳細ページの取得に失敗した場合
-                    description = ""
-                    deadline = ""
-                    amount = ""
-                    ratio = ""
-                
-                # リスト内の情報を取得
-                if not description:
-                    desc_elem = item.select_one(".subsidy-description") or item.select_one("p") or item.select_one(".description")
-                    if desc_elem:
-                        description = desc_elem.text.strip()
-                
-                # 締め切りを取得
-                if not deadline:
-                    deadline_elem = item.select_one(".deadline") or item.select_one(".subsidy-deadline") or item.select_one(".date")
-                    if deadline_elem:
-                        deadline = deadline_elem.text.strip()
-                
-                # 金額情報を取得
-                if not amount:
-                    amount_elem = item.select_one(".subsidy-amount") or item.select_one(".amount")
-                    if amount_elem:
-                        amount = amount_elem.text.strip()
-                
-                # 詳細情報が取得できなかった場合のフォールバック
-                if not description:
-                    description = f"GビズID対応の{title}に関する助成金制度"
-                if not deadline:
-                    deadline = "詳細はWebサイトで確認"
-                if not amount:
-                    amount = "詳細はWebサイトで確認"
-                if not ratio:
-                    ratio = "詳細はWebサイトで確認"
-                
-                # 助成金情報を追加
-                additional_grants.append({
-                    "title": title,
-                    "url": url,
-                    "date": datetime.datetime.now().strftime('%Y年%m月%d日'),
-                    "description": description,
-                    "deadline": deadline,
-                    "amount": amount,
-                    "ratio": ratio
-                })
-            
-            print(f"✅ GビズIDポータルから{len(additional_grants) - previous_grants}件の助成金情報を取得しました")
-    except Exception as e:
-        print(f"❌ GビズIDポータル情報取得エラー: {e}")
-    
-    # 長野県中小企業振興センターの情報取得
-    try:
-        print("🔍 長野県中小企業振興センターの情報を取得中...")
-        nagano_center_urls = [
+        ],
+        "base_url": "https://www.meti.go.jp",
+        "encoding": "utf-8",  # 経産省サイトは文字コード指定が必要な場合がある
+        "item_selectors": ["a[href*='hojyo']", "a[href*='subsidy']", "a[href*='kobo']", ".subsidy", ".news-list a"],
+        "title_selectors": None,
+        "title_min_length": 5,  # 短すぎるタイトルは除外
+        "title_keywords": ['補助', '助成', '支援', '給付', '交付', '公募', '募集'],
+        "fetch_details": True,
+        "defaults": {"description": "経済産業省の助成金・補助金制度"}
+    },
+    {
+        "name": "GビズIDポータル",
+        "urls": ["https://gbiz-id.go.jp/subsidies/"],
+        "base_url": "https://gbiz-id.go.jp",
+        "item_selectors": [".subsidy-item", ".subsidy-list li", "li.subsidy", "div.subsidy"],
+        "title_selectors": [".subsidy-title", "h3", "strong", "a"],
+        "prefer_item_link": True,
+        "fetch_details": True,
+        "list_fields": {
+            "description": [".subsidy-description", "p", ".description"],
+            "deadline": [".deadline", ".subsidy-deadline", ".date"],
+            "amount": [".subsidy-amount", ".amount"]
+        },
+        "defaults": {"description": "GビズID対応の{title}に関する助成金制度"}
+    },
+    {
+        "name": "長野県中小企業振興センター",
+        "urls": [
             "https://www.nice-nagano.or.jp/topics/",
             "https://www.nice-nagano.or.jp/business/"  # ビジネス支援情報も追加
-        ]
-        
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        }
-        
-        previous_grants = len(additional_grants)
-        
-        for nagano_center_url in nagano_center_urls:
-            try:
-                response = requests.get(nagano_center_url, headers=headers, timeout=30)
-                if response.status_code == 200:
-                    soup = BeautifulSoup(response.text, "html.parser")
-                    
-                    # 補助金・助成金の一覧を取得（サイト構造に合わせて調整）
-                    subsidy_items = soup.select(".topics-list li") or soup.select(".news-list li") or soup.select("article") or soup.select(".post")
-                    
-                    for item in subsidy_items:
-                        # 補助金・助成金に関連する項目のみを抽出
-                        item_text = item.text.lower()
-                        if not any(keyword in item_text for keyword in ['補助', '助成', '支援金', '給付金', '助金']):
-                            continue
-                        
-                        title_elem = item.select_one("h3") or item.select_one("h4") or item.select_one("a") or item.select_one("strong") or item.select_one(".title")
-                        if not title_elem:
-                            continue
-                        
-                        title = title_elem.text.strip()
-                        
-                        # URLを取得
-                        link_elem = title_elem if title_elem.name == "a" else item.select_one("a")
-                        if not link_elem or not link_elem.get("href"):
-                            continue
-                            
-                        url = link_elem.get("href")
-                        if not url.startswith("http"):
-                            url = urljoin("https://www.nice-nagano.or.jp", url)
-                        
-                        # 詳細情報を取得
-                        description = item.text.strip()
-                        if title in description:
-                            description = description.replace(title, "").strip()
-                        
-                        # 日付を抽出
-                        date_elem = item.select_one(".date") or item.select_one("time") or item.select_one(".publish-date")
-                        date_text = date_elem.text.strip() if date_elem else ""
-                        
-                        # 締め切りを抽出（詳細ページから取得を試みる）
-                        try:
-                            details = scrape_grant_details(url)
-                            detail_description = details.get("description", "")
-                            if detail_description:
-                                description = detail_description  # 詳細ページからの説明を使用
-                            
-                            deadline = details.get("deadline", "")
-                            amount = details.get("amount", "")
-                            ratio = details.get("ratio", "")
-                        except:
-                            # 詳細ページの取得に失敗した場合
-                            deadline = ""
-                            amount = ""
-                            ratio = ""
-                        
-                        # リスト内のテキストから締め切りを探す（詳細ページから取得できなかった場合）
-                        if not deadline:
-                            deadline_match = re.search(r'([0-9]{4}年[0-9]{1,2}月[0-9]{1,2}日).*(締切|締め切り|〆切|まで)', description)
-                            if deadline_match:
-                                deadline = deadline_match.group(1)
-                            else:
-                                deadline = "詳細はWebサイトで確認"
-                        
-                        # 詳細情報が取得できなかった場合のフォールバック
-                        if not amount:
-                            amount = "詳細はWebサイトで確認"
-                        if not ratio:
-                            ratio = "詳細はWebサイトで確認"
-                        
-                        # 助成金情報を追加
-                        additional_grants.append({
-                            "title": title,
-                            "url": url,
-                            "date": date_text if date_text else datetime.datetime.now().strftime('%Y年%m月%d日'),
-                            "description": description[:200] + "..." if len(description) > 200 else description,
-                            "deadline": deadline,
-                            "amount": amount,
-                            "ratio": ratio
-                        })
-            except Exception as e:
-                print(f"❌ 長野県中小企業振興センター情報取得エラー ({nagano_center_url}): {e}")
-        
-        print(f"✅ 長野県中小企業振興センターから{len(additional_grants) - previous_grants}件の助成金情報を取得しました")
-    except Exception as e:
-        print(f"❌ 長野県中小企業振興センター情報取得エラー: {e}")
-    
-    # 日本商工会議所の情報取得
-    try:
-        print("🔍 日本商工会議所の助成金情報を取得中...")
-        jcci_urls = [
+        ],
+        "base_url": "https://www.nice-nagano.or.jp",
+        "item_selectors": [".topics-list li", ".news-list li", "article", ".post"],
+        "title_selectors": ["h3", "h4", "a", "strong", ".title"],
+        "item_keywords": ['補助', '助成', '支援金', '給付金', '助金'],
+        "fetch_details": True,
+        "description_from_item": True,
+        "deadline_from_text": True,
+        "date_selectors": [".date", "time", ".publish-date"],
+        "description_limit": 200
+    },
+    {
+        "name": "日本商工会議所",
+        "urls": [
             "https://www.jcci.or.jp/news/",
             "https://www.jcci.or.jp/sme/"  # 中小企業支援情報も追加
-        ]
+        ],
+        "base_url": "https://www.jcci.or.jp",
+        "item_selectors": [".news-list li", ".news-item", "article", ".post"],
+        "title_selectors": ["h3", "h4", "a", ".title"],
+        "item_keywords": ['補助', '助成', '支援金', '給付金', '公募'],
+        "fetch_details": True,
+        "date_selectors": [".date", "time"],
+        "defaults": {"description": "日本商工会議所からの情報提供"}
+    },
+    {
+        "name": "ものづくり補助金",
+        "urls": ["https://portal.monodukuri-hojo.jp/"],
+        "base_url": "https://portal.monodukuri-hojo.jp/",
+        "item_selectors": [".info-block", ".news-block", "article"],
+        "title_selectors": ["h3", "h4", ".title"],
+        "title_keywords": ["公募", "募集", "申請"],
+        "default_url": "https://portal.monodukuri-hojo.jp/",
+        "description_from_item": True,
+        "deadline_from_text": True,
+        "title_template": "ものづくり・商業・サービス生産性向上促進補助金（{title}）",
+        "description_limit": 200,
+        "defaults": {
+            "amount": "最大1,000万円～2,000万円（類型による）",
+            "ratio": "1/2〜2/3（小規模事業者は2/3）"
+        },
+        "fallback_grants": [{
+            "title": "ものづくり・商業・サービス生産性向上促進補助金",
+            "url": "https://portal.monodukuri-hojo.jp/",
+            "description": "中小企業・小規模事業者等が取り組む革新的サービス開発・試作品開発・生産プロセスの改善を行うための設備投資等を支援する補助金制度",
+            "deadline": "詳細はWebサイトで確認",
+            "amount": "最大1,000万円～2,000万円（類型による）",
+            "ratio": "1/2〜2/3（小規模事業者は2/3）"
+        }]
+    }
+]
+
+SOURCE_FIELD_DEFAULT = "詳細はWebサイトで確認"
+
+def _select_first(elem, selectors):
+    """候補セレクタを順に試し、最初に見つかった要素を返す"""
+    for selector in selectors:
+        found = elem.select_one(selector)
+        if found:
+            return found
+    return None
+
+def _select_all_first(soup, selectors):
+    """候補セレクタを順に試し、最初に要素が見つかったセレクタの全要素を返す"""
+    for selector in selectors:
+        found = soup.select(selector)
+        if found:
+            return found
+    return []
+
+def _parse_source_items(source, soup):
+    """一覧ページから (タイトル, URL, 項目要素) の候補を抜き出す"""
+    candidates = []
+    
+    for item in _select_all_first(soup, source["item_selectors"]):
+        # 項目テキストで絞り込み
+        if source.get("item_keywords") and not any(keyword in item.text.lower() for keyword in source["item_keywords"]):
+            continue
         
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        }
+        # タイトルを取得
+        title_selectors = source.get("title_selectors")
+        title_elem = item if title_selectors is None else _select_first(item, title_selectors)
+        if not title_elem:
+            continue
         
-        previous_grants = len(additional_grants)
+        title = title_elem.text.strip()
+        if len(title) < source.get("title_min_length", 1):
+            continue
+        if source.get("title_keywords") and not any(keyword in title.lower() for keyword in source["title_keywords"]):
+            continue
         
-        for jcci_url in jcci_urls:
-            try:
-                response = requests.get(jcci_url, headers=headers, timeout=30)
-                if response.status_code == 200:
-                    soup = BeautifulSoup(response.text, "html.parser")
-                    
-                    # ニュース一覧から補助金・助成金関連の情報を取得
-                    news_items = soup.select(".news-list li") or soup.select(".news-item") or soup.select("article") or soup.select(".post")
-                    
-                    for item in news_items:
-                        # 補助金・助成金に関連する項目のみを抽出
-                        item_text = item.text.lower()
-                        if not any(keyword in item_text for keyword in ['補助', '助成', '支援金', '給付金', '公募']):
-                            continue
-                        
-                        # タイトルを取得
-                        title_elem = item.select_one("h3") or item.select_one("h4") or item.select_one("a") or item.select_one(".title")
-                        if not title_elem:
-                            continue
-                        
-                        title = title_elem.text.strip()
-                        
-                        # URLを取得
-                        link_elem = title_elem if title_elem.name == "a" else item.select_one("a")
-                        if not link_elem or not link_elem.get("href"):
-                            continue
-                            
-                        url = link_elem.get("href")
-                        if not url.startswith("http"):
-                            url = urljoin("https://www.jcci.or.jp", url)
-                        
-                        # 詳細ページから情報を取得
-                        try:
-                            details = scrape_grant_details(url)
-                            description = details.get("description", "")
-                            deadline = details.get("deadline", "")
-                            amount = details.get("amount", "")
-                            ratio = details.get("ratio", "")
-                        except:
-                            # 詳細ページの取得に失敗した場合
-                            description = "日本商工会議所からの情報提供"
-                            deadline = "詳細はWebサイトで確認"
-                            amount = "詳細はWebサイトで確認"
-                            ratio = "詳細はWebサイトで確認"
-                        
-                        # 詳細情報が取得できなかった場合のフォールバック
-                        if not description:
-                            description = "日本商工会議所からの情報提供"
-                        if not deadline:
-                            deadline = "詳細はWebサイトで確認"
-                        if not amount:
-                            amount = "詳細はWebサイトで確認"
-                        if not ratio:
-                            ratio = "詳細はWebサイトで確認"
-                        
-                        # 日付を取得
-                        date_elem = item.select_one(".date") or item.select_one("time")
-                        date_text = date_elem.text.strip() if date_elem else datetime.datetime.now().strftime('%Y年%m月%d日')
-                        
-                        # 助成金情報を追加
-                        additional_grants.append({
-                            "title": title,
-                            "url": url,
-                            "date": date_text,
-                            "description": description,
-                            "deadline": deadline,
-                            "amount": amount,
-                            "ratio": ratio
-                        })
-            except Exception as e:
-                print(f"❌ 日本商工会議所情報取得エラー ({jcci_url}): {e}")
+        # URLを取得
+        title_link = title_elem if title_elem.name == "a" else title_elem.find("a")
+        item_link = item if item.name == "a" else item.find("a")
+        link_elem = (item_link or title_link) if source.get("prefer_item_link") else (title_link or item_link)
+        if link_elem and link_elem.get("href"):
+            url = link_elem.get("href")
+            if not url.startswith("http"):
+                url = urljoin(source["base_url"], url)
+        elif source.get("default_url"):
+            url = source["default_url"]
+        else:
+            continue
         
-        print(f"✅ 日本商工会議所から{len(additional_grants) - previous_grants}件の助成金情報を取得しました")
-    except Exception as e:
-        print(f"❌ 日本商工会議所情報取得エラー: {e}")
+        candidates.append((title, url, item))
     
-    # ものづくり補助金公式サイトの情報取得
-    try:
-        print("🔍 ものづくり補助金の情報を取得中...")
-        monodukuri_url = "https://portal.monodukuri-hojo.jp/"
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        }
-        
-        response = requests.get(monodukuri_url, headers=headers, timeout=30)
-        if response.status_code == 200:
-            soup = BeautifulSoup(response.text, "html.parser")
-            previous_grants = len(additional_grants)
+    return candidates
+
+def _build_source_grant(source, title, url, item, details):
+    """一覧の項目と詳細ページの情報から助成金情報を組み立てる"""
+    details = details or {}
+    list_fields = source.get("list_fields", {})
+    
+    # 一覧の項目テキスト（タイトル部分を除く）
+    item_text = item.text.strip()
+    if title in item_text:
+        item_text = item_text.replace(title, "").strip()
+    
+    grant = {}
+    for field in ("description", "deadline", "amount", "ratio"):
+        # 詳細ページ → 一覧内のセレクタ → 一覧の項目テキストの順に値を探す
+        value = details.get(field, "")
+        if not value and field in list_fields:
+            elem = _select_first(item, list_fields[field])
+            value = elem.text.strip() if elem else ""
+        if not value and field == "description" and source.get("description_from_item"):
+            value = item_text
+        if not value and field == "deadline" and source.get("deadline_from_text"):
+            deadline_match = LISTING_DEADLINE_PATTERN.search(grant["description"])
+            value = deadline_match.group(1) if deadline_match else ""
+        if not value:
+            value = source.get("defaults", {}).get(field, SOURCE_FIELD_DEFAULT).format(title=title)
+        grant[field] = value
+    
+    limit = source.get("description_limit")
+    if limit and len(grant["description"]) > limit:
+        grant["description"] = grant["description"][:limit] + "..."
+    
+    date_elem = _select_first(item, source.get("date_selectors", []))
+    date_text = date_elem.text.strip() if date_elem else ""
+    
+    return {
+        "title": source.get("title_template", "{title}").format(title=title),
+        "url": url,
+        "date": date_text if date_text else datetime.datetime.now().strftime('%Y年%m月%d日'),
+        **grant
+    }
+
+def scrape_source(source):
+    """ソース定義に従って1つのサイトから助成金情報を取得する"""
+    grants = []
+    print(f"🔍 {source['name']}の情報を取得中...")
+    
+    for list_url in source["urls"]:
+        try:
+            response = fetch(list_url)
+            if response.status_code != 200:
+                print(f"⚠️ {source['name']}へのアクセス失敗 ({list_url}, ステータスコード: {response.status_code})")
+                continue
             
-            # 公募情報を取得
-            info_blocks = soup.select(".info-block") or soup.select(".news-block") or soup.select("article")
+            if source.get("encoding"):
+                response.encoding = source["encoding"]
+            soup = parse_html(response.text)
             
-            if not info_blocks:
-                # 公募情報が見つからない場合は、デフォルト情報を追加
-                additional_grants.append({
-                    "title": "ものづくり・商業・サービス生産性向上促進補助金",
-                    "url": "https://portal.monodukuri-hojo.jp/",
-                    "date": datetime.datetime.now().strftime('%Y年%m月%d日'),
-                    "description": "中小企業・小規模事業者等が取り組む革新的サービス開発・試作品開発・生産プロセスの改善を行うための設備投資等を支援する補助金制度",
-                    "deadline": "詳細はWebサイトで確認",
-                    "amount": "最大1,000万円～2,000万円（類型による）",
-                    "ratio": "1/2〜2/3（小規模事業者は2/3）"
-                })
+            candidates = _parse_source_items(source, soup)
+            if not candidates and source.get("fallback_grants") and not _select_all_first(soup, source["item_selectors"]):
+                # 一覧の項目が見つからない場合は既定の情報を使う
+                today = datetime.datetime.now().strftime('%Y年%m月%d日')
+                grants.extend({**fallback, "date": today} for fallback in source["fallback_grants"])
+                continue
+            
+            # 詳細ページの情報を並列に取得してみる（結果は一覧の並び順を維持）
+            if source.get("fetch_details"):
+                details_list = scrape_grant_details_many([url for _, url, _ in candidates])
             else:
-                for block in info_blocks:
-                    title_elem = block.select_one("h3") or block.select_one("h4") or block.select_one(".title")
-                    if not title_elem:
-                        continue
-                    
-                    title = title_elem.text.strip()
-                    if "公募" in title or "募集" in title or "申請" in title:
-                        # 公募に関する情報を抽出
-                        description = block.text.strip()
-                        if title in description:
-                            description = description.replace(title, "").strip()
-                        
-                        # リンクを取得
-                        link_elem = block.select_one("a")
-                        if link_elem and link_elem.get("href"):
-                            url = link_elem.get("href")
-                            if not url.startswith("http"):
-                                url = urljoin("https://portal.monodukuri-hojo.jp/", url)
-                        else:
-                            url = "https://portal.monodukuri-hojo.jp/"
-                        
-                        # 締め切りを抽出
-                        deadline_match = re.search(r'([0-9]{4}年[0-9]{1,2}月[0-9]{1,2}日).*(締切|締め切り|〆切|まで)', description)
-                        deadline = deadline_match.group(1) if deadline_match else "詳細はWebサイトで確認"
-                        
-                        # 助成金情報を追加
-                        additional_grants.append({
-                            "title": "ものづくり・商業・サービス生産性向上促進補助金（" + title + "）",
-                            "url": url,
-                            "date": datetime.datetime.now().strftime('%Y年%m月%d日'),
-                            "description": description[:200] + "..." if len(description) > 200 else description,
-                            "deadline": deadline,
-                            "amount": "最大1,000万円～2,000万円（類型による）",
-                            "ratio": "1/2〜2/3（小規模事業者は2/3）"
-                        })
+                details_list = [None] * len(candidates)
             
-            print(f"✅ ものづくり補助金から{len(additional_grants) - previous_grants}件の助成金情報を取得しました")
-    except Exception as e:
-        print(f"❌ ものづくり補助金情報取得エラー: {e}")
+            for (title, url, item), details in zip(candidates, details_list):
+                grants.append(_build_source_grant(source, title, url, item, details))
+        except Exception as e:
+            print(f"❌ {source['name']}情報取得エラー ({list_url}): {e}")
     
-    # 重複を排除して返す
-    unique_grants = []
-    urls = set()
-    titles = set()
+    print(f"✅ {source['name']}から{len(grants)}件の助成金情報を取得しました")
+    return grants
+
+# --- ソース横断の並列クロール ---
+class CrawlDeadlineExceeded(Exception):
+    """ソースの締め切りを過ぎた（またはクロールが打ち切られた）ため、リクエストを送らずに中断した"""
+
+# 実行中のソースの (締め切り（time.monotonicの値）, 打ち切りのEvent)。ソースを実行するスレッドごとに設定する
+_crawl_limit = threading.local()
+
+def get_crawl_limit():
+    """現在のスレッドで実行中のソースの締め切り（ソースの外ではNone）"""
+    return getattr(_crawl_limit, "value", None)
+
+def run_with_crawl_limit(limit, func, *args):
+    """ソースの締め切りを設定してfuncを実行する（ソース内で別のスレッドに処理を渡すときも引き継ぐ）"""
+    previous = get_crawl_limit()
+    _crawl_limit.value = limit
+    try:
+        return func(*args)
+    finally:
+        _crawl_limit.value = previous
+
+def check_crawl_deadline(url=""):
+    """締め切りまでの残り秒数を返す（ソースの外ではNone）。過ぎていればCrawlDeadlineExceededを送出する"""
+    limit = get_crawl_limit()
+    if limit is None:
+        return None
+    deadline, cancelled = limit
+    remaining = deadline - time.monotonic()
+    if remaining <= 0 or cancelled.is_set():
+        raise CrawlDeadlineExceeded(f"締め切りを過ぎたため取得を中断しました: {url}")
+    return remaining
+
+def crawl_time_left():
+    """実行中のソースの締め切りまでの残り秒数（ソースの外ではNone、過ぎていれば0）"""
+    try:
+        return check_crawl_deadline()
+    except CrawlDeadlineExceeded:
+        return 0.0
+
+def run_with_crawl_margin(margin, func, *args):
+    """ソースの締め切りのmargin秒前を締め切りとしてfuncを実行する（ソースの締め切りまでに取得済みの分を返せるように）"""
+    limit = get_crawl_limit()
+    if limit is None:
+        return func(*args)
+    deadline, cancelled = limit
+    return run_with_crawl_limit((deadline - margin, cancelled), func, *args)
+
+def build_crawl_tasks():
+    """並列に取得するソースの一覧を作成する（name, func, deadline）
+    J-Net21のタスクには取得後に今回見かけた記事のURLキー（seen_keys）が入る"""
+    def crawl_jnet21():
+        grants, jnet21_task["seen_keys"] = scrape_jnet21_grants(include_national=False)
+        return grants
     
-    for grant in additional_grants:
-        # URLとタイトルの両方が重複していない場合のみ追加
-        url_key = grant["url"].split("?")[0]  # クエリパラメータを除外
-        title_key = normalize_text(grant["title"])
-        
-        if url_key not in urls and title_key not in titles:
-            urls.add(url_key)
-            titles.add(title_key)
-            unique_grants.append(grant)
+    jnet21_task = {"name": "J-Net21", "func": crawl_jnet21}
+    tasks = [
+        jnet21_task,
+        {"name": "全国向け助成金", "func": get_national_grants}
+    ]
+    for source in ADDITIONAL_SOURCES:
+        tasks.append({
+            "name": source["name"],
+            "func": lambda source=source: scrape_source(source),
+            "deadline": source.get("deadline")
+        })
+    return tasks
+
+def iter_crawl_sources(tasks, time_budget=None, source_deadline=None):
+    """各ソースを並列に取得し、取得が終わったソースから順に (task, 助成金リスト) を返す
+    返す順番は取得の速さで変わるため、重複排除で残す側や並び順は呼び出し側が取得後にソースの登録順で決める。
+    全体の制限時間またはソースごとの締め切りまでに終わらなかったソースは待たずに除外する。
+    除外したソースや、呼び出し側が途中で止めた場合の残りのソースは、次のリクエストを送る前に中断される
+    （送信中のリクエストは残り時間に収めたタイムアウトで終わる）ため、プロセスの終了も締め切りを大きく超えて待たない"""
+    time_budget = time_budget or CRAWL_TIME_BUDGET
+    source_deadline = source_deadline or CRAWL_SOURCE_DEADLINE
+    
+    start = time.monotonic()
+    completed = 0
+    cancelled = threading.Event()
+    
+    def run(task):
+        task_start = time.monotonic()
+        with TRACER.span("source", task["name"]) as span, stage_profiler.stage("crawl", task["name"]):
+            grants = run_with_crawl_limit((start + deadline_of(task), cancelled), task["func"])
+            span.set(grants=len(grants))
+        print(f"⏱️ {task['name']}: {len(grants)} 件 ({time.monotonic() - task_start:.1f}秒)")
+        return grants
     
-    print(f"✅ 追加情報ソースから合計{len(unique_grants)}件の助成金情報を取得しました")
-    return unique_grants
+    def deadline_of(task):
+        return min(task.get("deadline") or source_deadline, time_budget)
+    
+    executor = ThreadPoolExecutor(max_workers=max(1, min(CRAWL_CONCURRENCY, len(tasks))))
+    futures = {executor.submit(run, task): task for task in tasks}
+    pending = set(futures)
+    
+    try:
+        while pending:
+            # 締め切りを過ぎても終わっていないソースは除外
+            now = time.monotonic()
+            for future in [future for future in pending if not future.done() and start + deadline_of(futures[future]) <= now]:
+                task = futures[future]
+                print(f"⚠️ {task['name']}: 制限時間（{deadline_of(task):.0f}秒）内に取得が終わらなかったため除外します")
+                pending.discard(future)
+            if not pending:
+                break
+            
+            next_deadline = min(start + deadline_of(futures[future]) for future in pending)
+            done, _ = wait(pending, timeout=max(0, next_deadline - now), return_when=FIRST_COMPLETED)
+            
+            # 同時に終わったソースは登録順に返す
+            for future in sorted(done, key=lambda future: tasks.index(futures[future])):
+                pending.discard(future)
+                task = futures[future]
+                try:
+                    grants = future.result()
+                except Exception as e:
+                    print(f"❌ {task['name']}の取得エラー: {e}")
+                    continue
+                completed += 1
+                yield task, grants
+    finally:
+        # 終わっていないソースは待たずに打ち切る（実行中のリクエストは残り時間に収めたタイムアウトで終了する）
+        cancelled.set()
+        executor.shutdown(wait=False, cancel_futures=True)
+        print(f"✅ ソース取得完了: {completed}/{len(tasks)} ソース ({time.monotonic() - start:.1f}秒)")
 
 # --- フィルタリングとGPT評価関数 ---
-def filter_grants_for_target_business(grants, location="長野県塩尻市", industry="情報通信業", employees=56):
-    """対象企業に適した助成金情報にフィルタリングする（改善版）"""
-    # 情報通信業向け助成金に関連するキーワード
-    it_keywords = ['IT', 'システム', 'デジタル', '情報通信', 'DX', 'セキュリティ', 'アプリ', 'ソフトウェア', 
-                  'ICT', 'クラウド', 'AI', 'IoT', '技術', 'テクノロジー', 'オンライン', 'データ']
+def is_target_grant(grant):
+    """助成金情報を対象企業向けとして残すかどうかを1件ずつ判定する"""
+    title_hits = matched_groups(grant["title"])
+    desc_hits = matched_groups(grant.get("description", ""), ("it", "exclude"))
+    has_it_keyword = "it" in title_hits or "it" in desc_hits
+    
+    # 基本的にすべての全国向け助成金は含める
+    include = True
+    
+    # 特定の地域限定で、かつ対象地域でない場合は除外
+    if "prefecture" in title_hits and "nationwide" not in title_hits:
+        include = False
+    
+    # 特定の業種限定で、情報通信業が対象外の場合は除外
+    # 例：農業、漁業のみ対象で、かつIT関連のキーワードが含まれていない場合
+    if "agriculture" in title_hits and not has_it_keyword:
+        include = False
     
-    # 一次フィルタリング（プログラム的にフィルタリング）
-    filtered_grants = []
+    # 明示的に除外されるキーワード
+    if "exclude" in title_hits or "exclude" in desc_hits:
+        include = False
     
-    for grant in grants:
-        # 基本的にすべての全国向け助成金は含める
+    # 地域や業種に関わらず、IT系のキーワードが含まれている場合は含める
+    if has_it_keyword:
         include = True
+    
+    return include
+
+# --- GPT呼び出しのレート制御 ---
+class TokenBucket:
+    """1分あたりの上限に合わせて連続的に補充されるトークンバケット"""
+    
+    def __init__(self, per_minute):
+        self.capacity = max(1.0, float(per_minute))
+        self.tokens = self.capacity
+        self.rate = self.capacity / 60.0
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+    
+    def acquire(self, amount=1):
+        """必要なトークンが貯まるまで待ってから消費する"""
+        amount = min(float(amount), self.capacity)
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                wait = (amount - self.tokens) / self.rate
+            time.sleep(wait)
+
+class GptRateLimiter:
+    """リクエスト数/分・トークン数/分の上限と429応答後の一時停止をまとめて管理する"""
+    
+    def __init__(self, requests_per_minute, tokens_per_minute):
+        self.request_bucket = TokenBucket(requests_per_minute)
+        self.token_bucket = TokenBucket(tokens_per_minute)
+        self.paused_until = 0.0
+        self.lock = threading.Lock()
+    
+    def acquire(self, estimated_tokens):
+        """一時停止中であれば解除を待ち、リクエスト枠とトークン枠を確保する"""
+        while True:
+            with self.lock:
+                wait = self.paused_until - time.monotonic()
+            if wait <= 0:
+                break
+            time.sleep(wait)
+        self.request_bucket.acquire(1)
+        self.token_bucket.acquire(estimated_tokens)
+    
+    def pause(self, seconds):
+        """429応答を受けたときに全ワーカーの送信を一時停止する"""
+        with self.lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+_gpt_rate_limiter = GptRateLimiter(GPT_REQUESTS_PER_MINUTE, GPT_TOKENS_PER_MINUTE)
+
+def _get_retry_after_seconds(error, attempt):
+    """429応答のretry-afterヘッダーから待機秒数を求める（無ければ指数バックオフ）"""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        if headers.get("retry-after"):
+            return float(headers["retry-after"])
+    except (TypeError, ValueError):
+        pass
+    return min(60.0, 2.0 * (2 ** attempt))
+
+def create_chat_completion(messages, estimated_tokens, **kwargs):
+    """レート制限を守りながらChat Completions APIを呼び出す（429は全体を一時停止して、接続エラーと5xxは待機してリトライ）
+    OpenAIクライアントはSDK側でリトライしない設定にしてあり、リトライも全てレート制御を通す"""
+    client = get_openai_client()
+    with TRACER.span("gpt", kwargs.get("model", GPT_MODEL), estimated_tokens=estimated_tokens) as span:
+        for attempt in range(GPT_RETRY_TOTAL + 1):
+            _gpt_rate_limiter.acquire(estimated_tokens)
+            span.set(retries=attempt)
+            try:
+                response = client.chat.completions.create(messages=messages, **kwargs)
+                span.set(tokens=getattr(getattr(response, "usage", None), "total_tokens", None))
+                return response
+            except Exception as e:
+                import openai  # 例外の判定にだけ使うため、失敗したときに読み込む
+                transient = isinstance(e, (openai.APIConnectionError, openai.InternalServerError))
+                if not (isinstance(e, openai.RateLimitError) or transient) or attempt >= GPT_RETRY_TOTAL:
+                    raise
+                wait = _get_retry_after_seconds(e, attempt)
+                if transient:
+                    print(f"⚠️ GPTの一時的なエラー（{type(e).__name__}）、{wait:.1f}秒待機してリトライします ({attempt + 1}/{GPT_RETRY_TOTAL})")
+                    time.sleep(wait)
+                    continue
+                print(f"⚠️ GPTのレート制限に到達、{wait:.1f}秒待機してリトライします ({attempt + 1}/{GPT_RETRY_TOTAL})")
+                _gpt_rate_limiter.pause(wait)
+
+class StreamingEvaluator:
+    """受け取った評価ジョブをGPT_BATCH_SIZE件ずつまとめて順次並列評価に回す
+    ワーカーが空いていれば満たないバッチもすぐに送り、スクレイピングとGPTの待ち時間を重ねる"""
+    
+    def __init__(self):
+        self.executor = ThreadPoolExecutor(max_workers=max(1, GPT_CONCURRENCY))
+        self.batch_size = max(1, GPT_BATCH_SIZE)
+        self.lock = threading.Lock()
+        self.waiting = []  # バッチに入る前の (番号, evaluate_grant_with_gptの引数)
+        self.batches = []  # 送信済みの (ジョブのリスト, future)
+        self.results = {}
+        self.latest = {}  # 番号 -> 最後に受け取った引数（同じ番号で出し直した場合は古い評価結果を使わない）
+        self.in_flight = 0
+    
+    def submit(self, index, args):
+        """評価ジョブを追加する（同じ入力の評価がキャッシュにあればAPIを呼ばずに再利用）
+        評価済み・評価中の番号をもう一度渡すと、新しい引数の評価結果に置き換える"""
+        self.discard(index)
+        self.latest[index] = args
+        cached = gpt_cache_get(args)
+        if cached is not None:
+            print(f"♻️ {index}件目 評価キャッシュを再利用")
+            self.results[index] = cached
+            return
         
-        title = grant["title"].lower()
-        desc = grant.get("description", "").lower()
-        
-        # 特定の地域限定で、かつ対象地域でない場合は除外
-        if any(prefecture in title for prefecture in ['北海道', '青森', '岩手', '宮城', '秋田', 
-                                               '山形', '福島', '茨城', '栃木', '群馬', 
-                                               '埼玉', '千葉', '東京', '神奈川', '新潟', 
-                                               '富山', '石川', '福井', '山梨', '岐阜', 
-                                               '静岡', '愛知', '三重', '滋賀', '京都', 
-                                               '大阪', '兵庫', '奈良', '和歌山', '鳥取', 
-                                               '島根', '岡山', '広島', '山口', '徳島', 
-                                               '香川', '愛媛', '高知', '福岡', '佐賀', 
-                                               '長崎', '熊本', '大分', '宮崎', '鹿児島', 
-                                               '沖縄']) and not any(keyword in title for keyword in ['長野', '全国', '全て', 'すべて']):
-            include = False
-        
-        # 特定の業種限定で、情報通信業が対象外の場合は除外
-        # 例：農業、漁業のみ対象で、かつIT関連のキーワードが含まれていない場合
-        if (('農業' in title or '農林' in title or '漁業' in title or '林業' in title) and 
-            not any(kw.lower() in title.lower() or kw.lower() in desc.lower() for kw in it_keywords)):
-            include = False
-        
-        # 明示的に除外されるキーワード
-        exclude_keywords = ['終了しました', '募集終了', '受付終了', '募集は締め切りました']
-        if any(exclude_kw in title or exclude_kw in desc for exclude_kw in exclude_keywords):
-            include = False
-        
-        # 地域や業種に関わらず、IT系のキーワードが含まれている場合は含める
-        if any(kw.lower() in title.lower() or kw.lower() in desc.lower() for kw in it_keywords):
-            include = True
-        
-        if include:
-            filtered_grants.append(grant)
+        self.waiting.append((index, args))
+        if len(self.waiting) >= self.batch_size:
+            self._dispatch()
+    
+    def discard(self, index):
+        """番号の評価ジョブを取り消す（送信前なら送らず、送信済みなら結果を使わない）"""
+        self.waiting = [(waiting_index, args) for waiting_index, args in self.waiting if waiting_index != index]
+        self.latest.pop(index, None)
+        self.results.pop(index, None)
+    
+    def has_job(self, index):
+        """番号の評価ジョブを受け取っているか（取り消したものは含まない）"""
+        return index in self.latest
+    
+    def flush_if_idle(self):
+        """評価中のバッチが無ければ、待機中のジョブをバッチが満たなくても送る
+        記録・再生モードでは送らない（バッチの組み合わせを実行ごとに揃え、記録したGPT応答と対応させるため）"""
+        if replay.is_active():
+            return
+        with self.lock:
+            idle = self.in_flight == 0
+        if idle and self.waiting:
+            self._dispatch()
+    
+    def _dispatch(self):
+        batch, self.waiting = self.waiting[:self.batch_size], self.waiting[self.batch_size:]
+        with self.lock:
+            self.in_flight += 1
+        self.batches.append((batch, self.executor.submit(self._evaluate, batch)))
+    
+    def _evaluate(self, batch):
+        try:
+            first, last = batch[0][0], batch[-1][0]
+            label = f"{first}件目" if len(batch) == 1 else f"{first}〜{last}件目"
+            print(f"⏳ {label} 評価中...")
+            with stage_profiler.stage("gpt"):
+                if len(batch) == 1:
+                    results = [evaluate_grant_with_gpt(*batch[0][1])]
+                else:
+                    results = evaluate_grants_batch_with_gpt([args for _, args in batch])
+            print(f"✅ {label} 評価完了")
+            return results
+        finally:
+            with self.lock:
+                self.in_flight -= 1
     
-    print(f"📊 フィルタリング後の助成金件数: {len(filtered_grants)} 件")
-    return filtered_grants
+    def finish(self):
+        """残りのジョブを送り、全ての評価が終わるのを待って {番号: 評価結果} を返す"""
+        while self.waiting:
+            self._dispatch()
+        self.executor.shutdown(wait=True)
+        
+        for batch, future in self.batches:
+            for (index, args), result in zip(batch, future.result()):
+                if self.latest.get(index) is args:
+                    self.results[index] = result
+                gpt_cache_put(args, result)
+        return self.results
 
-def evaluate_grant_with_gpt(title, url, description, deadline, amount, ratio):
-    """助成金情報をGPTで評価"""
-    prompt = f"""
-あなたは企業向け助成金アドバイザーです。
-以下の助成金が、長野県塩尻市の情報通信業・従業員56名の中小企業にとって申請対象になるか、また申請優先度（高・中・低）を判定してください。
+GPT_ADVISOR_PREAMBLE = f"""あなたは企業向け助成金アドバイザーです。
+以下の助成金が、{COMPANY_PROFILE["location"]}の{COMPANY_PROFILE["industry"]}・従業員{COMPANY_PROFILE["employees"]}名の中小企業にとって申請対象になるか、また申請優先度（高・中・低）を判定してください。"""
 
-【助成金名】{title}
+def format_grant_for_prompt(title, url, description, deadline, amount, ratio):
+    """プロンプトに埋め込む助成金情報のブロックを作成する"""
+    return f"""【助成金名】{title}
 【詳細URL】{url}
 【概要】{description}
 【申請期限】{deadline}
 【助成金額】{amount}
-【補助割合】{ratio}
-
-回答形式は以下でお願いします：
----
-対象かどうか: （はい／いいえ）
-理由: （簡単に）
-申請優先度: （高／中／低）
----
+【補助割合】{ratio}"""
+
+@dataclass
+class GrantEvaluation:
+    """GPTによる助成金評価の結果"""
+    target: str = "不明"  # 対象かどうか（はい／いいえ）
+    reason: str = "不明"
+    priority: str = "不明"  # 申請優先度（高／中／低）
+    error: str = ""  # 評価に失敗した場合のエラー内容
+
+GPT_EVALUATION_FORMAT = """{"target": "はい" または "いいえ", "reason": "理由（60文字以内で簡単に）", "priority": "高" / "中" / "低"}"""
+
+def parse_evaluation(data):
+    """GPTが返したJSONオブジェクトを検証してGrantEvaluationに変換する（形式が不正な場合はValueError）"""
+    if not isinstance(data, dict):
+        raise ValueError(f"評価結果がオブジェクトではありません: {data!r}")
+    
+    target = normalize_text(str(data.get("target", "")))
+    reason = normalize_text(str(data.get("reason", "")))
+    priority = normalize_text(str(data.get("priority", "")))
+    
+    # 「はい（…）」のような補足付きの回答は先頭の値に揃える
+    target = next((value for value in ("はい", "いいえ") if target.startswith(value)), target)
+    priority = next((value for value in ("高", "中", "低") if priority.startswith(value)), priority)
+    
+    if target not in ("はい", "いいえ") or priority not in ("高", "中", "低") or not reason:
+        raise ValueError(f"評価結果の値が不正です: {data!r}")
+    
+    return GrantEvaluation(target=target, reason=reason, priority=priority)
+
+def evaluate_grant_with_gpt(title, url, description, deadline, amount, ratio):
+    """助成金情報をGPTで評価"""
+    prompt = f"""
+{GPT_ADVISOR_PREAMBLE}
+
+{format_grant_for_prompt(title, url, description, deadline, amount, ratio)}
+
+回答は以下のキーを持つJSONオブジェクトのみで返してください：
+{GPT_EVALUATION_FORMAT}
+"""
+    error = ""
+    # JSONとして解析できない、または値が不正な場合は1回だけ再試行する
+    for attempt in range(2):
+        try:
+            response = create_chat_completion(
+                [{"role": "user", "content": prompt}],
+                # 日本語はおおむね1文字1トークンとして、回答分を加えて見積もる
+                estimated_tokens=len(prompt) + GPT_MAX_OUTPUT_TOKENS,
+                model=GPT_MODEL,
+                response_format={"type": "json_object"},
+                max_tokens=GPT_MAX_OUTPUT_TOKENS
+            )
+            return parse_evaluation(json.loads(response.choices[0].message.content))
+        except ValueError as e:
+            error = f"❌ GPT評価の形式エラー: {e}"
+        except Exception as e:
+            return GrantEvaluation(error=f"❌ GPT評価エラー: {str(e)}")
+    
+    return GrantEvaluation(error=error)
+
+def parse_batch_evaluation(reply, count):
+    """まとめて評価した回答をIDごとのGrantEvaluationに変換する（形式が正しいIDのみ返す）"""
+    try:
+        items = json.loads(reply).get("results", [])
+    except (ValueError, AttributeError):
+        return {}
+    
+    results = {}
+    for item in items if isinstance(items, list) else []:
+        try:
+            grant_id = int(item.get("id"))
+            if 1 <= grant_id <= count and grant_id not in results:
+                results[grant_id] = parse_evaluation(item)
+        except (ValueError, TypeError, AttributeError):
+            continue
+    
+    return results
+
+def evaluate_grants_batch_with_gpt(grant_args_list):
+    """複数の助成金を1回のリクエストでまとめて評価する（回答を解析できなかった助成金は1件ずつ評価し直す）"""
+    grant_blocks = "\n\n".join(
+        f"【ID】{grant_id}\n{format_grant_for_prompt(*args)}"
+        for grant_id, args in enumerate(grant_args_list, start=1)
+    )
+    prompt = f"""
+{GPT_ADVISOR_PREAMBLE}
+
+{grant_blocks}
+
+回答は以下の形式のJSONオブジェクトのみで返してください。resultsには助成金ごとに1要素ずつ、IDを付けて入れてください：
+{{"results": [{{"id": 助成金のID, "target": "はい" または "いいえ", "reason": "理由（60文字以内で簡単に）", "priority": "高" / "中" / "低"}}]}}
 """
+    parsed = {}
     try:
-        response = openai.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[{"role": "user", "content": prompt}]
+        response = create_chat_completion(
+            [{"role": "user", "content": prompt}],
+            estimated_tokens=len(prompt) + GPT_MAX_OUTPUT_TOKENS * len(grant_args_list),
+            model=GPT_MODEL,
+            response_format={"type": "json_object"},
+            max_tokens=GPT_MAX_OUTPUT_TOKENS * len(grant_args_list)
         )
-        return response.choices[0].message.content.strip()
+        parsed = parse_batch_evaluation(response.choices[0].message.content, len(grant_args_list))
     except Exception as e:
-        return f"❌ GPT評価エラー: {str(e)}"
+        print(f"❌ GPTまとめて評価エラー: {e}")
+    
+    if len(parsed) < len(grant_args_list):
+        print(f"⚠️ まとめて評価の回答を解析できなかった {len(grant_args_list) - len(parsed)} 件を1件ずつ評価します")
+    
+    return [
+        parsed[grant_id] if grant_id in parsed else evaluate_grant_with_gpt(*args)
+        for grant_id, args in enumerate(grant_args_list, start=1)
+    ]
+
+# --- GPT評価キャッシュ（入力内容をキーにしたメモ化） ---
+GPT_CACHE_PATH = os.path.join(CACHE_DIR, "gpt_cache.json")
+
+_gpt_cache = None
+_gpt_cache_stats = {"hits": 0, "misses": 0}
+
+def gpt_cache_key(args):
+    """モデル・プロンプトの版・企業プロフィール・正規化した入力からキャッシュキーを作成する"""
+    payload = {
+        "model": GPT_MODEL,
+        "prompt_version": GPT_PROMPT_VERSION,
+        "company": COMPANY_PROFILE,
+        "inputs": [normalize_text(str(value)) for value in args]
+    }
+    return hashlib.sha256(json.dumps(payload, ensure_ascii=False, sort_keys=True).encode("utf-8")).hexdigest()
+
+def _load_gpt_cache():
+    """評価キャッシュを初回利用時に読み込む"""
+    global _gpt_cache
+    if _gpt_cache is None:
+        try:
+            with open(GPT_CACHE_PATH, "r", encoding="utf-8") as f:
+                _gpt_cache = json.load(f)
+        except (OSError, ValueError):
+            _gpt_cache = {}
+    return _gpt_cache
+
+def gpt_cache_get(args):
+    """キャッシュ済みの評価結果を返す（無ければNone）"""
+    if not GPT_CACHE_ENABLED:
+        return None
+    
+    entry = _load_gpt_cache().get(gpt_cache_key(args))
+    if entry and time.time() - entry.get("created_at", 0) <= GPT_CACHE_TTL_DAYS * 86400:
+        entry["last_used"] = time.time()
+        _gpt_cache_stats["hits"] += 1
+        return GrantEvaluation(**entry["result"])
+    
+    _gpt_cache_stats["misses"] += 1
+    return None
+
+def gpt_cache_put(args, result):
+    """評価結果をキャッシュに追加する（エラー結果は保存しない）"""
+    if not GPT_CACHE_ENABLED or result.error:
+        return
+    now = time.time()
+    _load_gpt_cache()[gpt_cache_key(args)] = {"result": asdict(result), "created_at": now, "last_used": now}
+
+def save_gpt_cache():
+    """期限切れのエントリと、件数上限を超えた分を最終利用が古い順に削除して保存する"""
+    if not GPT_CACHE_ENABLED or _gpt_cache is None:
+        return
+    
+    now = time.time()
+    entries = [
+        (key, entry) for key, entry in _gpt_cache.items()
+        if now - entry.get("created_at", 0) <= GPT_CACHE_TTL_DAYS * 86400
+    ]
+    entries.sort(key=lambda item: item[1].get("last_used", 0), reverse=True)
+    cache = dict(entries[:GPT_CACHE_MAX_ENTRIES])
+    
+    try:
+        os.makedirs(os.path.dirname(GPT_CACHE_PATH) or ".", exist_ok=True)
+        with open(GPT_CACHE_PATH + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(cache, f, ensure_ascii=False)
+        os.replace(GPT_CACHE_PATH + ".tmp", GPT_CACHE_PATH)
+    except OSError as e:
+        print(f"❌ GPT評価キャッシュの保存エラー: {e}")
+
+def print_gpt_cache_stats():
+    """GPT評価キャッシュのヒット率を表示する"""
+    if not GPT_CACHE_ENABLED:
+        return
+    
+    total = _gpt_cache_stats["hits"] + _gpt_cache_stats["misses"]
+    hit_rate = _gpt_cache_stats["hits"] / total * 100 if total else 0
+    print(f"📊 GPT評価キャッシュ: ヒット {_gpt_cache_stats['hits']} 件 / ミス {_gpt_cache_stats['misses']} 件 (ヒット率 {hit_rate:.1f}%)")
+
+# --- 増分評価（前回実行の評価結果の保存と再利用） ---
+GRANT_STATE_PATH = os.path.join(CACHE_DIR, "grant_state.json")
+
+def grant_content_hash(grant):
+    """評価結果に影響する項目（タイトル・概要・期限・金額・補助率）のハッシュを計算する"""
+    fields = [normalize_text(grant.get(field, "")) for field in ("title", "description", "deadline", "amount", "ratio")]
+    return hashlib.sha256(json.dumps(fields, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+def stored_evaluation(stored, content_hash):
+    """保存済みの評価状態が同じ内容の評価であれば、その評価結果を返す（無ければNone）"""
+    if INCREMENTAL_MODE and stored and stored.get("hash") == content_hash and isinstance(stored.get("evaluation"), dict):
+        return GrantEvaluation(**stored["evaluation"])
+    return None
+
+def prepare_grant_evaluation(grant, index, grant_state):
+    """評価対象の情報を整形し、前回から内容が変わっていなければ保存済みの評価を結果に入れておく
+    評価と評価キャッシュのキーには正規化した元のタイトルを使う（表示用のシンプルなタイトルは番号を含み、到着順で変わるため）"""
+    title = normalize_text(grant["title"])
+    
+    url = grant["url"]
+    description = normalize_text(grant.get("description", ""))
+    deadline = normalize_text(grant.get("deadline", "要確認"))
+    amount = normalize_text(grant.get("amount", "要確認"))
+    ratio = normalize_text(grant.get("ratio", "要確認"))
+
+    state_key = grant_url_key(url)
+    content_hash = grant_content_hash(grant)
+    stored = grant_state.get(state_key)
+    result = stored_evaluation(stored, content_hash)
+    if result is not None:
+        print(f"♻️ {index}件目 前回の評価を再利用")
+    
+    if stored:
+        stored["last_seen"] = time.time()
+    
+    return {
+        "index": index,
+        "grant": grant,
+        "args": (title, url, description, deadline, amount, ratio),
+        "state_key": state_key,
+        "content_hash": content_hash,
+        "result": result,
+        "reused": result is not None
+    }
+
+# 取得できなかった項目に入る定型文（近似重複の統合時に他のソースの値で補う対象）
+GRANT_UNKNOWN_VALUES = ("要確認", "詳細は要確認", SOURCE_FIELD_DEFAULT)
+
+def merge_near_duplicate(item, grant, grant_state, evaluator):
+    """近似重複と判定された助成金情報の値で、代表の評価対象の未取得項目を補う
+    補った項目があれば補った内容で評価し直す（保存済みの評価が同じ内容のものならそれを使う）"""
+    merged = merge_missing_fields(item["grant"], grant, ("description", "deadline", "amount", "ratio"), GRANT_UNKNOWN_VALUES)
+    print(f"🔗 近似重複を統合: {grant['title']} → {item['index']}件目（補完: {', '.join(merged) if merged else 'なし'}）")
+    if not merged:
+        return
+    
+    canonical = item["grant"]
+    item["args"] = item["args"][:2] + tuple(
+        normalize_text(canonical.get(field, default))
+        for field, default in (("description", ""), ("deadline", "要確認"), ("amount", "要確認"), ("ratio", "要確認"))
+    )
+    item["content_hash"] = grant_content_hash(canonical)
+    item["result"] = stored_evaluation(grant_state.get(item["state_key"]), item["content_hash"])
+    item["reused"] = item["result"] is not None
+    if item["reused"]:
+        evaluator.discard(item["index"])
+    else:
+        evaluator.submit(item["index"], item["args"])
+
+def load_grant_state():
+    """前回実行時の評価状態を読み込む"""
+    try:
+        with open(GRANT_STATE_PATH, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def save_grant_state(state):
+    """評価状態を保存する（一定期間見かけなかった助成金は削除）"""
+    now = time.time()
+    state = {
+        key: entry for key, entry in state.items()
+        if now - entry.get("last_seen", 0) <= GRANT_STATE_RETENTION_DAYS * 86400
+    }
+    try:
+        os.makedirs(os.path.dirname(GRANT_STATE_PATH) or ".", exist_ok=True)
+        with open(GRANT_STATE_PATH + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(state, f, ensure_ascii=False)
+        os.replace(GRANT_STATE_PATH + ".tmp", GRANT_STATE_PATH)
+        print(f"✅ 評価状態を保存しました: {len(state)} 件")
+    except OSError as e:
+        print(f"❌ 評価状態の保存エラー: {e}")
+
+# --- スプレッドシート書き込み ---
+def call_sheets_api(func, *args, **kwargs):
+    """Sheets APIを呼び出す（クォータ超過や一時的なエラーは指数バックオフでリトライ）"""
+    rows = len(args[0]) if args and isinstance(args[0], list) else None
+    with TRACER.span("sheet", getattr(func, "__name__", str(func)), rows=rows) as span:
+        for attempt in range(SHEET_RETRY_TOTAL + 1):
+            span.set(retries=attempt)
+            try:
+                return func(*args, **kwargs)
+            except Exception as e:
+                import gspread  # 例外の判定にだけ使うため、失敗したときに読み込む
+                if not isinstance(e, gspread.exceptions.APIError):
+                    raise
+                status = getattr(e.response, "status_code", None)
+                span.set(status=status)
+                if status not in (429, 500, 502, 503) or attempt >= SHEET_RETRY_TOTAL:
+                    raise
+                wait = SHEET_RETRY_BACKOFF * (2 ** attempt)
+                print(f"⚠️ Sheets APIエラー (ステータスコード: {status})、{wait:.0f}秒後にリトライします ({attempt + 1}/{SHEET_RETRY_TOTAL})")
+                time.sleep(wait)
+
+class SheetWriter:
+    """スプレッドシートへの行追加をバッファし、まとめて書き込む"""
+    
+    def __init__(self, worksheet, flush_size=None):
+        self.worksheet = worksheet
+        self.flush_size = max(1, flush_size or SHEET_FLUSH_SIZE)
+        self.buffer = []
+        self.written = 0
+    
+    def append(self, row):
+        """行をバッファに追加し、上限に達したら書き込む"""
+        self.buffer.append(row)
+        if len(self.buffer) >= self.flush_size:
+            self.flush()
+    
+    def flush(self):
+        """バッファの行を1回のAPI呼び出しで書き込む（失敗時は行をバッファに残して例外を送出）"""
+        if not self.buffer:
+            return
+        rows = list(self.buffer)
+        call_sheets_api(self.worksheet.append_rows, rows)
+        del self.buffer[:len(rows)]
+        self.written += len(rows)
+        print(f"✅ スプレッドシート書き込み完了: {len(rows)} 行（累計 {self.written} 行）")
+
+SHEET_STATUS_ACTIVE = "掲載中"
+SHEET_STATUS_GONE = "掲載終了"
+
+def sync_sheet_rows(worksheet, headers, existing_rows, rows, writer, can_mark_gone=None):
+    """既存の行とURLで突き合わせ、新規行の追加・変更セルの更新・消えた助成金の掲載終了マークだけを書き込む
+    ヘッダーとセルの更新を先に書き込み、新規行はその後で追加する（空のシートで追加行がヘッダーの位置に入らないように）
+    「No.」は今回の通知の番号に合わせて全行を振り直す（今回見つからなかった行は空欄）
+    can_mark_gone はURLキーを受け取り、今回見つからなかった行を掲載終了にしてよいかを返す（Noneなら全て掲載終了にする）"""
+    import gspread
+    
+    url_col = headers.index("URL")
+    status_col = headers.index("掲載状況")
+    # 「No.」は実行ごとの並び順で変わるため、セル単位では比較せず、最後に列をまとめて書き直す
+    number_col = headers.index("No.")
+    updates = []
+    appended_rows = []
+    
+    # ヘッダーが異なる場合（初回や列追加時）は1行目を書き換える
+    if not existing_rows or existing_rows[0][:len(headers)] != headers:
+        updates.append({"range": "A1", "values": [headers]})
+    
+    # 既存の行をURLキーで索引化（行番号は1始まり、1行目はヘッダー）
+    row_numbers = {}
+    for row_number, existing in enumerate(existing_rows[1:], start=2):
+        if len(existing) > url_col and existing[url_col]:
+            row_numbers.setdefault(grant_url_key(existing[url_col]), row_number)
+    
+    seen_keys = set()
+    numbers = {}  # 既存の行番号 -> 今回の番号
+    changed_cells = 0
+    for row in rows:
+        key = grant_url_key(row[url_col])
+        seen_keys.add(key)
+        row_number = row_numbers.get(key)
+        
+        # 新しい助成金は末尾に追加
+        if row_number is None:
+            appended_rows.append(row)
+            continue
+        numbers[row_number] = row[number_col]
+        
+        # 既存の助成金は値が変わったセルだけを更新（管理対象外の列の手入力メモは保持）
+        existing = existing_rows[row_number - 1]
+        for col, value in enumerate(row):
+            if col == number_col:
+                continue
+            current = existing[col] if col < len(existing) else ""
+            if str(value) != current:
+                updates.append({"range": gspread.utils.rowcol_to_a1(row_number, col + 1), "values": [[value]]})
+                changed_cells += 1
+    
+    # 今回見つからなかった助成金は掲載終了としてマーク（取得に失敗したソースの助成金は判定を保留）
+    gone_count = 0
+    deferred_count = 0
+    for key, row_number in row_numbers.items():
+        if key in seen_keys:
+            continue
+        if can_mark_gone is not None and not can_mark_gone(key):
+            deferred_count += 1
+            continue
+        existing = existing_rows[row_number - 1]
+        current = existing[status_col] if status_col < len(existing) else ""
+        if current != SHEET_STATUS_GONE:
+            updates.append({"range": gspread.utils.rowcol_to_a1(row_number, status_col + 1), "values": [[SHEET_STATUS_GONE]]})
+            gone_count += 1
+    
+    # 既存の行の「No.」を1回の範囲書き込みで振り直す（追加する行には今回の番号が入っている）
+    if len(existing_rows) > 1:
+        column = [[str(numbers.get(row_number, ""))] for row_number in range(2, len(existing_rows) + 1)]
+        current = [[existing[number_col] if number_col < len(existing) else ""] for existing in existing_rows[1:]]
+        if column != current:
+            column_range = (gspread.utils.rowcol_to_a1(2, number_col + 1) + ":"
+                            + gspread.utils.rowcol_to_a1(len(existing_rows), number_col + 1))
+            updates.append({"range": column_range, "values": column})
+    
+    if updates:
+        call_sheets_api(worksheet.batch_update, updates)
+    for row in appended_rows:
+        writer.append(row)
+    writer.flush()
+    
+    print(f"✅ スプレッドシート差分同期完了: 追加 {len(appended_rows)} 行, 更新 {changed_cells} セル, 掲載終了 {gone_count} 行"
+          + (f"（取得できなかったソースの {deferred_count} 行は保留）" if deferred_count else ""))
 
 # --- Google Chat通知関数 ---
 def send_to_google_chat(message, webhook_url):
@@ -1175,7 +2111,7 @@ def send_to_google_chat(message, webhook_url):
     try:
         print(f"⏳ Google Chatに送信中... ({webhook_url[:15]}...)")
         encoded_payload = json.dumps(payload, ensure_ascii=False).encode('utf-8')
-        response = requests.post(
+        response = get_http_session().post(
             webhook_url, 
             headers=headers, 
             data=encoded_payload
@@ -1192,96 +2128,201 @@ def send_to_google_chat(message, webhook_url):
         print(f"❌ Google Chat送信エラー: {e}")
         print(f"リクエスト内容: {encoded_payload[:200].decode('utf-8')}...")
 
+# --- 実行レポート ---
+def write_run_report():
+    """処理ごとの所要時間を保存し、時間のかかった処理を表示する"""
+    TRACER.print_summary(RUN_REPORT_SLOWEST)
+    try:
+        if RUN_REPORT_PATH:
+            TRACER.write_report(RUN_REPORT_PATH, RUN_REPORT_SLOWEST)
+        if RUN_METRICS_PATH:
+            TRACER.write_openmetrics(RUN_METRICS_PATH)
+        if RUN_REPORT_PATH or RUN_METRICS_PATH:
+            print(f"✅ 実行レポートを保存しました: {', '.join(path for path in (RUN_REPORT_PATH, RUN_METRICS_PATH) if path)}")
+    except OSError as e:
+        print(f"❌ 実行レポートの保存エラー: {e}")
+
 # --- メイン処理 ---
 def main():
+    TRACER.start()
+    check_webhook_url()
+    try:
+        sheet = get_sheet()
+    except Exception as e:
+        print(f"❌ スプレッドシート接続失敗: {e}")
+        exit(1)
+    
     print("✅ 助成金情報取得開始")
+
+    # スプレッドシート初期化（取得や評価を始める前に確認しておく）
+    headers = ["No.", "タイトル", "URL", "申請期限", "助成金額", "補助割合", "対象かどうか", "理由", "申請優先度", "掲載状況"]
+    sheet_writer = SheetWriter(sheet)
+    sheet_rows = []
+    existing_rows = None
+    try:
+        if SHEET_SYNC_MODE == "diff":
+            # 既存の内容を1回だけ読み込み、評価後に差分だけを書き込む
+            existing_rows = call_sheets_api(sheet.get_all_values)
+            print(f"✅ スプレッドシート読み込み完了: {len(existing_rows)} 行")
+        else:
+            call_sheets_api(sheet.clear)
+            sheet_writer.append(headers)
+            print("✅ スプレッドシート初期化完了")
+    except Exception as e:
+        print(f"❌ スプレッドシート操作エラー: {e}")
+        # エラーメッセージ送信して終了
+        send_to_google_chat("スプレッドシートの操作中にエラーが発生しました。", WEBHOOK_URL)
+        write_run_report()
+        return
+
+    # メッセージ内容を初期化
+    full_message = ""
     
-    # J-Net21から助成金情報を取得
-    grants = scrape_jnet21_grants()
-    print(f"✅ J-Net21から助成金情報取得: {len(grants)} 件")
+    # 前回実行時の評価状態を読み込み
+    grant_state = load_grant_state() if INCREMENTAL_MODE else {}
     
-    # 追加情報ソースから助成金情報を取得（改善版関数を使用）
-    additional_grants = scrape_additional_sources()
-    print(f"✅ 追加情報ソースから助成金情報取得: {len(additional_grants)} 件")
+    # 各ソースの取得が終わるたびにフィルタリングしてすぐGPT評価に回す
+    # （新規・変更分だけを評価し、内容が変わっていなければ保存済みの評価を再利用）
+    evaluator = StreamingEvaluator()
+    candidates = {}  # id(助成金情報) -> 評価対象（番号は評価ジョブの番号で、表示用の番号は最後に振り直す）
     
-    # 助成金情報をマージ
-    grants.extend(additional_grants)
+    def prepare(grant, order):
+        item = prepare_grant_evaluation(grant, len(candidates) + 1, grant_state)
+        item["order"] = order
+        item["source"] = crawl_tasks[order[0]]["name"] if order[0] < len(crawl_tasks) else None
+        candidates[id(grant)] = item
+        return item
     
-    # URLベースで重複を排除
-    unique_grants = []
-    urls = set()
-    titles = set()
+    # 取得中は届いた順に重複を判定し、他のソースと重複するものは先に届いた方だけを評価しておく
+    # （どちらを残すかは取得後に登録順で決め直す。評価結果は内容をキーにキャッシュされるため先に評価しても無駄にならない）
+    # 記録・再生モードでは取得後に登録順でまとめて評価に回す（バッチの組み合わせを取得の速さに左右させないため）
+    evaluate_early = not replay.is_active()
+    early_deduplicator = GrantDeduplicator()
+    early_near_duplicates = NearDuplicateIndex(ignored_descriptions=GRANT_UNKNOWN_VALUES)
     
-    for grant in grants:
-        # URLとタイトルの両方が重複していない場合のみ追加
-        url_key = grant["url"].split("?")[0]  # クエリパラメータを除外
-        title_key = normalize_text(grant["title"])
+    crawl_tasks = build_crawl_tasks()
+    crawled = {}  # ソースの登録順の番号 -> 取得した助成金リスト（締め切りまでに取得を終えたソースのみ）
+    completed_sources = set()
+    fetched_count = 0
+    jnet21_seen_keys = set()
+    for task, source_grants in iter_crawl_sources(crawl_tasks):
+        source_index = crawl_tasks.index(task)
+        crawled[source_index] = source_grants
+        completed_sources.add(task["name"])
+        fetched_count += len(source_grants)
+        jnet21_seen_keys |= task.get("seen_keys", set())
         
-        if url_key not in urls and title_key not in titles:
-            urls.add(url_key)
-            titles.add(title_key)
-            unique_grants.append(grant)
+        target_count = 0
+        for position, grant in enumerate(source_grants):
+            if not is_target_grant(grant):
+                continue
+            target_count += 1
+            item = prepare(grant, (source_index, position))
+            if not early_deduplicator.add(grant):
+                continue
+            if NEAR_DUP_ENABLED:
+                if early_near_duplicates.find(grant["title"], grant.get("description", "")) is not None:
+                    continue
+                early_near_duplicates.add(item["index"], grant["title"], grant.get("description", ""))
+            if item["result"] is None and evaluate_early:
+                evaluator.submit(item["index"], item["args"])
+        print(f"📥 {task['name']}: 取得 {len(source_grants)} 件 → 対象 {target_count} 件")
+        evaluator.flush_if_idle()
+    
+    # 取得が終わってから、重複排除で残す側と並び順をソースの登録順で決める（取得の速さで結果が変わらないように）
+    deduplicator = GrantDeduplicator()
+    near_duplicates = NearDuplicateIndex(ignored_descriptions=GRANT_UNKNOWN_VALUES)
+    queued = []
+    for source_index in sorted(crawled):
+        for grant in crawled[source_index]:
+            # 対象外の助成金も重複の判定には含める（同じ助成金が別のソースで対象になった場合も残さない）
+            if not deduplicator.add(grant) or id(grant) not in candidates:
+                continue
+            item = candidates[id(grant)]
+            # タイトルや概要が少し違うだけの同じ助成金は、登録順で先の方にまとめてGPT評価を1回で済ませる
+            canonical = near_duplicates.find(grant["title"], grant.get("description", "")) if NEAR_DUP_ENABLED else None
+            if canonical is not None:
+                merge_near_duplicate(queued[canonical], grant, grant_state, evaluator)
+                continue
+            queued.append(item)
+            near_duplicates.add(len(queued) - 1, grant["title"], grant.get("description", ""))
     
-    grants = unique_grants
-    print(f"✅ 重複排除後の助成金件数: {len(grants)} 件")
+    # 残らなかった助成金の評価は取り消し、取得中に評価に回していない助成金を評価に回す
+    queued_indexes = {item["index"] for item in queued}
+    for item in candidates.values():
+        if item["index"] not in queued_indexes:
+            evaluator.discard(item["index"])
+    for item in queued:
+        if item["result"] is None and not evaluator.has_job(item["index"]):
+            evaluator.submit(item["index"], item["args"])
     
-    # 対象企業向けのフィルタリング（改善版関数を使用）
-    grants = filter_grants_for_target_business(grants)
+    print(f"✅ 助成金情報取得: {fetched_count} 件 / 重複排除・フィルタリング後: {len(queued)} 件")
+    evaluations = list(queued)
     
-    # 取得できた件数が少ない場合はバックアップデータを使用
-    if len(grants) < 3:
+    # 取得できた件数が少ない場合はバックアップデータを追加（評価に回し済みの助成金はそのまま残す）
+    if len(evaluations) < 3:
         print("⚠️ 取得できた助成金情報が少ないため、バックアップデータを使用")
-        backup_grants = get_national_grants()
-        grants = backup_grants
+        for position, grant in enumerate(get_national_grants()):
+            if deduplicator.add(grant):
+                item = prepare(grant, (len(crawl_tasks), position))
+                queued.append(item)
+                if item["result"] is None:
+                    evaluator.submit(item["index"], item["args"])
+        evaluations = list(queued)
     
-    print(f"✅ 最終助成金件数: {len(grants)} 件")
-
-    # スプレッドシート初期化
-    try:
-        sheet.clear()
-        headers = ["No.", "タイトル", "URL", "申請期限", "助成金額", "補助割合", "対象かどうか", "理由", "申請優先度"]
-        sheet.append_row(headers)
-        print("✅ スプレッドシート初期化完了")
-    except Exception as e:
-        print(f"❌ スプレッドシート操作エラー: {e}")
-        # エラーメッセージ送信して終了
-        send_to_google_chat("スプレッドシートの操作中にエラーが発生しました。", WEBHOOK_URL)
-        return
+    print(f"✅ 最終助成金件数: {len(evaluations)} 件")
+    
+    # 評価の完了を待って結果を反映
+    results = evaluator.finish()
+    for item in evaluations:
+        if item["result"] is not None:
+            continue
+        item["result"] = results[item["index"]]
+        if not item["result"].error:
+            grant_state[item["state_key"]] = {
+                "hash": item["content_hash"],
+                "evaluation": asdict(item["result"]),
+                "last_seen": time.time()
+            }
+    # 取得元のソースを覚えておく（次回以降、そのソースの取得に失敗したときに掲載終了と誤判定しないように）
+    for item in evaluations:
+        if item["source"] and item["state_key"] in grant_state:
+            grant_state[item["state_key"]]["source"] = item["source"]
+    
+    def can_mark_gone(key):
+        """今回見つからなかった行の取得元のソースが、今回取得を終えていれば掲載終了にしてよい
+        （取得元が分からない行は、全てのソースの取得が終わった場合だけ）"""
+        source = grant_state.get(key, {}).get("source")
+        if source:
+            return source in completed_sources
+        return len(completed_sources) == len(crawl_tasks)
+    
+    # 取得の終わった順ではなくソースの登録順に並べて番号を振り直す（文字化けしたタイトルは表示用にシンプルなタイトルに置き換え）
+    evaluations.sort(key=lambda item: item["order"])
+    for i, item in enumerate(evaluations, start=1):
+        item["index"] = i
+        item["args"] = (generate_simple_title(normalize_text(item["grant"]["title"]), i),) + item["args"][1:]
 
-    # メッセージ内容を初期化
-    full_message = ""
+    for item in evaluations:
+        i = item["index"]
+        title, url, description, deadline, amount, ratio = item["args"]
+        result = item["result"]
 
-    for i, grant in enumerate(grants, start=1):
-        # タイトルの文字化けチェックと修正
-        title = normalize_text(grant["title"])
-        # 必要に応じてシンプルなタイトルに置き換え
-        title = generate_simple_title(title, i)
-        
-        url = grant["url"]
-        description = normalize_text(grant.get("description", ""))
-        deadline = normalize_text(grant.get("deadline", "要確認"))
-        amount = normalize_text(grant.get("amount", "要確認"))
-        ratio = normalize_text(grant.get("ratio", "要確認"))
-
-        print(f"⏳ {i}件目 評価中...")
-        result = evaluate_grant_with_gpt(title, url, description, deadline, amount, ratio)
-        print(f"✅ {i}件目 評価完了")
-
-        # GPT回答の分解（正規表現を使って堅牢に）
-        target = re.search(r"対象かどうか:?\s*(.+)", result)
-        target = normalize_text(target.group(1).strip() if target else "不明")
-        
-        reason = re.search(r"理由:?\s*(.+)", result)
-        reason = normalize_text(reason.group(1).strip() if reason else "不明")
-        
-        priority = re.search(r"申請優先度:?\s*(.+)", result)
-        priority = normalize_text(priority.group(1).strip() if priority else "不明")
+        # 検証済みの評価結果をそのまま使用（評価に失敗した場合は「不明」）
+        if result.error:
+            print(f"❌ {i}件目 {result.error}")
+        target = normalize_text(result.target)
+        reason = normalize_text(result.reason)
+        priority = normalize_text(result.priority)
 
-        try:
-            sheet.append_row([i, title, url, deadline, amount, ratio, target, reason, priority])
-            print(f"✅ {i}件目 スプレッドシート書き込み完了")
-        except Exception as e:
-            print(f"❌ スプレッドシート書き込みエラー: {e}")
+        row = [i, title, url, deadline, amount, ratio, target, reason, priority, SHEET_STATUS_ACTIVE]
+        if existing_rows is not None:
+            sheet_rows.append(row)
+        else:
+            try:
+                sheet_writer.append(row)
+            except Exception as e:
+                print(f"❌ スプレッドシート書き込みエラー: {e}")
 
         # 各助成金情報をメッセージに追加
         full_message += f"*{i}. {title}*\n"
@@ -1295,12 +2336,49 @@ def main():
         full_message += f"・理由: {short_reason}\n"
         full_message += f"・URL: {url}\n\n"
 
+    # 差分同期、またはバッファに残った行を書き込み
+    try:
+        if existing_rows is not None:
+            sync_sheet_rows(sheet, headers, existing_rows, sheet_rows, sheet_writer, can_mark_gone)
+        else:
+            sheet_writer.flush()
+        # 書き込みまで終わったJ-Net21の記事だけを既読にする（失敗した場合は次回もページを遡って取得し直す）
+        if jnet21_seen_keys:
+            save_jnet21_seen(jnet21_seen_keys)
+    except Exception as e:
+        print(f"❌ スプレッドシート書き込みエラー（未書き込み {len(sheet_writer.buffer)} 行）: {e}")
+    
+    if INCREMENTAL_MODE:
+        reused_count = sum(1 for item in evaluations if item["reused"])
+        print(f"📊 増分評価: 再利用 {reused_count} 件 / 新規・変更 {len(evaluations) - reused_count} 件")
+        save_grant_state(grant_state)
+    save_gpt_cache()
+    
     # メッセージが空でないことを確認してから送信
     if full_message:
         send_to_google_chat(full_message, WEBHOOK_URL)
     else:
         print("❌ 送信するメッセージがありません")
         send_to_google_chat("助成金情報の評価結果はありませんでした。", WEBHOOK_URL)
+    
+    # HTTP接続の再利用状況とキャッシュの統計を表示
+    prune_http_cache()
+    print_http_stats()
+    print_host_throttle_stats()
+    print_http_cache_stats()
+    print_gpt_cache_stats()
+    replay.print_replay_stats()
+    write_run_report()
 
 if __name__ == "__main__":
-    main()
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="助成金情報を取得・評価してスプレッドシートとGoogle Chatに送る")
+    parser.add_argument("--profile", action="store_true", help="ステージごとにcProfileで計測し、プロファイルを保存する")
+    parser.add_argument("--profile-dir", default=PROFILE_DIR, help=f"プロファイルの保存先（既定: {PROFILE_DIR}）")
+    args = parser.parse_args()
+    
+    if args.profile:
+        stage_profiler.run(main, args.profile_dir)
+    else:
+        main()
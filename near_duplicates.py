@@ -0,0 +1,174 @@
+#!/usr/bin/env python
+# coding: utf-8
+"""助成金情報の近似重複判定（文字n-gramのMinHashとLSHで候補を絞り、タイトルの包含度とJaccard係数で確認する）"""
+
+import hashlib
+import os
+import random
+import re
+import unicodedata
+
+# --- 近似重複判定の設定 ---
+# タイトルの包含度（短い方の文字n-gramのうち長い方にも含まれる割合）がしきい値以上の助成金情報を同じものとみなす
+# （「IT導入補助金2025」と「【全国】IT導入補助金2025（通常枠）の公募について」のような前後の付け足しは1.0になり、
+# 「省エネ」と「再エネ」のような途中の1〜2文字違いは短いタイトルほど下がる）
+NEAR_DUP_ENABLED = os.getenv("NEAR_DUP_ENABLED", "1") == "1"
+NEAR_DUP_THRESHOLD = float(os.getenv("NEAR_DUP_THRESHOLD", "0.9"))
+# タイトルのJaccard係数の下限（「補助金」のような短いタイトルが他のタイトルに含まれるだけで統合しないため）
+NEAR_DUP_MIN_JACCARD = float(os.getenv("NEAR_DUP_MIN_JACCARD", "0.3"))
+# 一方のタイトルがもう一方に含まれていない場合、両方に概要があれば概要の先頭部分のJaccard係数もこれ以上を求める
+NEAR_DUP_DESCRIPTION_THRESHOLD = float(os.getenv("NEAR_DUP_DESCRIPTION_THRESHOLD", "0.5"))
+NEAR_DUP_NGRAM = int(os.getenv("NEAR_DUP_NGRAM", "2"))
+# LSHの分割数と1バンドあたりの行数（候補になりやすさは およそ (1/バンド数)^(1/行数) のJaccard係数を境に変わるため、
+# NEAR_DUP_MIN_JACCARD より十分低くなるようにする）
+NEAR_DUP_BANDS = int(os.getenv("NEAR_DUP_BANDS", "20"))
+NEAR_DUP_ROWS = int(os.getenv("NEAR_DUP_ROWS", "2"))
+
+# 概要のうち比較に使う先頭の文字数
+DESCRIPTION_PREFIX = 150
+
+_MERSENNE_PRIME = (1 << 61) - 1
+
+
+def normalize_for_similarity(text):
+    """全角・半角や大文字・小文字の違い、空白や記号を取り除いた比較用の文字列を返す"""
+    text = unicodedata.normalize("NFKC", text or "").lower()
+    return re.sub(r'[\W_]+', '', text)
+
+
+def char_ngrams(text, n=None):
+    """比較用に正規化したテキストの文字n-gram集合を返す"""
+    n = n or NEAR_DUP_NGRAM
+    text = normalize_for_similarity(text)
+    if len(text) <= n:
+        return {text} if text else set()
+    return {text[i:i + n] for i in range(len(text) - n + 1)}
+
+
+def jaccard(a, b):
+    """2つの集合のJaccard係数"""
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def containment(a, b):
+    """小さい方の集合のうち、もう一方にも含まれる要素の割合"""
+    if not a or not b:
+        return 0.0
+    return len(a & b) / min(len(a), len(b))
+
+
+# タイトルの中で、違っていれば別の助成金とみなす部分（数字、英字の略語、括弧内の類型）
+_DISTINGUISHING_PATTERNS = (
+    re.compile(r'\d+'),
+    re.compile(r'[a-z]+'),
+    re.compile(r'[(\[<{【〈《「『]([^)\]>}】〉》」』]+)[)\]>}】〉》」』]')
+)
+
+
+def title_variants_compatible(title_a, title_b):
+    """タイトル中の数字（年度・公募回など）・英字（DX/GXなど）・括弧内の類型（一般型/創業型など）が矛盾しないかを判定する
+    （種類ごとに、一方がもう一方に全て含まれていればよい）
+
+    「第15次公募」と「第16次公募」のように文字列としては似ていても別の回・別の枠の公募を統合しないため。
+    """
+    text_a = unicodedata.normalize("NFKC", title_a or "").lower()
+    text_b = unicodedata.normalize("NFKC", title_b or "").lower()
+    for pattern in _DISTINGUISHING_PATTERNS:
+        parts_a = {normalize_for_similarity(part) for part in pattern.findall(text_a)}
+        parts_b = {normalize_for_similarity(part) for part in pattern.findall(text_b)}
+        if not (parts_a <= parts_b or parts_b <= parts_a):
+            return False
+    return True
+
+
+class MinHasher:
+    """n-gram集合のMinHash署名を計算する（署名の一致率が元の集合のJaccard係数の推定値になる）"""
+
+    def __init__(self, num_perm, seed=1):
+        rng = random.Random(seed)
+        self.coefficients = [(rng.randrange(1, _MERSENNE_PRIME), rng.randrange(0, _MERSENNE_PRIME)) for _ in range(num_perm)]
+
+    def signature(self, shingles):
+        hashes = [int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "big") for shingle in shingles]
+        return tuple(
+            min((a * value + b) % _MERSENNE_PRIME for value in hashes)
+            for a, b in self.coefficients
+        )
+
+
+class NearDuplicateIndex:
+    """登録済みの助成金情報から、タイトルと概要が近いものを探すLSHインデックス
+
+    タイトルの包含度が threshold 以上かつJaccard係数が min_jaccard 以上で、数字・英字・括弧内の類型が矛盾しなければ
+    近似重複とみなす。一方のタイトルがもう一方に含まれていない（包含度が1未満の）場合は、両方に概要があれば
+    概要の先頭部分のJaccard係数も description_threshold 以上を求める。
+    ignored_descriptions に含まれる概要（「詳細は要確認」などの定型文）は無いものとして扱う。
+    """
+
+    def __init__(self, threshold=None, ngram=None, bands=None, rows=None, ignored_descriptions=(), description_threshold=None,
+                 min_jaccard=None):
+        self.threshold = NEAR_DUP_THRESHOLD if threshold is None else threshold
+        self.min_jaccard = NEAR_DUP_MIN_JACCARD if min_jaccard is None else min_jaccard
+        self.description_threshold = NEAR_DUP_DESCRIPTION_THRESHOLD if description_threshold is None else description_threshold
+        self.ngram = ngram or NEAR_DUP_NGRAM
+        self.bands = bands or NEAR_DUP_BANDS
+        self.rows = rows or NEAR_DUP_ROWS
+        self.ignored_descriptions = {normalize_for_similarity(text) for text in ignored_descriptions}
+        self.hasher = MinHasher(self.bands * self.rows)
+        self.buckets = {}  # (バンド番号, バンドの値) -> 登録キーのリスト
+        self.entries = {}  # 登録キー -> (タイトル, タイトルのn-gram, 概要のn-gram（無ければ空）)
+
+    def _features(self, title, description):
+        title_shingles = char_ngrams(title, self.ngram)
+        description = (description or "")[:DESCRIPTION_PREFIX]
+        description_shingles = set()
+        if normalize_for_similarity(description) not in self.ignored_descriptions:
+            description_shingles = char_ngrams(description, self.ngram)
+        return title_shingles, description_shingles
+
+    def _band_keys(self, title_shingles):
+        if not title_shingles:
+            return
+        signature = self.hasher.signature(title_shingles)
+        for band in range(self.bands):
+            yield (band, signature[band * self.rows:(band + 1) * self.rows])
+
+    def find(self, title, description=""):
+        """近似重複とみなせる登録済みのキーを返す（タイトルの類似度が最も高いもの。無ければNone）"""
+        title_shingles, description_shingles = self._features(title, description)
+        candidates = {key for band_key in self._band_keys(title_shingles) for key in self.buckets.get(band_key, ())}
+
+        best_key, best_score = None, (0.0, 0.0)
+        for key in sorted(candidates, key=str):
+            entry_title, entry_title_shingles, entry_description_shingles = self.entries[key]
+            if not title_variants_compatible(title, entry_title):
+                continue
+            score = (containment(title_shingles, entry_title_shingles), jaccard(title_shingles, entry_title_shingles))
+            if score[0] < self.threshold or score[1] < self.min_jaccard or score <= best_score:
+                continue
+            if (score[0] < 1.0 and description_shingles and entry_description_shingles
+                    and jaccard(description_shingles, entry_description_shingles) < self.description_threshold):
+                continue
+            best_key, best_score = key, score
+        return best_key
+
+    def add(self, key, title, description=""):
+        """助成金情報をキーで登録する"""
+        title_shingles, description_shingles = self._features(title, description)
+        self.entries[key] = (title, title_shingles, description_shingles)
+        for band_key in self._band_keys(title_shingles):
+            self.buckets.setdefault(band_key, []).append(key)
+
+
+def merge_missing_fields(canonical, duplicate, fields, unknown_values=()):
+    """代表の助成金情報で未取得（unknown_values）の項目を、重複している情報の値で補う（補った項目名のリストを返す）"""
+    merged = []
+    for field in fields:
+        current = canonical.get(field, "")
+        value = duplicate.get(field, "")
+        if (not current or current in unknown_values) and value and value not in unknown_values:
+            canonical[field] = value
+            merged.append(field)
+    return merged
@@ -0,0 +1,438 @@
+#!/usr/bin/env python
+# coding: utf-8
+"""HTTP通信の記録と再生（ネットワークに依存せずに処理全体を再現するためのフィクスチャ）
+
+record モードでは、共有セッション経由の全てのHTTP通信（スクレイピング・robots.txt・Google Chat通知）と
+GPTの呼び出しをフィクスチャのディレクトリに保存する。replay モードでは保存した応答をネットワークに出ずに返し、
+必要に応じて遅延やエラーを注入する。スプレッドシートは記録時の内容を初期値とするメモリ上のシートに置き換える。
+どちらのモードでもCACHE_DIRは毎回空の一時ディレクトリになり（本番のキャッシュや評価状態は読み書きせず、終了時に削除する。
+実行レポートとプロファイルは元のCACHE_DIRに保存する）、
+GPTのまとめて評価は件数が揃ったバッチだけを送る（バッチの組み合わせがスレッドのタイミングで変わらないように）。
+
+使い方:
+  python replay.py record fixtures/2025-06-01
+  python replay.py replay fixtures/2025-06-01 [--latency-scale 1.0] [--latency-ms 0] [--error-rate 0.05]
+main.py を直接実行する場合は環境変数 HTTP_REPLAY_MODE（record / replay）と HTTP_REPLAY_DIR で切り替える。
+"""
+
+import argparse
+import atexit
+import datetime
+import hashlib
+import io
+import json
+import os
+import random
+import re
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import types
+
+import requests
+from requests.adapters import BaseAdapter
+from requests.structures import CaseInsensitiveDict
+
+# --- 記録・再生の設定 ---
+REPLAY_MODE = os.getenv("HTTP_REPLAY_MODE", "")  # "" / "record" / "replay"
+REPLAY_DIR = os.getenv("HTTP_REPLAY_DIR", os.path.join("fixtures", "recorded"))
+# 再生時の遅延（記録時の応答時間に掛ける倍率と、1リクエストごとに加える固定のミリ秒）
+REPLAY_LATENCY_SCALE = float(os.getenv("REPLAY_LATENCY_SCALE", "0"))
+REPLAY_LATENCY_MS = float(os.getenv("REPLAY_LATENCY_MS", "0"))
+# 再生時にエラーを返す割合と、その際のステータスコード（GPTは例外を送出）
+REPLAY_ERROR_RATE = float(os.getenv("REPLAY_ERROR_RATE", "0"))
+REPLAY_ERROR_STATUS = int(os.getenv("REPLAY_ERROR_STATUS", "503"))
+REPLAY_SEED = int(os.getenv("REPLAY_SEED", "1"))
+
+# 記録しない応答ヘッダー（本文は展開済みの状態で保存するため、転送時のエンコーディングは含めない）
+DROPPED_HEADERS = {"content-encoding", "transfer-encoding", "content-length", "set-cookie", "connection"}
+
+# 通知先のURLには認証情報が含まれるため、記録には置き換えた名前を使う
+WEBHOOK_PLACEHOLDER = "webhook:"
+
+_stats = {"recorded": 0, "replayed": 0, "missed": 0, "gpt_missed": 0, "injected_errors": 0}
+_stats_lock = threading.Lock()
+
+
+def is_active():
+    """記録・再生モードかどうか"""
+    return REPLAY_MODE in ("record", "replay")
+
+
+def cache_dir(default):
+    """記録・再生モードでは空の一時ディレクトリを、それ以外はdefaultをCACHE_DIRとして返す
+
+    本番のキャッシュで通信が省略されたり、再生で得た評価が本番の評価キャッシュや評価状態に残ったりしないようにする。
+    一時ディレクトリはプロセスの終了時に削除する。
+    """
+    if not is_active():
+        return default
+    path = tempfile.mkdtemp(prefix="grant-watcher-replay-cache-")
+    atexit.register(shutil.rmtree, path, ignore_errors=True)
+    return path
+
+
+def _count(name):
+    with _stats_lock:
+        _stats[name] += 1
+
+
+def _sha256(data):
+    if data is None:
+        data = b""
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    return hashlib.sha256(data).hexdigest()
+
+
+def _exchange_url(url):
+    """記録に使うURL（通知先は置き換える）"""
+    webhook_url = os.getenv("WEBHOOK_URL")
+    return WEBHOOK_PLACEHOLDER if webhook_url and url == webhook_url else url
+
+
+class FixtureArchive:
+    """フィクスチャのディレクトリ（http.jsonl / gpt.jsonl / bodies/ / sheet.json）"""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.bodies_dir = os.path.join(directory, "bodies")
+        self.lock = threading.Lock()
+
+    def append(self, name, record):
+        with self.lock:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(os.path.join(self.directory, name), "a", encoding="utf-8") as f:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    def read(self, name):
+        try:
+            with open(os.path.join(self.directory, name), "r", encoding="utf-8") as f:
+                return [json.loads(line) for line in f if line.strip()]
+        except OSError:
+            return []
+
+    def store_body(self, body):
+        key = _sha256(body)
+        path = os.path.join(self.bodies_dir, key)
+        if not os.path.exists(path):
+            os.makedirs(self.bodies_dir, exist_ok=True)
+            with open(path + ".tmp", "wb") as f:
+                f.write(body)
+            os.replace(path + ".tmp", path)
+        return key
+
+    def load_body(self, key):
+        with open(os.path.join(self.bodies_dir, key), "rb") as f:
+            return f.read()
+
+    def save_json(self, name, data):
+        os.makedirs(self.directory, exist_ok=True)
+        with open(os.path.join(self.directory, name), "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+
+    def load_json(self, name, default=None):
+        try:
+            with open(os.path.join(self.directory, name), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return default
+
+
+class ReplayLookup:
+    """記録された応答を (メソッド, URL, リクエスト本文) で引く（同じキーが複数あれば記録順に返し、最後のものを繰り返す）"""
+
+    def __init__(self, records, key_fields):
+        self.key_fields = key_fields
+        self.records = {}
+        self.cursors = {}
+        self.lock = threading.Lock()
+        for record in records:
+            self.records.setdefault(self._key(record), []).append(record)
+
+    def _key(self, record):
+        return tuple(record.get(field) for field in self.key_fields)
+
+    def get(self, **fields):
+        key = tuple(fields.get(field) for field in self.key_fields)
+        with self.lock:
+            records = self.records.get(key)
+            if not records:
+                return None
+            cursor = self.cursors.get(key, 0)
+            self.cursors[key] = cursor + 1
+            return records[min(cursor, len(records) - 1)]
+
+
+def _inject_latency(elapsed):
+    delay = elapsed * REPLAY_LATENCY_SCALE + REPLAY_LATENCY_MS / 1000
+    if delay > 0:
+        time.sleep(delay)
+
+
+_error_random = random.Random(REPLAY_SEED)
+_error_random_lock = threading.Lock()
+
+
+def _should_inject_error():
+    if REPLAY_ERROR_RATE <= 0:
+        return False
+    with _error_random_lock:
+        return _error_random.random() < REPLAY_ERROR_RATE
+
+
+# --- HTTP（requestsのトランスポートアダプター） ---
+def _build_response(request, status, headers, body, elapsed=0.0, reason=""):
+    response = requests.Response()
+    response.status_code = status
+    response.headers = CaseInsensitiveDict(headers)
+    response._content = body
+    response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+    response.raw = io.BytesIO(body)
+    response.reason = reason
+    response.url = request.url
+    response.request = request
+    response.elapsed = datetime.timedelta(seconds=elapsed)
+    return response
+
+
+class RecordingAdapter(BaseAdapter):
+    """元のアダプターで通信し、リクエストと応答をフィクスチャに追記する"""
+
+    def __init__(self, inner, archive):
+        super().__init__()
+        self.inner = inner
+        self.archive = archive
+        self.poolmanager = getattr(inner, "poolmanager", None)  # 接続統計の集計用
+
+    def send(self, request, **kwargs):
+        start = time.monotonic()
+        response = self.inner.send(request, **kwargs)
+        body = response.content
+        self.archive.append("http.jsonl", {
+            "method": request.method,
+            "url": _exchange_url(request.url),
+            "body_sha256": _sha256(request.body),
+            "status": response.status_code,
+            "reason": response.reason,
+            "headers": {name: value for name, value in response.headers.items() if name.lower() not in DROPPED_HEADERS},
+            "body": self.archive.store_body(body),
+            "elapsed": round(time.monotonic() - start, 4)
+        })
+        _count("recorded")
+        return response
+
+    def close(self):
+        self.inner.close()
+
+
+class ReplayAdapter(BaseAdapter):
+    """記録済みの応答を返す（記録にないリクエストは404）"""
+
+    def __init__(self, archive):
+        super().__init__()
+        self.archive = archive
+        records = archive.read("http.jsonl")
+        self.exact = ReplayLookup(records, ("method", "url", "body_sha256"))
+        self.by_url = ReplayLookup(records, ("method", "url"))
+
+    def send(self, request, **kwargs):
+        url = _exchange_url(request.url)
+        record = (self.exact.get(method=request.method, url=url, body_sha256=_sha256(request.body))
+                  or self.by_url.get(method=request.method, url=url))
+        if record is None:
+            _count("missed")
+            print(f"⚠️ 記録にないリクエスト: {request.method} {url}")
+            return _build_response(request, 404, {}, b"", reason="Not Recorded")
+
+        _inject_latency(record.get("elapsed", 0))
+        if _should_inject_error():
+            _count("injected_errors")
+            return _build_response(request, REPLAY_ERROR_STATUS, {}, b"", reason="Injected Error")
+
+        _count("replayed")
+        return _build_response(request, record["status"], record["headers"], self.archive.load_body(record["body"]),
+                               record.get("elapsed", 0), record.get("reason", ""))
+
+    def close(self):
+        pass
+
+
+def install_http(session):
+    """記録・再生モードであれば共有セッションにアダプターを取り付ける"""
+    if REPLAY_MODE not in ("record", "replay"):
+        return session
+    archive = FixtureArchive(REPLAY_DIR)
+    for prefix, adapter in list(session.adapters.items()):
+        session.mount(prefix, RecordingAdapter(adapter, archive) if REPLAY_MODE == "record" else ReplayAdapter(archive))
+    print(f"🎞️ HTTP通信を{'記録' if REPLAY_MODE == 'record' else '再生'}します: {REPLAY_DIR}")
+    return session
+
+
+# --- GPT（OpenAIクライアントの置き換え） ---
+def _gpt_request_key(kwargs):
+    return _sha256(json.dumps(kwargs, ensure_ascii=False, sort_keys=True, default=str))
+
+
+def _to_namespace(value):
+    """記録した応答（辞書）を属性でアクセスできるオブジェクトに変換する"""
+    if isinstance(value, dict):
+        return types.SimpleNamespace(**{key: _to_namespace(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return [_to_namespace(item) for item in value]
+    return value
+
+
+class ReplayMissError(RuntimeError):
+    """記録にないGPTリクエスト（評価エラーとして扱われ、評価キャッシュや評価状態には保存されない）"""
+
+
+class _Completions:
+    def __init__(self, create):
+        self.create = create
+
+
+class RecordingOpenAIClient:
+    """OpenAIクライアントを包み、chat.completions.create の入出力をフィクスチャに追記する"""
+
+    def __init__(self, client, archive):
+        self.client = client
+        self.archive = archive
+        self.chat = types.SimpleNamespace(completions=_Completions(self._create))
+
+    def _create(self, **kwargs):
+        start = time.monotonic()
+        response = self.client.chat.completions.create(**kwargs)
+        self.archive.append("gpt.jsonl", {
+            "key": _gpt_request_key(kwargs),
+            "model": kwargs.get("model"),
+            "response": response.model_dump() if hasattr(response, "model_dump") else response,
+            "elapsed": round(time.monotonic() - start, 4)
+        })
+        _count("recorded")
+        return response
+
+
+class ReplayOpenAIClient:
+    """記録済みのGPT応答を返すクライアント（記録にないリクエストはReplayMissErrorを送出する）"""
+
+    def __init__(self, archive):
+        self.lookup = ReplayLookup(archive.read("gpt.jsonl"), ("key",))
+        self.chat = types.SimpleNamespace(completions=_Completions(self._create))
+
+    def _create(self, **kwargs):
+        record = self.lookup.get(key=_gpt_request_key(kwargs))
+        if record is None:
+            _count("missed")
+            _count("gpt_missed")
+            raise ReplayMissError("再生用のGPT応答が記録されていません")
+
+        _inject_latency(record.get("elapsed", 0))
+        if _should_inject_error():
+            _count("injected_errors")
+            raise RuntimeError("再生時に注入したエラー")
+
+        _count("replayed")
+        return _to_namespace(record["response"])
+
+
+def openai_client(create_client):
+    """モードに応じてOpenAIクライアントを作成する（再生時は認証情報もライブラリも使わない）"""
+    if REPLAY_MODE == "replay":
+        return ReplayOpenAIClient(FixtureArchive(REPLAY_DIR))
+    client = create_client()
+    if REPLAY_MODE == "record":
+        return RecordingOpenAIClient(client, FixtureArchive(REPLAY_DIR))
+    return client
+
+
+# --- スプレッドシート（メモリ上のシート） ---
+class MemoryWorksheet:
+    """main.py が使う範囲のgspreadのワークシート操作をメモリ上で再現する"""
+
+    def __init__(self, rows=None):
+        self.rows = [list(row) for row in rows or []]
+
+    def get_all_values(self):
+        return [list(row) for row in self.rows]
+
+    def clear(self):
+        self.rows = []
+
+    def append_rows(self, rows, **kwargs):
+        self.rows.extend([str(value) for value in row] for row in rows)
+
+    def batch_update(self, updates, **kwargs):
+        for update in updates:
+            match = re.match(r'([A-Z]+)(\d+)', update["range"])
+            col = 0
+            for char in match.group(1):
+                col = col * 26 + ord(char) - ord("A") + 1
+            first_row = int(match.group(2))
+            for row_number, values in enumerate(update["values"], start=first_row):
+                while len(self.rows) < row_number:
+                    self.rows.append([])
+                row = self.rows[row_number - 1]
+                for offset, value in enumerate(values):
+                    while len(row) < col + offset:
+                        row.append("")
+                    row[col + offset - 1] = str(value)
+
+
+def worksheet(open_sheet):
+    """モードに応じてワークシートを取得する（記録時は開いた時点の内容を保存し、再生時はそれを初期値にする）"""
+    archive = FixtureArchive(REPLAY_DIR)
+    if REPLAY_MODE == "replay":
+        return MemoryWorksheet(archive.load_json("sheet.json", []))
+    sheet = open_sheet()
+    if REPLAY_MODE == "record":
+        archive.save_json("sheet.json", sheet.get_all_values())
+    return sheet
+
+
+def get_replay_stats():
+    with _stats_lock:
+        return dict(_stats)
+
+
+def print_replay_stats():
+    """記録・再生の統計を表示する"""
+    if REPLAY_MODE not in ("record", "replay"):
+        return
+    stats = get_replay_stats()
+    if REPLAY_MODE == "record":
+        print(f"🎞️ 記録: {stats['recorded']} 件 ({REPLAY_DIR})")
+    else:
+        print(f"🎞️ 再生: {stats['replayed']} 件 / 記録なし {stats['missed']} 件（うちGPT {stats['gpt_missed']} 件） / 注入したエラー {stats['injected_errors']} 件")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="HTTP通信を記録・再生して main.py を実行する")
+    parser.add_argument("mode", choices=("record", "replay"))
+    parser.add_argument("directory", help="フィクスチャのディレクトリ")
+    parser.add_argument("--latency-scale", type=float, default=None, help="記録時の応答時間に掛ける倍率（再生時）")
+    parser.add_argument("--latency-ms", type=float, default=None, help="1リクエストごとに加える遅延（再生時）")
+    parser.add_argument("--error-rate", type=float, default=None, help="エラーを返す割合（再生時）")
+    args = parser.parse_args()
+
+    # main.py は読み込み時に環境変数を読むため、読み込む前に設定する
+    os.environ["HTTP_REPLAY_MODE"] = args.mode
+    os.environ["HTTP_REPLAY_DIR"] = args.directory
+    for name, value in (("REPLAY_LATENCY_SCALE", args.latency_scale), ("REPLAY_LATENCY_MS", args.latency_ms),
+                        ("REPLAY_ERROR_RATE", args.error_rate)):
+        if value is not None:
+            os.environ[name] = str(value)
+    if args.mode == "replay":
+        os.environ.setdefault("WEBHOOK_URL", "https://webhook.replay.invalid/")
+    if args.mode == "record" and os.path.exists(os.path.join(args.directory, "http.jsonl")):
+        sys.exit(f"❌ {args.directory} には記録済みのフィクスチャがあります（別のディレクトリを指定してください）")
+
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import main as grant_watcher
+    grant_watcher.main()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+#!/usr/bin/env python
+# coding: utf-8
+"""ステージごとのプロファイリング（main.py --profile で有効化）
+
+取得（ソースごと）・詳細ページ（ホストごと）・GPT評価・メインスレッドの各ステージをcProfileで計測し、
+ステージごとのプロファイルを保存する。cProfileはスレッドごとに動くため、スレッドプールで実行される処理は
+ステージの入口で個別に計測してステージ単位にまとめる。あわせてステージごとの経過時間とCPU時間を集計し、
+CPU（解析）とネットワーク待ちのどちらが長いかを表示する。
+
+保存したプロファイルは python -m pstats や snakeviz で開ける。
+"""
+
+import contextlib
+import cProfile
+import io
+import os
+import pstats
+import threading
+import time
+
+# 集計して表示する処理（表示名, ファイル名の末尾, 関数名）。同じ名前が複数あれば累積時間の最も長いものを使う
+HOT_PATHS = [
+    ("BeautifulSoupの構築", os.path.join("bs4", "__init__.py"), "__init__"),
+    ("parse_html", "extraction.py", "parse_html"),
+    ("CSSセレクター（Tag.select）", os.path.join("bs4", "element.py"), "select"),
+    ("page_text", "extraction.py", "page_text"),
+    ("extract_grant_fields（締切・金額・補助率の正規表現）", "extraction.py", "extract_grant_fields"),
+    ("正規表現の照合（Pattern.search）", "~", "<method 'search' of 're.Pattern' objects>"),
+    ("normalize_text", "main.py", "normalize_text"),
+    ("is_target_grant（キーワード判定）", "main.py", "is_target_grant"),
+    ("matched_groups（キーワード照合）", "keywords.py", "matched_groups"),
+    ("NearDuplicateIndex.find", "near_duplicates.py", "find")
+]
+
+# プロファイルのテキスト出力に含める関数の数
+REPORT_LINES = 40
+
+
+class StageProfiler:
+    """ステージごとのcProfileの結果と、ステージ・ラベルごとの経過時間とCPU時間を集める"""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.stats = {}  # ステージ名 -> pstats.Stats
+        self.timings = {}  # (ステージ名, ラベル) -> [呼び出し回数, 経過時間, CPU時間]
+        self.unavailable = 0  # 他のプロファイラが動いていて計測できなかった回数
+
+    @contextlib.contextmanager
+    def stage(self, name, label=None):
+        """with文の間の処理をステージの一部として計測する（同じスレッドで計測中なら外側のステージに含める）"""
+        if getattr(self.local, "active", False):
+            yield
+            return
+
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:  # Python 3.12以降は同時に1つのプロファイラしか有効にできない
+            profile = None
+            with self.lock:
+                self.unavailable += 1
+
+        self.local.active = True
+        started = time.perf_counter()
+        cpu_started = time.thread_time()
+        try:
+            yield
+        finally:
+            wall = time.perf_counter() - started
+            cpu = time.thread_time() - cpu_started
+            self.local.active = False
+            if profile is not None:
+                profile.disable()
+            with self.lock:
+                timing = self.timings.setdefault((name, label or name), [0, 0.0, 0.0])
+                timing[0] += 1
+                timing[1] += wall
+                timing[2] += cpu
+                if profile is not None:
+                    stats = pstats.Stats(profile)
+                    if name in self.stats:
+                        self.stats[name].add(stats)
+                    else:
+                        self.stats[name] = stats
+
+    def combined_stats(self):
+        """全ステージをまとめたpstats.Stats（計測していなければNone）"""
+        with self.lock:
+            stages = list(self.stats.values())
+        if not stages:
+            return None
+        combined = pstats.Stats()
+        for stats in stages:
+            combined.add(stats)
+        return combined
+
+    def hot_paths(self):
+        """HOT_PATHSの処理ごとの (表示名, 呼び出し回数, 自身の時間, 累積時間) を累積時間の長い順に返す"""
+        combined = self.combined_stats()
+        if combined is None:
+            return []
+        results = []
+        for label, filename, function in HOT_PATHS:
+            matches = [
+                (calls, total, cumulative)
+                for (path, _, name), (_, calls, total, cumulative, _) in combined.stats.items()
+                if name == function and (path == filename or path.endswith(os.sep + filename))
+            ]
+            if matches:
+                results.append((label,) + max(matches, key=lambda match: match[2]))
+        return sorted(results, key=lambda result: result[3], reverse=True)
+
+    def write(self, top=REPORT_LINES):
+        """ステージごとのプロファイル（.prof）と累積時間順のテキスト（.txt）、全体をまとめたものを保存する"""
+        os.makedirs(self.directory, exist_ok=True)
+        with self.lock:
+            stages = dict(self.stats)
+        combined = self.combined_stats()
+        if combined is not None:
+            stages["all"] = combined
+        for name, stats in stages.items():
+            path = os.path.join(self.directory, f"{name}.prof")
+            stats.dump_stats(path)
+            text = io.StringIO()
+            pstats.Stats(path, stream=text).sort_stats("cumulative").print_stats(top)
+            with open(os.path.join(self.directory, f"{name}.txt"), "w", encoding="utf-8") as f:
+                f.write(text.getvalue())
+        return sorted(stages)
+
+    def print_summary(self):
+        """ステージごとの経過時間・CPU時間と、主な処理の累積時間を表示する"""
+        with self.lock:
+            timings = sorted(self.timings.items(), key=lambda item: item[1][1], reverse=True)
+        print("📊 ステージごとの経過時間とCPU時間（CPU比率が低いほどネットワークなどの待ち時間が長い）:")
+        for (name, label), (calls, wall, cpu) in timings:
+            ratio = cpu / wall * 100 if wall else 0.0
+            print(f"  - [{name}] {label}: {calls} 回, 経過 {wall:.2f}秒, CPU {cpu:.2f}秒 ({ratio:.0f}%), 待ち {max(0.0, wall - cpu):.2f}秒")
+
+        hot_paths = self.hot_paths()
+        if hot_paths:
+            print("🔥 主な処理の累積時間（全ステージ合計）:")
+            for label, calls, total, cumulative in hot_paths:
+                print(f"  - {label}: {calls} 回, 累積 {cumulative:.3f}秒, 自身 {total:.3f}秒")
+        if self.unavailable:
+            print(f"⚠️ 他のプロファイラが有効だったため {self.unavailable} 回は経過時間とCPU時間のみを計測しました")
+
+
+_profiler = None
+
+
+def stage(name, label=None):
+    """プロファイリングが有効ならステージとして計測する（無効な場合は何もしない）"""
+    if _profiler is None:
+        return contextlib.nullcontext()
+    return _profiler.stage(name, label)
+
+
+def run(func, directory):
+    """プロファイリングを有効にしてfuncを実行し、終了後（例外やexitでも）結果を保存・表示する"""
+    global _profiler
+    _profiler = StageProfiler(directory)
+    print(f"🔬 プロファイリングを有効にして実行します（保存先: {directory}）")
+    try:
+        with _profiler.stage("main"):
+            return func()
+    finally:
+        profiler, _profiler = _profiler, None
+        profiler.print_summary()
+        try:
+            stages = profiler.write()
+            print(f"✅ プロファイルを保存しました: {directory} ({', '.join(f'{name}.prof' for name in stages)})")
+        except OSError as e:
+            print(f"❌ プロファイルの保存エラー: {e}")
@@ -0,0 +1,62 @@
+#!/usr/bin/env python
+# coding: utf-8
+"""NearDuplicateIndex の近似重複判定（統合する組み合わせと、別の助成金として残す組み合わせ）"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from near_duplicates import NearDuplicateIndex  # noqa: E402
+
+PLACEHOLDERS = ("詳細は要確認", "要確認")
+
+
+def is_near_duplicate(title_a, title_b, description_a="", description_b=""):
+    index = NearDuplicateIndex(ignored_descriptions=PLACEHOLDERS)
+    index.add(0, title_a, description_a)
+    return index.find(title_b, description_b) == 0
+
+
+@pytest.mark.parametrize("title_a, title_b", [
+    ("IT導入補助金2025", "IT導入補助金2025（通常枠）"),
+    ("IT導入補助金2025（通常枠）", "【全国】IT導入補助金2025（通常枠）の公募について"),
+    ("IT導入補助金2025", "【全国】IT導入補助金2025（通常枠）の公募について"),
+    ("小規模事業者持続化補助金＜一般型＞", "小規模事業者持続化補助金（一般型）"),
+    ("【長野県】中小企業IT化支援補助金", "中小企業IT化支援補助金"),
+])
+def test_title_variants_of_the_same_grant_are_merged(title_a, title_b):
+    assert is_near_duplicate(title_a, title_b)
+    assert is_near_duplicate(title_a, title_b, "ITツールの導入費用の一部を補助します", "詳細は要確認")
+
+
+@pytest.mark.parametrize("title_a, title_b", [
+    ("小規模事業者持続化補助金（一般型）", "小規模事業者持続化補助金（創業型）"),
+    ("長野県 省エネ設備導入補助金", "長野県 再エネ設備導入補助金"),
+    ("令和7年度 長野県 DX推進補助金", "令和7年度 長野県 GX推進補助金"),
+    ("ものづくり補助金 第15次公募", "ものづくり補助金 第16次公募"),
+    ("補助金", "IT導入補助金2025"),
+])
+def test_distinct_grants_are_not_merged(title_a, title_b):
+    assert not is_near_duplicate(title_a, title_b)
+
+
+def test_identical_titles_are_merged_even_if_descriptions_differ():
+    assert is_near_duplicate("IT導入補助金2025（通常枠）", "IT導入補助金2025（通常枠）",
+                             "ITツールの導入費用の一部を補助します", "中小企業・小規模事業者のDXを支援する制度です")
+
+
+def test_similar_titles_with_different_descriptions_are_not_merged():
+    title_a = "令和7年度 長野県 中小企業 省エネルギー設備導入支援補助金の公募について"
+    title_b = "令和7年度 長野県 中小企業 再エネルギー設備導入支援補助金の公募について"
+    assert is_near_duplicate(title_a, title_b)
+    assert not is_near_duplicate(title_a, title_b, "高効率な空調・照明設備への更新費用を補助します",
+                                 "太陽光発電設備と蓄電池の導入費用を補助します")
+
+
+def test_most_similar_entry_is_returned():
+    index = NearDuplicateIndex()
+    index.add("short", "IT導入補助金2025")
+    index.add("exact", "IT導入補助金2025（通常枠）")
+    assert index.find("IT導入補助金2025（通常枠）") == "exact"
@@ -0,0 +1,102 @@
+#!/usr/bin/env python
+# coding: utf-8
+"""sync_sheet_rows の差分同期（メモリ上のシートで確認）"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import main  # noqa: E402
+from replay import MemoryWorksheet  # noqa: E402
+
+HEADERS = ["No.", "タイトル", "URL", "申請期限", "助成金額", "補助割合", "対象かどうか", "理由", "申請優先度", "掲載状況"]
+
+
+def make_row(number, grant_id, target="はい"):
+    return [number, f"助成金{grant_id}", f"https://example.go.jp/grants/{grant_id}", "要確認", "要確認", "要確認",
+            target, "理由", "中", main.SHEET_STATUS_ACTIVE]
+
+
+def sync(sheet, rows):
+    writer = main.SheetWriter(sheet)
+    main.sync_sheet_rows(sheet, HEADERS, sheet.get_all_values(), rows, writer)
+
+
+def test_empty_sheet_keeps_header_when_rows_exceed_flush_size():
+    sheet = MemoryWorksheet()
+    rows = [make_row(i, i) for i in range(1, main.SHEET_FLUSH_SIZE + 11)]
+
+    sync(sheet, rows)
+
+    values = sheet.get_all_values()
+    assert values[0] == HEADERS
+    assert [row[2] for row in values[1:]] == [row[2] for row in rows]
+
+
+def record_updates(sheet):
+    updates = []
+    batch_update = sheet.batch_update
+    sheet.batch_update = lambda values, **kwargs: (updates.extend(values), batch_update(values, **kwargs))
+    return updates
+
+
+def test_only_changed_cells_are_written_and_numbers_are_rewritten_as_one_range():
+    sheet = MemoryWorksheet([HEADERS] + [[str(value) for value in make_row(i, i)] for i in range(1, 4)])
+    updates = record_updates(sheet)
+
+    # 並び順が変わって番号がずれても、セル単位で書き込むのは2件目の判定だけ
+    sync(sheet, [make_row(1, 3), make_row(2, 2, target="いいえ"), make_row(3, 1)])
+
+    assert updates == [
+        {"range": "G3", "values": [["いいえ"]]},
+        {"range": "A2:A4", "values": [["3"], ["2"], ["1"]]}
+    ]
+    assert [(row[0], row[2]) for row in sheet.get_all_values()[1:]] == [
+        ("3", "https://example.go.jp/grants/1"),
+        ("2", "https://example.go.jp/grants/2"),
+        ("1", "https://example.go.jp/grants/3")
+    ]
+
+
+def test_numbers_match_this_run_when_a_new_grant_comes_first():
+    sheet = MemoryWorksheet([HEADERS] + [[str(value) for value in make_row(i, i)] for i in range(1, 4)])
+
+    # 新しい助成金が1番になり、既存の3件は2〜4番にずれる（番号が重複しないこと）
+    sync(sheet, [make_row(1, "t1"), make_row(2, 1), make_row(3, 2), make_row(4, 3)])
+
+    numbers = {row[2].rsplit("/", 1)[1]: row[0] for row in sheet.get_all_values()[1:]}
+    assert numbers == {"1": "2", "2": "3", "3": "4", "t1": "1"}
+
+
+def test_numbers_are_cleared_for_rows_missing_from_this_run():
+    sheet = MemoryWorksheet([HEADERS] + [[str(value) for value in make_row(i, i)] for i in range(1, 4)])
+    updates = record_updates(sheet)
+
+    sync(sheet, [make_row(1, 1), make_row(2, 3)])
+
+    values = sheet.get_all_values()
+    assert [row[0] for row in values[1:]] == ["1", "", "2"]
+    assert values[2][9] == main.SHEET_STATUS_GONE
+    assert {"range": "A2:A4", "values": [["1"], [""], ["2"]]} in updates
+
+
+def test_numbers_are_not_written_when_unchanged():
+    sheet = MemoryWorksheet([HEADERS] + [[str(value) for value in make_row(i, i)] for i in range(1, 4)])
+    updates = record_updates(sheet)
+
+    sync(sheet, [make_row(i, i) for i in range(1, 4)])
+
+    assert updates == []
+
+
+def test_rows_are_marked_gone_only_when_allowed():
+    sheet = MemoryWorksheet([HEADERS] + [[str(value) for value in make_row(i, i)] for i in range(1, 4)])
+    failed_source_key = main.grant_url_key("https://example.go.jp/grants/3")
+
+    writer = main.SheetWriter(sheet)
+    main.sync_sheet_rows(sheet, HEADERS, sheet.get_all_values(), [make_row(1, 1)], writer,
+                         can_mark_gone=lambda key: key != failed_source_key)
+
+    assert [row[9] for row in sheet.get_all_values()[1:]] == [
+        main.SHEET_STATUS_ACTIVE, main.SHEET_STATUS_GONE, main.SHEET_STATUS_ACTIVE
+    ]
@@ -0,0 +1,250 @@
+#!/usr/bin/env python
+# coding: utf-8
+"""処理ごとの所要時間の計測（スパン）と実行レポートの出力
+
+各ソースの取得、詳細ページの取得、HTTPリクエスト、GPT呼び出し、スプレッドシート書き込みをスパンとして記録し、
+所要時間・転送量・ステータス・リトライ回数を集計する。実行の最後にJSONのレポートとOpenMetrics形式の
+テキストファイルを書き出し、時間のかかった処理の上位を表示する。
+
+使い方:
+  with TRACER.span("http", url, host=host) as span:
+      response = session.get(url)
+      span.set(status=response.status_code, bytes=len(response.content))
+"""
+
+import contextlib
+import json
+import os
+import threading
+import time
+
+# レポートの形式（項目を変えたら上げる）
+REPORT_VERSION = 1
+
+# OpenMetricsのメトリクス名の接頭辞
+METRIC_PREFIX = "grant_watcher"
+
+# 集計に使う数値の属性（スパンの種類ごとに合計する）
+SUMMED_ATTRIBUTES = ("bytes", "retries", "tokens", "rows")
+
+
+class Span:
+    """1回分の処理の記録（種類・名前・開始時刻・所要時間・属性）"""
+
+    def __init__(self, kind, name, started_at, attributes):
+        self.kind = kind
+        self.name = name
+        self.started_at = started_at  # 計測開始からの経過秒数
+        self.duration = None  # 実行中はNone
+        self.error = None
+        self.attributes = attributes
+
+    def set(self, **attributes):
+        """属性を追加・更新する（Noneの値は記録しない）"""
+        self.attributes.update({key: value for key, value in attributes.items() if value is not None})
+
+    def to_dict(self, now=None):
+        data = {
+            "kind": self.kind,
+            "name": self.name,
+            "started_at": round(self.started_at, 3),
+            "duration": round(self.duration if self.duration is not None else now - self.started_at, 3),
+            "state": "running" if self.duration is None else ("error" if self.error else "ok")
+        }
+        if self.error:
+            data["error"] = self.error
+        data.update(self.attributes)
+        return data
+
+
+def _percentile(sorted_values, ratio):
+    """昇順に並んだ値のパーセンタイル（最近傍順位法）"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(-(-ratio * len(sorted_values) // 1)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def _format_bytes(size):
+    return f"{size / 1024:.0f} KB" if size >= 1024 else f"{size} B"
+
+
+def _escape_label(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _write_atomic(path, text):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(path + ".tmp", path)
+
+
+class Tracer:
+    """スパンを集めるスレッドセーフな記録係（1回の実行で1つを共有）"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.start()
+
+    def start(self):
+        """記録を空にして計測を始め直す"""
+        with self.lock:
+            self.started_wall = time.time()
+            self.started = time.perf_counter()
+            self.spans = []
+            self.active = set()
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    @contextlib.contextmanager
+    def span(self, kind, name, **attributes):
+        """with文の間の処理をスパンとして記録する（例外は記録してそのまま送出する）"""
+        span = Span(kind, name, self.elapsed(), {})
+        span.set(**attributes)
+        with self.lock:
+            self.active.add(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.error = span.error or f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            span.duration = self.elapsed() - span.started_at
+            with self.lock:
+                self.active.discard(span)
+                self.spans.append(span)
+
+    def summary(self):
+        """スパンの種類ごとの件数・エラー数・所要時間（合計・中央値・95パーセンタイル・最大）と数値属性の合計"""
+        with self.lock:
+            spans = list(self.spans)
+        by_kind = {}
+        for span in spans:
+            by_kind.setdefault(span.kind, []).append(span)
+
+        summary = {}
+        for kind, kind_spans in sorted(by_kind.items()):
+            durations = sorted(span.duration for span in kind_spans)
+            stats = {
+                "count": len(kind_spans),
+                "errors": sum(1 for span in kind_spans if span.error),
+                "total_seconds": round(sum(durations), 3),
+                "p50_seconds": round(_percentile(durations, 0.5), 3),
+                "p95_seconds": round(_percentile(durations, 0.95), 3),
+                "max_seconds": round(durations[-1], 3)
+            }
+            for attribute in SUMMED_ATTRIBUTES:
+                values = [span.attributes[attribute] for span in kind_spans if isinstance(span.attributes.get(attribute), (int, float))]
+                if values:
+                    stats[attribute] = sum(values)
+            statuses = {}
+            for span in kind_spans:
+                if "status" in span.attributes:
+                    status = str(span.attributes["status"])
+                    statuses[status] = statuses.get(status, 0) + 1
+            if statuses:
+                stats["statuses"] = statuses
+            summary[kind] = stats
+        return summary
+
+    def slowest(self, count):
+        """所要時間の長い順にスパンを返す（実行中のものは経過時間で比べる）"""
+        now = self.elapsed()
+        with self.lock:
+            spans = list(self.spans) + list(self.active)
+        spans.sort(key=lambda span: span.duration if span.duration is not None else now - span.started_at, reverse=True)
+        return [span.to_dict(now) for span in spans[:count]]
+
+    def report(self, slowest_count=10):
+        """実行レポート（JSONに変換できる辞書）"""
+        now = self.elapsed()
+        with self.lock:
+            spans = sorted(self.spans, key=lambda span: span.started_at)
+            running = sorted(self.active, key=lambda span: span.started_at)
+        return {
+            "version": REPORT_VERSION,
+            "started_at": time.strftime("%Y-%m-%dT%H:%M:%S%z", time.localtime(self.started_wall)),
+            "duration_seconds": round(now, 3),
+            "summary": self.summary(),
+            "slowest": self.slowest(slowest_count),
+            "running": [span.to_dict(now) for span in running],
+            "spans": [span.to_dict(now) for span in spans]
+        }
+
+    def openmetrics(self):
+        """集計結果をOpenMetricsのテキスト形式で返す"""
+        summary = self.summary()
+        name = f"{METRIC_PREFIX}_span_duration_seconds"
+        lines = [f"# TYPE {name} summary", f"# HELP {name} Duration of traced operations by kind."]
+        for kind, stats in summary.items():
+            label = f'kind="{_escape_label(kind)}"'
+            lines.append(f'{name}{{{label},quantile="0.5"}} {stats["p50_seconds"]}')
+            lines.append(f'{name}{{{label},quantile="0.95"}} {stats["p95_seconds"]}')
+            lines.append(f"{name}_sum{{{label}}} {stats['total_seconds']}")
+            lines.append(f"{name}_count{{{label}}} {stats['count']}")
+
+        counters = [("errors", "Traced operations that raised or failed.")]
+        counters += [(attribute, f"Sum of the {attribute} attribute of traced operations.") for attribute in SUMMED_ATTRIBUTES]
+        for attribute, help_text in counters:
+            name = f"{METRIC_PREFIX}_span_{attribute}"
+            values = [(kind, stats[attribute]) for kind, stats in summary.items() if attribute in stats]
+            if not values:
+                continue
+            lines += [f"# TYPE {name} counter", f"# HELP {name} {help_text}"]
+            lines += [f'{name}_total{{kind="{_escape_label(kind)}"}} {value}' for kind, value in values]
+
+        name = f"{METRIC_PREFIX}_span_status"
+        statuses = [(kind, status, count) for kind, stats in summary.items() for status, count in stats.get("statuses", {}).items()]
+        if statuses:
+            lines += [f"# TYPE {name} counter", f"# HELP {name} Traced operations by result status."]
+            lines += [f'{name}_total{{kind="{_escape_label(kind)}",status="{_escape_label(status)}"}} {count}' for kind, status, count in statuses]
+
+        name = f"{METRIC_PREFIX}_run_duration_seconds"
+        lines += [f"# TYPE {name} gauge", f"# HELP {name} Wall-clock duration of the run.", f"{name} {self.elapsed():.3f}"]
+        name = f"{METRIC_PREFIX}_run_start_timestamp_seconds"
+        lines += [f"# TYPE {name} gauge", f"# HELP {name} Unix time the run started.", f"{name} {self.started_wall:.3f}"]
+        lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+    def write_report(self, path, slowest_count=10):
+        """実行レポートをJSONファイルに書き出す"""
+        _write_atomic(path, json.dumps(self.report(slowest_count), ensure_ascii=False, indent=2))
+
+    def write_openmetrics(self, path):
+        """集計結果をOpenMetrics形式のテキストファイルに書き出す"""
+        _write_atomic(path, self.openmetrics())
+
+    def print_summary(self, slowest_count=10):
+        """種類ごとの集計と、時間のかかった処理の上位を表示する"""
+        summary = self.summary()
+        if not summary:
+            return
+        print(f"📊 処理別の所要時間（全体 {self.elapsed():.1f}秒）:")
+        for kind, stats in summary.items():
+            extra = ""
+            if stats.get("bytes"):
+                extra += f", {_format_bytes(stats['bytes'])}"
+            if stats.get("retries"):
+                extra += f", リトライ {stats['retries']} 回"
+            if stats["errors"]:
+                extra += f", エラー {stats['errors']} 件"
+            print(f"  - {kind}: {stats['count']} 件, 合計 {stats['total_seconds']:.1f}秒, "
+                  f"中央値 {stats['p50_seconds']:.2f}秒, p95 {stats['p95_seconds']:.2f}秒, 最大 {stats['max_seconds']:.2f}秒{extra}")
+
+        print(f"🐢 時間のかかった処理 上位{slowest_count}件:")
+        for span in self.slowest(slowest_count):
+            details = [{"running": "実行中", "error": "エラー"}[span["state"]]] if span["state"] != "ok" else []
+            if "status" in span:
+                details.append(str(span["status"]))
+            if span.get("bytes"):
+                details.append(_format_bytes(span["bytes"]))
+            if span.get("retries"):
+                details.append(f"リトライ {span['retries']} 回")
+            suffix = f" ({', '.join(details)})" if details else ""
+            print(f"  - {span['duration']:7.2f}秒  [{span['kind']}] {span['name']}{suffix}")
+
+
+TRACER = Tracer()
+span = TRACER.span
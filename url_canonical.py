@@ -0,0 +1,75 @@
+#!/usr/bin/env python
+# coding: utf-8
+"""URLの正規化（重複判定・状態管理・HTTPキャッシュで同じページを1つのキーにまとめる）"""
+
+import posixpath
+import re
+from urllib.parse import parse_qsl, quote, unquote, urlencode, urlsplit, urlunsplit
+
+# --- 正規化ルール ---
+# 省略できる既定のポート番号
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+# ディレクトリの既定ページとして省略するファイル名
+INDEX_PAGES = ("index.html", "index.htm", "index.php", "default.aspx")
+
+# アクセス解析用で、ページの内容に影響しないクエリパラメータ（前方一致は末尾が "_"）
+TRACKING_PARAMS = ("utm_", "fbclid", "gclid", "yclid", "msclkid", "mc_cid", "mc_eid", "_ga", "_gl")
+
+# ホストごとに残すクエリパラメータ（登録のないホストは、アクセス解析用以外の全てのパラメータを残す）
+# 例: "www.example.go.jp": ("id", "page")
+QUERY_ALLOWLIST = {}
+
+# パーセントエンコードしない文字（RFC 3986 の非予約文字と、パスの区切りに使われる文字）
+_PATH_SAFE = "/:@!$&'()*+,;=-._~"
+
+
+def _is_tracking_param(name):
+    name = name.lower()
+    return any(name.startswith(param) if param.endswith("_") else name == param for param in TRACKING_PARAMS)
+
+
+def _normalize_path(path):
+    """ドットセグメント・連続したスラッシュ・末尾のスラッシュと既定ページ名を取り除き、エンコードを揃える"""
+    path = re.sub(r'/{2,}', '/', unquote(path) or "/")
+    normalized = posixpath.normpath(path) if path != "/" else "/"
+    if normalized.startswith("//"):  # normpathは先頭の"//"を残すことがある
+        normalized = "/" + normalized.lstrip("/")
+    if posixpath.basename(normalized).lower() in INDEX_PAGES:
+        normalized = posixpath.dirname(normalized)
+    normalized = normalized.rstrip("/") or "/"
+    return quote(normalized, safe=_PATH_SAFE)
+
+
+def canonicalize_url(url):
+    """同じページを指すURLが1つの文字列になるよう正規化する
+
+    - スキームとホスト名を小文字にし、httpはhttpsにそろえる
+    - 既定のポート番号、フラグメント、末尾のスラッシュ、index.htmlなどの既定ページ名を取り除く
+    - クエリはアクセス解析用のパラメータを除き（QUERY_ALLOWLISTに登録したホストは許可したものだけを残し）、名前順に並べる
+    相対URLや解析できない文字列は前後の空白を除いてそのまま返す。
+    """
+    url = (url or "").strip()
+    try:
+        parts = urlsplit(url)
+        port = parts.port
+    except ValueError:
+        return url
+    if not parts.scheme or not parts.hostname:
+        return url
+
+    scheme = parts.scheme.lower()
+    if scheme == "http":
+        scheme = "https"
+
+    host = parts.hostname.rstrip(".")
+    if port and port != DEFAULT_PORTS.get(parts.scheme.lower()):
+        host = f"{host}:{port}"
+
+    allowed = QUERY_ALLOWLIST.get(host)
+    query = sorted(
+        (name, value) for name, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not _is_tracking_param(name) and (allowed is None or name in allowed)
+    )
+
+    return urlunsplit((scheme, host, _normalize_path(parts.path), urlencode(query), ""))